@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:43
+
+from django.db import migrations
+
+from school_management.migration_utils import run_on_postgres
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_passwordresetotp'),
+    ]
+
+    operations = [
+        # Case-insensitive prefix (istartswith) lookups can only use these on PostgreSQL
+        migrations.RunPython(
+            run_on_postgres('CREATE INDEX users_first_name_prefix_idx ON users (UPPER(first_name) text_pattern_ops);\nCREATE INDEX users_last_name_prefix_idx ON users (UPPER(last_name) text_pattern_ops);'),
+            run_on_postgres('DROP INDEX IF EXISTS users_first_name_prefix_idx;\nDROP INDEX IF EXISTS users_last_name_prefix_idx;'),
+        ),
+    ]
@@ -14,6 +14,7 @@ from .serializers import (
     ForgotPasswordSerializer, VerifyOTPSerializer, ResetPasswordSerializer
 )
 from .email_utils import send_otp_email, send_password_reset_success_email
+from school_management.routers import replica_reads
 
 
 def get_client_ip(request):
@@ -236,6 +237,7 @@ def admin_sessions(request):
     return Response(SuperAdminSessionSerializer(sessions, many=True).data)
 
 
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def tenant_admin_logs(request):
@@ -281,6 +283,7 @@ def change_password(request):
     return Response(TenantAdminCreationLogSerializer(logs, many=True).data)
 
 
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def audit_logs(request):
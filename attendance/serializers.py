@@ -58,3 +58,24 @@ class TeacherAttendanceSerializer(serializers.ModelSerializer):
         if obj.marked_by:
             return f"{obj.marked_by.first_name} {obj.marked_by.last_name}"
         return None
+
+
+class TeacherAttendanceRecordSerializer(serializers.Serializer):
+    teacher_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=TeacherAttendance.STATUS_CHOICES)
+    remarks = serializers.CharField(required=False, allow_blank=True, allow_null=True, default='')
+
+
+class BulkTeacherAttendanceSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    attendance_records = TeacherAttendanceRecordSerializer(many=True)
+    
+    def validate_attendance_records(self, value):
+        teacher_ids = set()
+        for record in value:
+            if record['teacher_id'] in teacher_ids:
+                raise serializers.ValidationError(
+                    f"Duplicate record for teacher {record['teacher_id']}"
+                )
+            teacher_ids.add(record['teacher_id'])
+        return value
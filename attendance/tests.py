@@ -1,3 +1,152 @@
+import datetime
+import uuid
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from teachers.models import Teacher
+from tenants.models import Tenant
+from .models import TeacherAttendance
+
+
+class TeacherAttendanceFixtureMixin:
+    DATE = datetime.date(2026, 10, 19)
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name='Attendance School', email='attendance@school.test', school_code='ATT001'
+        )
+        self.admin = self.make_user('admin@school.test', 'tenant_admin')
+        self.teachers = [self.make_teacher(f'teacher{i}@school.test') for i in range(3)]
+
+    def make_user(self, email, role):
+        return User.objects.create_user(
+            email=email, first_name='Test', last_name=role.title(), role=role, tenant=self.tenant
+        )
+
+    def make_teacher(self, email):
+        return Teacher.objects.create(
+            tenant=self.tenant, user=self.make_user(email, 'teacher'), employee_id=email,
+            date_of_birth=datetime.date(1980, 1, 1), gender='female', qualification='master',
+            joining_date=datetime.date(2020, 1, 1), subjects='Maths'
+        )
+
+    def client_for(self, user):
+        client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        client.force_authenticate(user)
+        return client
+
+
+class MarkTeacherAttendanceTests(TeacherAttendanceFixtureMixin, TestCase):
+    def mark(self, records, user=None):
+        return self.client_for(user or self.admin).post(
+            '/api/attendance/teacher/mark/',
+            {'date': self.DATE, 'attendance_records': records},
+            format='json'
+        )
+
+    def test_marks_and_then_updates_in_place(self):
+        records = [{'teacher_id': str(teacher.id), 'status': 'present'} for teacher in self.teachers[:2]]
+        response = self.mark(records)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 0))
+
+        records[0].update(status='on_leave', remarks='Conference')
+        response = self.mark(records)
+
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 2))
+        self.assertEqual(TeacherAttendance.objects.count(), 2)
+        record = TeacherAttendance.objects.get(teacher=self.teachers[0])
+        self.assertEqual((record.status, record.remarks, record.marked_by), ('on_leave', 'Conference', self.admin))
+
+    def test_invalid_records_are_rejected(self):
+        teacher_id = str(self.teachers[0].id)
+        for records in (
+            [{'teacher_id': 'not-a-uuid', 'status': 'present'}],
+            [{'teacher_id': teacher_id, 'status': 'asleep'}],
+            [{'teacher_id': teacher_id}],
+            [{'teacher_id': teacher_id, 'status': 'present'}, {'teacher_id': teacher_id, 'status': 'absent'}],
+        ):
+            self.assertEqual(self.mark(records).status_code, 400, records)
+        self.assertFalse(TeacherAttendance.objects.exists())
+
+    def test_unknown_teacher(self):
+        response = self.mark([{'teacher_id': str(uuid.uuid4()), 'status': 'present'}])
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_teachers_cannot_mark(self):
+        response = self.mark([{'teacher_id': str(self.teachers[0].id), 'status': 'present'}], self.teachers[0].user)
+
+        self.assertEqual(response.status_code, 403)
+
+
+class TeacherAttendanceHistoryTests(TeacherAttendanceFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = self.teachers[0]
+        for days_ago in range(5):
+            TeacherAttendance.objects.create(
+                tenant=self.tenant, teacher=self.teacher, status='present',
+                date=self.DATE - datetime.timedelta(days=days_ago)
+            )
+
+    def history(self, user=None, teacher=None, **params):
+        teacher = teacher or self.teacher
+        return self.client_for(user or self.admin).get(
+            f'/api/attendance/teacher/{teacher.id}/history/', params
+        )
+
+    def test_pages_follow_the_cursor(self):
+        dates, cursor = [], None
+        for _ in range(3):
+            params = {'limit': 2, **({'before': cursor} if cursor else {})}
+            response = self.history(**params)
+            self.assertEqual(response.status_code, 200)
+            dates += [record['date'] for record in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        expected = [str(self.DATE - datetime.timedelta(days=days_ago)) for days_ago in range(5)]
+        self.assertEqual(dates, expected)
+        self.assertIsNone(cursor)
+
+    def test_malformed_parameters_are_rejected(self):
+        for params in ({'before': 'yesterday'}, {'start_date': '2026-02-30'}, {'limit': 'all'}):
+            response = self.history(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.data['error'])
+
+        response = self.client_for(self.admin).get('/api/attendance/teacher/not-a-uuid/history/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_teachers_see_only_their_own_history(self):
+        self.assertEqual(self.history(user=self.teacher.user).status_code, 200)
+        self.assertEqual(self.history(user=self.teachers[1].user).status_code, 403)
+
+
+class StaffAttendanceSummaryTests(TeacherAttendanceFixtureMixin, TestCase):
+    def test_counts_each_status_and_unmarked_teachers(self):
+        TeacherAttendance.objects.create(tenant=self.tenant, teacher=self.teachers[0], date=self.DATE, status='present')
+        TeacherAttendance.objects.create(tenant=self.tenant, teacher=self.teachers[1], date=self.DATE, status='late')
+        # Another day's record does not count
+        TeacherAttendance.objects.create(
+            tenant=self.tenant, teacher=self.teachers[2], date=self.DATE - datetime.timedelta(days=1), status='absent'
+        )
+
+        response = self.client_for(self.admin).get('/api/attendance/teacher/summary/', {'date': self.DATE})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('total_teachers', 'present', 'late', 'absent', 'unmarked')},
+            {'total_teachers': 3, 'present': 1, 'late': 1, 'absent': 0, 'unmarked': 1}
+        )
+        self.assertEqual(response.data['attendance_percentage'], 66.67)
+
+    def test_malformed_date_is_rejected(self):
+        response = self.client_for(self.admin).get('/api/attendance/teacher/summary/', {'date': '19-10-2026'})
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'date must be a date in YYYY-MM-DD format'})
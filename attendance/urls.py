@@ -7,4 +7,7 @@ urlpatterns = [
     path('student/<str:student_id>/history/', views.get_student_attendance_history, name='get_student_attendance_history'),
     path('student/<str:student_id>/stats/', views.get_student_attendance_stats, name='get_student_attendance_stats'),
     path('class/stats/', views.get_class_attendance_stats, name='get_class_attendance_stats'),
+    path('teacher/mark/', views.mark_bulk_teacher_attendance, name='mark_bulk_teacher_attendance'),
+    path('teacher/summary/', views.get_staff_attendance_summary, name='get_staff_attendance_summary'),
+    path('teacher/<str:teacher_id>/history/', views.get_teacher_attendance_history, name='get_teacher_attendance_history'),
 ]
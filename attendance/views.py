@@ -1,17 +1,22 @@
 from django.shortcuts import render
-from django.db.models import Count, Q
+from django.db.models import Count, Q, FilteredRelation
+from django.utils.dateparse import parse_date
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime, timedelta
+import uuid
 from .models import Attendance, TeacherAttendance
 from .serializers import (
     AttendanceSerializer, 
     BulkAttendanceSerializer,
     AttendanceStatsSerializer,
-    TeacherAttendanceSerializer
+    TeacherAttendanceSerializer,
+    BulkTeacherAttendanceSerializer
 )
 from students.models import Student
+from teachers.models import Teacher
+from school_management.routers import replica_reads
 
 
 @api_view(['POST'])
@@ -95,6 +100,7 @@ def get_attendance_by_date(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@replica_reads
 @api_view(['GET'])
 def get_student_attendance_history(request, student_id):
     """Get attendance history for a specific student"""
@@ -131,6 +137,7 @@ def get_student_attendance_history(request, student_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@replica_reads
 @api_view(['GET'])
 def get_student_attendance_stats(request, student_id):
     """Get attendance statistics for a specific student"""
@@ -186,6 +193,7 @@ def get_student_attendance_stats(request, student_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@replica_reads
 @api_view(['GET'])
 def get_class_attendance_stats(request):
     """Get attendance statistics for a class"""
@@ -227,3 +235,170 @@ def get_class_attendance_stats(request):
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _date_param(request, name, default=None):
+    """A YYYY-MM-DD query parameter as a date; ValueError if it is malformed"""
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        # None for the wrong format, ValueError for an impossible date like 2026-02-30
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+    return parsed
+
+
+@api_view(['POST'])
+def mark_bulk_teacher_attendance(request):
+    """Mark attendance for many teachers at once with a single upsert"""
+    if request.user.role not in ['super_admin', 'tenant_admin']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = BulkTeacherAttendanceSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    tenant = request.user.tenant
+    date = serializer.validated_data['date']
+    records = serializer.validated_data['attendance_records']
+    
+    teacher_ids = set(
+        Teacher.objects.filter(
+            tenant=tenant,
+            id__in=[record['teacher_id'] for record in records]
+        ).values_list('id', flat=True)
+    )
+    for record in records:
+        if record['teacher_id'] not in teacher_ids:
+            return Response(
+                {'error': f'Teacher with ID {record["teacher_id"]} not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    existing = TeacherAttendance.objects.filter(
+        tenant=tenant,
+        date=date,
+        teacher_id__in=teacher_ids
+    ).count()
+    
+    # One INSERT ... ON CONFLICT (tenant, teacher, date) DO UPDATE for the whole batch
+    TeacherAttendance.objects.bulk_create(
+        [
+            TeacherAttendance(
+                tenant=tenant,
+                teacher_id=record['teacher_id'],
+                date=date,
+                status=record['status'],
+                remarks=record['remarks'],
+                marked_by=request.user,
+            )
+            for record in records
+        ],
+        update_conflicts=True,
+        unique_fields=['tenant', 'teacher', 'date'],
+        update_fields=['status', 'remarks', 'marked_by'],
+    )
+    
+    return Response({
+        'message': 'Teacher attendance marked successfully',
+        'created': len(records) - existing,
+        'updated': existing,
+        'total': len(records),
+    }, status=status.HTTP_201_CREATED)
+
+
+@replica_reads
+@api_view(['GET'])
+def get_teacher_attendance_history(request, teacher_id):
+    """
+    Get attendance history for a teacher, newest first.
+    Keyset paginated: pass the returned next_cursor as ?before= for the next page.
+    """
+    if request.user.role not in ['super_admin', 'tenant_admin', 'teacher']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    # Teachers can only view their own records
+    if request.user.role == 'teacher':
+        try:
+            teacher = Teacher.objects.get(user=request.user, tenant=request.user.tenant)
+            if str(teacher.id) != teacher_id:
+                return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        except Teacher.DoesNotExist:
+            return Response({'error': 'Teacher not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        teacher_id = uuid.UUID(teacher_id)
+    except ValueError:
+        return Response({'error': 'Invalid teacher ID'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        before = _date_param(request, 'before')
+        start_date = _date_param(request, 'start_date')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.GET.get('limit', 30)), 1), 100)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # (teacher, date) is unique per tenant, so the date alone is a stable cursor
+    records = TeacherAttendance.objects.filter(
+        tenant=request.user.tenant,
+        teacher_id=teacher_id
+    ).select_related('marked_by').order_by('-date')
+    
+    if before:
+        records = records.filter(date__lt=before)
+    if start_date:
+        records = records.filter(date__gte=start_date)
+    
+    page = list(records[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    
+    return Response({
+        'results': TeacherAttendanceSerializer(page, many=True).data,
+        'next_cursor': page[-1].date if has_more else None,
+    }, status=status.HTTP_200_OK)
+
+
+@replica_reads
+@api_view(['GET'])
+def get_staff_attendance_summary(request):
+    """Get tenant-wide staff attendance for a day in one conditional-aggregation query"""
+    if request.user.role not in ['super_admin', 'tenant_admin']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        date = _date_param(request, 'date', datetime.now().date())
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # LEFT JOIN each active teacher to that day's record only, via the (teacher, date) index
+    summary = Teacher.objects.filter(
+        tenant=request.user.tenant,
+        is_active=True
+    ).annotate(
+        day_attendance=FilteredRelation(
+            'attendances',
+            condition=Q(attendances__date=date, attendances__tenant=request.user.tenant)
+        )
+    ).aggregate(
+        total_teachers=Count('id'),
+        present=Count('id', filter=Q(day_attendance__status='present')),
+        absent=Count('id', filter=Q(day_attendance__status='absent')),
+        late=Count('id', filter=Q(day_attendance__status='late')),
+        half_day=Count('id', filter=Q(day_attendance__status='half_day')),
+        on_leave=Count('id', filter=Q(day_attendance__status='on_leave')),
+        unmarked=Count('id', filter=Q(day_attendance__id__isnull=True)),
+    )
+    
+    total = summary['total_teachers']
+    attending = summary['present'] + summary['late'] + summary['half_day']
+    summary['attendance_percentage'] = round(attending / total * 100, 2) if total else 0
+    summary['date'] = date
+    
+    return Response(summary, status=status.HTTP_200_OK)
@@ -0,0 +1,277 @@
+"""
+API benchmark harness.
+
+Runs a weighted mix of real API calls (logins, attendance marking, parent
+and admin dashboards, timetable reads, library search) against schools
+created by `python create_sample_data.py --tenants N --students M` and
+reports p50/p95/p99 latency and SQL queries per endpoint. Query counts come
+from the Server-Timing header added by QueryInstrumentationMiddleware.
+
+Requests go through Django's test client in-process by default, or over
+HTTP with --base-url (e.g. a local gunicorn). Either way the script reads
+the benchmark users from the database configured for Django, so point it at
+the same SQLite file or PostgreSQL database as the server.
+
+    python benchmark.py --requests 2000 --concurrency 4 --output before.json
+    python benchmark.py --requests 2000 --concurrency 4 --compare before.json
+
+--serve starts gunicorn (gunicorn.conf.py) itself, which makes comparing the
+WSGI and ASGI deployments a matter of two runs:
+
+    python benchmark.py --serve wsgi --concurrency 16 --output wsgi.json
+    python benchmark.py --serve asgi --concurrency 16 --compare wsgi.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from urllib import error, request as urlrequest
+
+# Setup Django
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_management.settings')
+import django
+django.setup()
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from exams.models import Exam
+from parents.models import Parent, StudentParent
+from school_classes.models import SchoolClass
+from students.models import Student
+from teachers.models import Teacher
+from tenants.models import Tenant
+from tenants.seeding import BENCH_DOMAIN, BENCH_PASSWORD, BOOK_WORDS, school_days
+from school_management.traffic import Target, format_report, queries_from, summarize
+
+
+class School:
+    """Users and ids of one benchmark tenant, with JWTs minted up front"""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        users = User.objects.filter(tenant=tenant, email__endswith=f'@{BENCH_DOMAIN}', is_active=True)
+        self.admin = users.filter(role='tenant_admin').first()
+        self.teachers = list(users.filter(role='teacher')[:50])
+        self.students = list(Student.objects.filter(tenant=tenant, is_active=True).select_related('user')[:200])
+        self.parents = list(Parent.objects.filter(tenant=tenant).select_related('user')[:200])
+        self.children = defaultdict(list)
+        for parent_id, student_id in StudentParent.objects.filter(
+                tenant=tenant, parent__in=[parent.id for parent in self.parents]).values_list('parent_id', 'student_id'):
+            self.children[parent_id].append(str(student_id))
+        self.classes = list(SchoolClass.objects.filter(tenant=tenant))
+        self.class_students = defaultdict(list)
+        for student_id, class_id in Student.objects.filter(tenant=tenant, is_active=True).values_list('id', 'school_class_id'):
+            self.class_students[class_id].append(str(student_id))
+        self.teacher_ids = [str(teacher_id) for teacher_id in Teacher.objects.filter(tenant=tenant).values_list('id', flat=True)]
+        self.exams = [str(exam_id) for exam_id in Exam.objects.filter(tenant=tenant).values_list('id', flat=True)]
+        self.tokens = {}
+
+    def headers(self, user=None):
+        headers = {'X-Tenant-ID': str(self.tenant.id)}
+        if user is not None:
+            token = self.tokens.get(user.id)
+            if token is None:
+                token = self.tokens[user.id] = str(RefreshToken.for_user(user).access_token)
+            headers['Authorization'] = f'Bearer {token}'
+        return headers
+
+
+# Workload: name -> (weight, function(school) -> (method, path, user, data))
+
+def login(school):
+    user = random.choice(school.students).user
+    return 'POST', '/api/auth/login/', None, {'email': user.email, 'password': BENCH_PASSWORD}
+
+
+def mark_attendance(school):
+    school_class = random.choice(school.classes)
+    records = [
+        {'student_id': student_id, 'status': random.choice(['present'] * 9 + ['absent'])}
+        for student_id in school.class_students[school_class.id]
+    ]
+    data = {'date': date.today().isoformat(), 'attendance_records': records}
+    return 'POST', '/api/attendance/mark/', random.choice(school.teachers), data
+
+
+def parent_dashboard(school):
+    return 'GET', '/api/parents/dashboard/attendance/', random.choice(school.parents).user, None
+
+
+def child_overview(school):
+    parent = random.choice([parent for parent in school.parents if parent.id in school.children])
+    student_id = random.choice(school.children[parent.id])
+    return 'GET', f'/api/parents/child/{student_id}/overview/', parent.user, None
+
+
+def student_results(school):
+    student = random.choice(school.students)
+    return 'GET', f'/api/exams/results/student/{student.id}/', school.admin, None
+
+
+def class_timetable(school):
+    school_class = random.choice(school.classes)
+    path = f'/api/timetable/entries/class_timetable/?class_name={school_class.class_name}&section={school_class.section}'
+    return 'GET', path.replace(' ', '%20'), random.choice(school.teachers), None
+
+
+def my_timetable(school):
+    return 'GET', '/api/timetable/entries/my_timetable/', random.choice(school.students).user, None
+
+
+def library_search(school):
+    return 'GET', f'/api/library/books/?search={random.choice(BOOK_WORDS).lower()}', random.choice(school.students).user, None
+
+
+def class_statistics(school):
+    return 'GET', '/api/classes/statistics/', school.admin, None
+
+
+def library_stats(school):
+    return 'GET', '/api/library/books/stats/', school.admin, None
+
+
+def class_attendance(school):
+    school_class = random.choice(school.classes)
+    day = random.choice(school_days(20))
+    return 'GET', f'/api/attendance/class/stats/?class_id={school_class.id}&date={day.isoformat()}', school.admin, None
+
+
+def exam_results(school):
+    return 'GET', f'/api/exams/results/exam/{random.choice(school.exams)}/', school.admin, None
+
+
+def teacher_timetable(school):
+    return 'GET', f'/api/timetable/entries/?teacher_id={random.choice(school.teacher_ids)}', school.admin, None
+
+
+def library_issues(school):
+    return 'GET', f"/api/library/issues/?status={random.choice(['issued', 'returned'])}", school.admin, None
+
+
+WORKLOAD = {
+    'login': (1, login),
+    'mark_attendance': (2, mark_attendance),
+    'parent_dashboard': (4, parent_dashboard),
+    'child_overview': (3, child_overview),
+    'student_results': (2, student_results),
+    'class_timetable': (3, class_timetable),
+    'my_timetable': (4, my_timetable),
+    'library_search': (2, library_search),
+    'class_statistics': (1, class_statistics),
+    'library_stats': (1, library_stats),
+    'class_attendance': (2, class_attendance),
+    'exam_results': (1, exam_results),
+    'teacher_timetable': (2, teacher_timetable),
+    'library_issues': (1, library_issues),
+}
+
+
+def run(target, schools, total, concurrency, workload):
+    names = list(workload)
+    weights = [workload[name][0] for name in names]
+    plan = random.choices(names, weights=weights, k=total)
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def one(name):
+        school = random.choice(schools)
+        method, path, user, data = workload[name][1](school)
+        start = time.perf_counter()
+        status_code, server_timing = target.send(method, path, school.headers(user), data)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            samples[name].append((elapsed, queries_from(server_timing), status_code))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, plan))
+    wall = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'seconds': round(wall, 2),
+        'throughput': round(total / wall, 1),
+        'endpoints': summarize({name: samples[name] for name in names if name in samples}),
+    }
+
+
+@contextmanager
+def serve(interface, workers, port):
+    """Run gunicorn with gunicorn.conf.py for the given interface; yields its URL"""
+    env = {**os.environ, 'SERVER_INTERFACE': interface, 'PORT': str(port)}
+    process = subprocess.Popen(
+        ['gunicorn', '--workers', str(workers)], cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    try:
+        while True:
+            try:
+                urlrequest.urlopen(base_url + '/metrics/', timeout=1).close()
+                break
+            except error.HTTPError:
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    sys.exit(f'gunicorn ({interface}) did not start')
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--base-url', help='Benchmark a running server instead of the in-process client')
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help='Start gunicorn for this interface and benchmark it')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers with --serve')
+    parser.add_argument('--port', type=int, default=8765, help='gunicorn port with --serve')
+    parser.add_argument('--tenants', type=int, default=5, help='Spread load over at most this many benchmark schools')
+    parser.add_argument('--only', help='Comma-separated workload names to run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the report as JSON')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare p95 against')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    tenants = Tenant.objects.filter(email__endswith=f'@{BENCH_DOMAIN}', is_active=True)[:args.tenants]
+    schools = [school for school in map(School, tenants) if school.students and school.teachers]
+    if not schools:
+        sys.exit('No benchmark schools found; run `python create_sample_data.py --tenants 1 --students 500` first')
+
+    workload = WORKLOAD
+    if args.only:
+        workload = {name: WORKLOAD[name] for name in args.only.split(',')}
+
+    if args.serve:
+        with serve(args.serve, args.workers, args.port) as base_url:
+            report = run(Target(base_url), schools, args.requests, args.concurrency, workload)
+    else:
+        report = run(Target(args.base_url), schools, args.requests, args.concurrency, workload)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
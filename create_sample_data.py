@@ -5,7 +5,13 @@ Create sample data for testing
 - 1 Teacher
 - 1 Student
 - 1 Parent
+
+With --tenants/--students it instead creates benchmark schools through
+tenants.seeding (see also `manage.py seed_data`), e.g.:
+
+    python create_sample_data.py --tenants 3 --students 2000 --days 30
 """
+import argparse
 import os
 import django
 import sys
@@ -21,6 +27,7 @@ from teachers.models import Teacher
 from students.models import Student
 from parents.models import Parent, StudentParent
 from school_classes.models import SchoolClass
+from tenants.seeding import seed
 from django.utils import timezone
 import uuid
 
@@ -275,5 +282,22 @@ def create_sample_data():
     print(f"   👨‍👩‍👧 Parent: {parent_user.full_name}")
     print("\n🔑 All passwords: Check TEST_CREDENTIALS.md")
 
+def create_bulk_data(tenants=1, students=500, days=20, exams=1):
+    """Create benchmark schools; all users share tenants.seeding.BENCH_PASSWORD"""
+    def progress(name, counts, seconds):
+        print(f"   ✅ {name}: {sum(counts.values())} rows in {seconds:.1f}s")
+
+    return seed(tenants, students, days, exams, progress=progress)
+
+
 if __name__ == '__main__':
-    create_sample_data()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', type=int, help='Create this many benchmark schools')
+    parser.add_argument('--students', type=int, default=500, help='Students per school')
+    parser.add_argument('--days', type=int, default=20, help='School days of attendance')
+    parser.add_argument('--exams', type=int, default=1, help='Fully marked exams per school')
+    args = parser.parse_args()
+    if args.tenants:
+        create_bulk_data(args.tenants, args.students, args.days, args.exams)
+    else:
+        create_sample_data()
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_exam_class_name_exam_section'),
+        ('students', '0004_promotionrun'),
+        ('tenants', '0002_partition_large_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['tenant', 'exam_subject'], name='results_tenant__d910b7_idx'),
+        ),
+    ]
@@ -76,6 +76,8 @@ class Result(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['tenant', 'student']),
+            # Results of one exam (exam_subject__exam_id) without reading the school's whole history
+            models.Index(fields=['tenant', 'exam_subject']),
         ]
     
     def __str__(self):
@@ -11,6 +11,7 @@ from .serializers import (
     ResultSerializer,
     AdmitCardSerializer
 )
+from school_management.routers import replica_reads
 
 
 @api_view(['GET', 'POST'])
@@ -187,6 +188,7 @@ def mark_entry(request):
         )
 
 
+@replica_reads
 @api_view(['GET'])
 def student_results(request, student_id):
     """Get all results for a student"""
@@ -202,6 +204,7 @@ def student_results(request, student_id):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@replica_reads
 @api_view(['GET'])
 def exam_results(request, exam_id):
     """Get all results for an exam"""
@@ -0,0 +1,78 @@
+"""
+gunicorn settings, read automatically when gunicorn starts in this directory.
+Every setting can be overridden through the environment:
+
+SERVER_INTERFACE            wsgi (default) or asgi. asgi serves
+                            school_management.asgi on uvicorn workers, so the
+                            async dashboard views overlap their queries
+WEB_CONCURRENCY             worker processes; CPUs + 1 for wsgi, CPUs for asgi
+GUNICORN_THREADS            threads per wsgi worker (default 2; 1 = sync worker)
+GUNICORN_PRELOAD            import the app once in the master and fork (default on)
+GUNICORN_MAX_REQUESTS       recycle a worker after this many requests (default 1000,
+                            0 = never), spread by GUNICORN_MAX_REQUESTS_JITTER
+GUNICORN_TIMEOUT            seconds before a silent worker is killed (default 30)
+GUNICORN_GRACEFUL_TIMEOUT   seconds a worker gets to finish on restart (default 30)
+GUNICORN_KEEPALIVE          seconds to hold idle keep-alive connections (default 5)
+GUNICORN_WARMUP             prime each worker before it takes traffic (default on),
+                            see school_management/warmup.py
+
+Each worker thread holds its own database connection; keep
+workers x threads below the database's limit or use the connection pool
+settings in settings.py (DB_POOL_MAX_SIZE, DB_EXTERNAL_POOLER).
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+cpus = multiprocessing.cpu_count()
+
+if os.environ.get('SERVER_INTERFACE', 'wsgi') == 'asgi':
+    wsgi_app = 'school_management.asgi:application'
+    worker_class = 'school_management.workers.DjangoUvicornWorker'
+    workers = _int('WEB_CONCURRENCY', cpus)
+else:
+    wsgi_app = 'school_management.wsgi:application'
+    workers = _int('WEB_CONCURRENCY', cpus + 1)
+    # More than one thread makes gunicorn use its gthread worker
+    threads = _int('GUNICORN_THREADS', 2)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+preload_app = _bool('GUNICORN_PRELOAD', True)
+max_requests = _int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+timeout = _int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+warmup = _bool('GUNICORN_WARMUP', True)
+
+
+def post_worker_init(worker):
+    # In the worker rather than the preloaded master: database connections
+    # (and a psycopg pool's threads) must not be shared across the fork
+    if not warmup:
+        return
+    from school_management.warmup import warm_up
+    try:
+        worker.log.info('Warmup: %s', warm_up())
+    except Exception:
+        worker.log.exception('Warmup failed; serving cold')
+
+
+def worker_exit(server, worker):
+    # Runs in the exiting worker: write its final metrics so the requests it
+    # served since the last periodic flush are not lost
+    try:
+        from django.conf import settings
+        if settings.METRICS_DIR:
+            from school_management.metrics import flush
+            flush()
+    except Exception:
+        worker.log.exception('Final metrics flush failed')
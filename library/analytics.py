@@ -0,0 +1,116 @@
+"""
+Circulation analytics.
+
+One streamed pass over a tenant's BookIssue history, ordered by borrower,
+produces three outputs:
+
+- most-borrowed titles per class (borrowers mapped through Student),
+- issues per category per month,
+- sparse book/book co-occurrence counts from each borrower's set of books,
+  reduced to the top-k per book and stored in BookRecommendation.
+
+Only the counters are held in memory; issue rows are never materialized.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from students.models import Student
+from .models import Book, BookIssue, BookRecommendation, CirculationSnapshot
+
+
+TOP_K = 10
+
+POPULAR_PER_CLASS = 10
+
+# Borrowers with longer histories only contribute their most recent books,
+# keeping the pair count per borrower bounded
+MAX_BASKET = 200
+
+CHUNK_SIZE = 2000
+
+
+def _class_label(class_name, section):
+    return f"{class_name}-{section}" if section else class_name
+
+
+def build_analytics(tenant):
+    """Rebuild recommendations and the circulation snapshot for a tenant"""
+    user_classes = {
+        user_id: _class_label(class_name, section)
+        for user_id, class_name, section in Student.objects.filter(tenant=tenant).values_list(
+            'user_id', 'class_name', 'section'
+        )
+    }
+
+    by_class = defaultdict(Counter)
+    category_demand = defaultdict(Counter)
+    co_counts = defaultdict(Counter)
+    processed = 0
+
+    def flush(basket):
+        books = list(basket)[-MAX_BASKET:]
+        for i, book_id in enumerate(books):
+            for other_id in books[i + 1:]:
+                co_counts[book_id][other_id] += 1
+                co_counts[other_id][book_id] += 1
+
+    issues = BookIssue.objects.filter(tenant=tenant).order_by('user_id', 'issue_date').values_list(
+        'user_id', 'book_id', 'book__category', 'issue_date'
+    )
+    current_user = None
+    basket = {}
+    for user_id, book_id, category, issue_date in issues.iterator(chunk_size=CHUNK_SIZE):
+        processed += 1
+        if user_id != current_user:
+            flush(basket)
+            current_user = user_id
+            basket = {}
+        # dict keeps first-borrow order and drops repeat borrows of a title
+        basket.setdefault(book_id, None)
+        category_demand[category][issue_date.strftime('%Y-%m')] += 1
+        label = user_classes.get(user_id)
+        if label:
+            by_class[label][book_id] += 1
+    flush(basket)
+
+    popular = {
+        label: counts.most_common(POPULAR_PER_CLASS) for label, counts in by_class.items()
+    }
+    titled_ids = {book_id for top in popular.values() for book_id, _ in top}
+    titles = dict(Book.objects.filter(id__in=titled_ids).values_list('id', 'title'))
+
+    recommendations = []
+    for book_id, counts in co_counts.items():
+        top = heapq.nlargest(TOP_K, counts.items(), key=lambda item: (item[1], str(item[0])))
+        for rank, (other_id, score) in enumerate(top, start=1):
+            recommendations.append(BookRecommendation(
+                tenant=tenant,
+                book_id=book_id,
+                recommended_book_id=other_id,
+                score=score,
+                rank=rank
+            ))
+
+    with transaction.atomic():
+        BookRecommendation.objects.filter(tenant=tenant).delete()
+        BookRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+        snapshot, _ = CirculationSnapshot.objects.update_or_create(
+            tenant=tenant,
+            defaults={
+                'popular_by_class': {
+                    label: [
+                        {'book_id': str(book_id), 'title': titles.get(book_id, ''), 'issues': count}
+                        for book_id, count in top
+                    ]
+                    for label, top in sorted(popular.items())
+                },
+                'category_demand': {
+                    category: dict(sorted(months.items()))
+                    for category, months in sorted(category_demand.items())
+                },
+                'issues_processed': processed,
+            }
+        )
+    return snapshot
@@ -0,0 +1,222 @@
+"""
+Book issue and return.
+
+Copy counts are only ever changed with conditional UPDATEs on the book row
+(available_copies > 0 to issue, F() + n to return), and issue records are
+locked with select_for_update before a return, so concurrent desk requests
+can neither overbook a title nor return the same issue twice.
+"""
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+from rest_framework import status
+
+from accounts.models import User
+from .models import Book, BookIssue
+
+
+# 1 rupee per day after the due date
+FINE_PER_DAY = 1
+
+
+class CirculationError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _claim_copy(tenant, book_id):
+    """Take one copy of a book, or raise if none is left"""
+    claimed = Book.objects.filter(id=book_id, tenant=tenant, available_copies__gt=0).update(
+        available_copies=F('available_copies') - 1,
+        updated_at=timezone.now()
+    )
+    if not claimed:
+        if Book.objects.filter(id=book_id, tenant=tenant).exists():
+            raise CirculationError('No copies available for this book')
+        raise CirculationError('Book not found', status.HTTP_404_NOT_FOUND)
+
+
+def _check_user(user_id):
+    if not User.objects.filter(id=user_id).exists():
+        raise CirculationError('User not found', status.HTTP_404_NOT_FOUND)
+
+
+def issue_book(tenant, book_id, user_id, duration_weeks, remarks=''):
+    """Issue a single copy of a book"""
+    _check_user(user_id)
+
+    issue_date = timezone.now().date()
+    with transaction.atomic():
+        _claim_copy(tenant, book_id)
+        return BookIssue.objects.create(
+            tenant=tenant,
+            book_id=book_id,
+            user_id=user_id,
+            issue_date=issue_date,
+            due_date=issue_date + timedelta(weeks=duration_weeks),
+            status='issued',
+            remarks=remarks
+        )
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def issue_books(tenant, books, user_id, duration_weeks, remarks=''):
+    """
+    Issue several books, given by id or ISBN, to one borrower.
+
+    Returns (issues, errors); books that cannot be issued are reported per
+    index and do not stop the rest of the batch.
+    """
+    _check_user(user_id)
+
+    ids = []
+    isbns = []
+    for value in books:
+        (ids if _is_uuid(value) else isbns).append(value)
+    found = {}
+    for book_id, isbn in Book.objects.filter(tenant=tenant).filter(
+        Q(id__in=ids) | Q(isbn__in=isbns)
+    ).values_list('id', 'isbn'):
+        found[str(book_id)] = book_id
+        found[isbn] = book_id
+
+    issue_date = timezone.now().date()
+    due_date = issue_date + timedelta(weeks=duration_weeks)
+    issues = []
+    errors = []
+    with transaction.atomic():
+        for index, value in enumerate(books):
+            book_id = found.get(str(value))
+            if book_id is None:
+                errors.append({'index': index, 'book': value, 'error': 'Book not found'})
+                continue
+            try:
+                _claim_copy(tenant, book_id)
+            except CirculationError as e:
+                errors.append({'index': index, 'book': value, 'error': e.message})
+                continue
+            issues.append(BookIssue(
+                tenant=tenant,
+                book_id=book_id,
+                user_id=user_id,
+                issue_date=issue_date,
+                due_date=due_date,
+                status='issued',
+                remarks=remarks
+            ))
+        BookIssue.objects.bulk_create(issues)
+    return issues, errors
+
+
+def overdue_fine(due_date, on_date=None):
+    """Fine owed for an issue due on due_date if it is returned on on_date (default today)"""
+    on_date = on_date or timezone.now().date()
+    return max(0, (on_date - due_date).days) * FINE_PER_DAY
+
+
+def accrue_fines(today=None, tenant=None, chunk_size=500):
+    """
+    Bring fine_amount of every open overdue issue up to date.
+
+    Issues sharing a due date owe the same fine, so each chunk of distinct
+    due dates is written with a single CASE UPDATE. Returns the number of
+    issues updated.
+    """
+    today = today or timezone.now().date()
+    open_overdue = BookIssue.objects.filter(status='issued', due_date__lt=today)
+    if tenant is not None:
+        open_overdue = open_overdue.filter(tenant=tenant)
+
+    due_dates = list(open_overdue.values_list('due_date', flat=True).distinct().order_by('due_date'))
+    updated = 0
+    for start in range(0, len(due_dates), chunk_size):
+        chunk = due_dates[start:start + chunk_size]
+        updated += open_overdue.filter(due_date__in=chunk).update(
+            fine_amount=Case(
+                *[When(due_date=due_date, then=Value(overdue_fine(due_date, today))) for due_date in chunk],
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+    return updated
+
+
+def _close_issue(issue, condition, remarks, return_date):
+    issue.fine_amount = overdue_fine(issue.due_date, return_date)
+    issue.return_date = return_date
+    if condition == 'lost':
+        issue.status = 'lost'
+    elif condition == 'damaged':
+        issue.status = 'damaged'
+    else:
+        issue.status = 'returned'
+    if remarks:
+        issue.remarks = remarks
+
+
+def _restock(returned_book_ids):
+    # Only books returned in good condition go back on the shelf
+    for book_id, count in Counter(returned_book_ids).items():
+        Book.objects.filter(id=book_id).update(
+            available_copies=F('available_copies') + count,
+            updated_at=timezone.now()
+        )
+
+
+def return_book(tenant, issue_id, condition='good', remarks=''):
+    """Close an issue and put the copy back if it came back in good condition"""
+    with transaction.atomic():
+        try:
+            issue = BookIssue.objects.select_for_update().get(id=issue_id, tenant=tenant)
+        except BookIssue.DoesNotExist:
+            raise CirculationError('Issue record not found', status.HTTP_404_NOT_FOUND)
+        if issue.status != 'issued':
+            raise CirculationError('Book is not currently issued')
+
+        _close_issue(issue, condition, remarks, timezone.now().date())
+        issue.save()
+        if issue.status == 'returned':
+            _restock([issue.book_id])
+    return issue
+
+
+def return_books(tenant, items):
+    """
+    Close several issues at once; items are dicts with issue_id, condition
+    and remarks. Returns (issues, errors) like issue_books.
+    """
+    return_date = timezone.now().date()
+    issues = []
+    errors = []
+    with transaction.atomic():
+        locked = BookIssue.objects.select_for_update().filter(
+            tenant=tenant,
+            id__in=[item['issue_id'] for item in items]
+        ).in_bulk()
+        for index, item in enumerate(items):
+            issue = locked.get(item['issue_id'])
+            if issue is None:
+                errors.append({'index': index, 'issue_id': str(item['issue_id']), 'error': 'Issue record not found'})
+                continue
+            if issue.status != 'issued':
+                errors.append({'index': index, 'issue_id': str(item['issue_id']), 'error': 'Book is not currently issued'})
+                continue
+            _close_issue(issue, item.get('condition', 'good'), item.get('remarks', ''), return_date)
+            issues.append(issue)
+
+        BookIssue.objects.bulk_update(issues, ['status', 'return_date', 'fine_amount', 'remarks'])
+        _restock([issue.book_id for issue in issues if issue.status == 'returned'])
+    return issues, errors
+
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from library.circulation import accrue_fines
+
+
+class Command(BaseCommand):
+    help = (
+        'Update fine_amount on all open overdue book issues; the API serves it as their fine, '
+        'so run this daily'
+    )
+
+    def handle(self, *args, **options):
+        updated = accrue_fines()
+        self.stdout.write(self.style.SUCCESS(f'Updated fines on {updated} overdue issues'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from library.analytics import build_analytics
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Rebuild library circulation analytics and book recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, help='Only rebuild for one tenant ID')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        for tenant in tenants.iterator():
+            snapshot = build_analytics(tenant)
+            self.stdout.write(self.style.SUCCESS(
+                f'{tenant.name}: {snapshot.issues_processed} issues processed'
+            ))
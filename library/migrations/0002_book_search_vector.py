@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:35
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from school_management.migration_utils import run_on_postgres
+
+
+FORWARD_SQL = '''
+CREATE OR REPLACE FUNCTION library_books_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.category, '') || ' ' ||
+                                        coalesce(NEW.isbn, '') || ' ' ||
+                                        coalesce(NEW.publisher, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER library_books_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON library_books
+    FOR EACH ROW EXECUTE FUNCTION library_books_search_vector_update();
+
+UPDATE library_books SET title = title;
+
+CREATE INDEX library_books_search_vector_gin ON library_books USING gin (search_vector);
+CREATE INDEX library_books_title_trgm ON library_books USING gin (title gin_trgm_ops);
+CREATE INDEX library_books_author_trgm ON library_books USING gin (author gin_trgm_ops);
+'''
+
+REVERSE_SQL = '''
+DROP INDEX IF EXISTS library_books_author_trgm;
+DROP INDEX IF EXISTS library_books_title_trgm;
+DROP INDEX IF EXISTS library_books_search_vector_gin;
+DROP TRIGGER IF EXISTS library_books_search_vector_trigger ON library_books;
+DROP FUNCTION IF EXISTS library_books_search_vector_update();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        TrigramExtension(),
+        # Other backends fall back to the in-memory index in library.search
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
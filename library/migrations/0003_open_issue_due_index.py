@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_book_search_vector'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(condition=models.Q(('status', 'issued')), fields=['tenant', 'due_date'], name='library_open_issue_due_idx'),
+        ),
+    ]
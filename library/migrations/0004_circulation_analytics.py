@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:39
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_open_issue_due_index'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('popular_by_class', models.JSONField(default=dict)),
+                ('category_demand', models.JSONField(default=dict)),
+                ('issues_processed', models.IntegerField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='circulation_snapshot', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'library_circulation_snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookRecommendation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('score', models.IntegerField(help_text='Number of borrowers who borrowed both books')),
+                ('rank', models.IntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='library.book')),
+                ('recommended_book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.book')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'library_book_recommendations',
+                'ordering': ['book', 'rank'],
+                'indexes': [models.Index(fields=['book', 'rank'], name='library_boo_book_id_03af98_idx')],
+                'unique_together': {('book', 'recommended_book')},
+            },
+        ),
+    ]
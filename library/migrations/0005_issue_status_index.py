@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_circulation_analytics'),
+        ('tenants', '0002_partition_large_tables'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookissue',
+            index=models.Index(fields=['tenant', 'status', 'issue_date'], name='library_boo_tenant__ad2179_idx'),
+        ),
+    ]
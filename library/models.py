@@ -1,4 +1,5 @@
 import uuid
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -16,6 +17,8 @@ class Book(models.Model):
     total_copies = models.IntegerField(default=1)
     available_copies = models.IntegerField(default=1)
     shelf_location = models.CharField(max_length=50, blank=True, null=True)
+    # Maintained by a database trigger on PostgreSQL (see library.search)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -55,7 +58,52 @@ class BookIssue(models.Model):
         ordering = ['-issue_date']
         indexes = [
             models.Index(fields=['tenant', 'user']),
+            # Issue list filtered by status, newest first (Meta.ordering), one page at a time
+            models.Index(fields=['tenant', 'status', 'issue_date']),
+            # Open issues only: overdue lists, stats and fine accrual
+            models.Index(
+                fields=['tenant', 'due_date'],
+                condition=models.Q(status='issued'),
+                name='library_open_issue_due_idx'
+            ),
         ]
     
     def __str__(self):
         return f"{self.book.title} issued to {self.user.full_name}"
+
+
+class BookRecommendation(models.Model):
+    """Precomputed 'borrowers of this book also borrowed' list, top-k per book"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.IntegerField(help_text='Number of borrowers who borrowed both books')
+    rank = models.IntegerField()
+    
+    class Meta:
+        db_table = 'library_book_recommendations'
+        ordering = ['book', 'rank']
+        unique_together = ['book', 'recommended_book']
+        indexes = [
+            models.Index(fields=['book', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_book_id} ({self.score})"
+
+
+class CirculationSnapshot(models.Model):
+    """Latest circulation analytics for a tenant, rebuilt by build_library_analytics"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.OneToOneField('tenants.Tenant', on_delete=models.CASCADE, related_name='circulation_snapshot')
+    popular_by_class = models.JSONField(default=dict)
+    category_demand = models.JSONField(default=dict)
+    issues_processed = models.IntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'library_circulation_snapshots'
+    
+    def __str__(self):
+        return f"Circulation snapshot for {self.tenant_id}"
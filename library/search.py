@@ -0,0 +1,171 @@
+"""
+Book catalog search.
+
+On PostgreSQL, Book.search_vector is kept up to date by a trigger (see
+migration 0002) and searched through a GIN index, ranked with ts_rank. Search
+matches whole words, where the old icontains filter matched any substring; a
+search with no whole-word match falls back to words starting with the query
+('harr' finds Harry), then to pg_trgm similarity for misspelt titles and
+authors. Substrings inside a word ('otter' in Potter) no longer match. Other
+backends (SQLite test runs) use an in-memory inverted index per tenant with
+the same fallbacks.
+"""
+import bisect
+import difflib
+import re
+import threading
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Greatest
+
+from .models import Book
+
+
+SEARCH_CONFIG = 'simple'
+
+TRIGRAM_THRESHOLD = 0.3
+
+# Field weights, mirroring the A/B/C weights set by the PostgreSQL trigger
+FIELD_WEIGHTS = (
+    ('title', 1.0),
+    ('author', 0.4),
+    ('category', 0.2),
+    ('isbn', 0.2),
+    ('publisher', 0.2),
+)
+
+MAX_FALLBACK_RESULTS = 1000
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def search_books(queryset, query, prefix=False):
+    """Filter a Book queryset by a search string, best matches first"""
+    if not tokenize(query):
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, query, prefix)
+    return _memory_search(queryset, query, prefix)
+
+
+def _prefix_query(query):
+    # 'harr pot' -> 'harr:* & pot:*'
+    return SearchQuery(
+        ' & '.join(f'{token}:*' for token in tokenize(query)),
+        search_type='raw',
+        config=SEARCH_CONFIG
+    )
+
+
+def _ranked(queryset, query, search_query):
+    return queryset.filter(
+        Q(search_vector=search_query) | Q(isbn__startswith=query.strip())
+    ).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', 'title')
+
+
+def _postgres_search(queryset, query, prefix):
+    if prefix:
+        return _ranked(queryset, query, _prefix_query(query))
+
+    results = _ranked(queryset, query, SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG))
+    if results.exists():
+        return results
+
+    # Nothing matched word-for-word: try words starting with the query
+    results = _ranked(queryset, query, _prefix_query(query))
+    if results.exists():
+        return results
+
+    # Nothing matched word-for-word: fall back to trigram similarity for typos
+    return queryset.filter(
+        Q(title__trigram_similar=query) | Q(author__trigram_similar=query)
+    ).annotate(
+        rank=Greatest(TrigramSimilarity('title', query), TrigramSimilarity('author', query))
+    ).filter(rank__gte=TRIGRAM_THRESHOLD).order_by('-rank', 'title')
+
+
+class InMemoryBookIndex:
+    """Inverted index over a tenant's catalog for backends without full-text search"""
+
+    def __init__(self, tenant_id):
+        self.postings = {}
+        rows = Book.objects.filter(tenant_id=tenant_id).values_list(
+            'id', *[field for field, _ in FIELD_WEIGHTS]
+        )
+        for book_id, *values in rows:
+            for (_, weight), value in zip(FIELD_WEIGHTS, values):
+                for token in tokenize(value):
+                    book_scores = self.postings.setdefault(token, {})
+                    book_scores[book_id] = book_scores.get(book_id, 0) + weight
+        self.tokens = sorted(self.postings)
+
+    def _expand(self, token, prefix):
+        if not prefix and token in self.postings:
+            return [token]
+        # Type-ahead, or no whole-word match: words starting with the token
+        start = bisect.bisect_left(self.tokens, token)
+        end = bisect.bisect_left(self.tokens, token + '\uffff')
+        return self.tokens[start:end]
+
+    def search(self, query, prefix=False):
+        """Return book ids matching every query token, best first"""
+        scores = None
+        for token in tokenize(query):
+            matches = self._expand(token, prefix)
+            if not matches:
+                # Fuzzy fallback, the in-memory stand-in for trigram similarity
+                matches = difflib.get_close_matches(token, self.tokens, n=5, cutoff=0.75)
+            token_scores = {}
+            for match in matches:
+                for book_id, score in self.postings[match].items():
+                    token_scores[book_id] = max(token_scores.get(book_id, 0), score)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    book_id: score + token_scores[book_id]
+                    for book_id, score in scores.items() if book_id in token_scores
+                }
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return [book_id for book_id, _ in ranked[:MAX_FALLBACK_RESULTS]]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_memory_index(tenant_id):
+    with _indexes_lock:
+        index = _indexes.get(tenant_id)
+    if index is None:
+        index = InMemoryBookIndex(tenant_id)
+        with _indexes_lock:
+            _indexes[tenant_id] = index
+    return index
+
+
+def invalidate_memory_index(tenant_id):
+    with _indexes_lock:
+        _indexes.pop(tenant_id, None)
+
+
+def _memory_search(queryset, query, prefix):
+    tenant_ids = set(queryset.values_list('tenant_id', flat=True).distinct())
+    book_ids = []
+    for tenant_id in tenant_ids:
+        book_ids.extend(get_memory_index(tenant_id).search(query, prefix))
+    if not book_ids:
+        return queryset.none()
+    order = Case(
+        *[When(id=book_id, then=position) for position, book_id in enumerate(book_ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(id__in=book_ids).annotate(rank=order).order_by('rank')
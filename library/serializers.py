@@ -31,7 +31,9 @@ class BookIssueSerializer(serializers.ModelSerializer):
     book_details = BookSerializer(source='book', read_only=True)
     user_details = serializers.SerializerMethodField()
     days_overdue = serializers.SerializerMethodField()
-    calculated_fine = serializers.SerializerMethodField()
+    # Set on return, and for open issues by the nightly accrue_library_fines
+    # job, so an open issue's fine can be up to a day behind
+    calculated_fine = serializers.FloatField(source='fine_amount', read_only=True)
     
     class Meta:
         model = BookIssue
@@ -59,13 +61,6 @@ class BookIssueSerializer(serializers.ModelSerializer):
         if today > obj.due_date:
             return (today - obj.due_date).days
         return 0
-    
-    def get_calculated_fine(self, obj):
-        days_overdue = self.get_days_overdue(obj)
-        if days_overdue > 0:
-            # 1 rupee per day after due date
-            return float(days_overdue)
-        return 0.0
 
 
 class IssueBookSerializer(serializers.Serializer):
@@ -88,3 +83,19 @@ class ReturnBookSerializer(serializers.Serializer):
         default='good'
     )
     remarks = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkIssueBookSerializer(serializers.Serializer):
+    books = serializers.ListField(
+        child=serializers.CharField(max_length=64),
+        allow_empty=False,
+        max_length=100,
+        help_text='Book ids or ISBNs, as scanned'
+    )
+    user_id = serializers.UUIDField()
+    duration_weeks = serializers.IntegerField(min_value=1, max_value=12)
+    remarks = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkReturnBookSerializer(serializers.Serializer):
+    returns = ReturnBookSerializer(many=True, allow_empty=False, max_length=100)
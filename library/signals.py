@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Book
+from . import search
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_search_index(sender, instance, **kwargs):
+    search.invalidate_memory_index(instance.tenant_id)
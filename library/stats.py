@@ -0,0 +1,35 @@
+"""
+Library statistics, computed with one aggregate over the book table and one
+over open issues (served by the partial open-issue index).
+
+outstanding_fines sums the stored fine_amount, which accrue_library_fines
+brings up to date once a day, so it lags by up to a day's fines.
+"""
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Book, BookIssue
+
+
+def library_stats(tenant):
+    today = timezone.now().date()
+
+    books = Book.objects.filter(tenant=tenant).aggregate(
+        total_books=Count('id'),
+        total_copies=Sum('total_copies'),
+        available_copies=Sum('available_copies'),
+    )
+    issues = BookIssue.objects.filter(tenant=tenant, status='issued').aggregate(
+        issued_count=Count('id'),
+        overdue_count=Count('id', filter=Q(due_date__lt=today)),
+        outstanding_fines=Sum('fine_amount', filter=Q(due_date__lt=today)),
+    )
+
+    return {
+        'total_books': books['total_books'],
+        'total_copies': books['total_copies'] or 0,
+        'available_copies': books['available_copies'] or 0,
+        'issued_count': issues['issued_count'],
+        'overdue_count': issues['overdue_count'],
+        'outstanding_fines': float(issues['outstanding_fines'] or 0),
+    }
@@ -1,3 +1,288 @@
-from django.test import TestCase
+import threading
+import uuid
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from tenants.models import Tenant
+from .analytics import build_analytics
+from .models import Book, BookIssue, CirculationSnapshot
+from .search import search_books
+from .serializers import BookIssueSerializer
+from .stats import library_stats
+from . import circulation, search
+
+
+class CirculationFixtureMixin:
+    THREADS = 20
+    COPIES = 5
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name='Library School', email='library@school.test', school_code='LIB001'
+        )
+        self.book = Book.objects.create(
+            tenant=self.tenant, title='Popular Title', author='Author',
+            isbn='9780000000001', category='Fiction',
+            total_copies=self.COPIES, available_copies=self.COPIES
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f'borrower{i}@school.test', password=None, first_name='B',
+                last_name=str(i), role='student', tenant=self.tenant
+            )
+            for i in range(self.THREADS)
+        ]
+
+
+class BulkCirculationTests(CirculationFixtureMixin, TestCase):
+    def test_bulk_issue_reports_unavailable_copies(self):
+        scans = [str(self.book.id)] * (self.COPIES + 2) + [self.book.isbn, str(uuid.uuid4())]
+        issues, errors = circulation.issue_books(self.tenant, scans, self.users[0].id, 1)
+
+        self.assertEqual(len(issues), self.COPIES)
+        self.assertEqual(len(errors), 4)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_bulk_return_restocks_good_copies_only(self):
+        issues, _ = circulation.issue_books(self.tenant, [self.book.isbn] * 3, self.users[0].id, 1)
+        returned, errors = circulation.return_books(self.tenant, [
+            {'issue_id': issues[0].id, 'condition': 'good'},
+            {'issue_id': issues[1].id, 'condition': 'lost'},
+            {'issue_id': issues[0].id, 'condition': 'good'},
+        ])
+
+        self.assertEqual(len(returned), 2)
+        self.assertEqual(len(errors), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, self.COPIES - 2)
+
+
+class FineTests(CirculationFixtureMixin, TestCase):
+    THREADS = 2
+
+    def issue(self, days_overdue, status='issued', fine_amount=0):
+        today = timezone.now().date()
+        return BookIssue.objects.create(
+            tenant=self.tenant, book=self.book, user=self.users[0], status=status, issue_date=today,
+            due_date=today - timedelta(days=days_overdue), fine_amount=fine_amount
+        )
+
+    def test_open_issue_serves_accrued_fine(self):
+        # Stored fine from an accrual run three days ago
+        issue = self.issue(5, fine_amount=2)
+        self.assertEqual(BookIssueSerializer(issue).data['calculated_fine'], 2.0)
+
+        circulation.accrue_fines()
+        issue.refresh_from_db()
+
+        self.assertEqual(BookIssueSerializer(issue).data['calculated_fine'], 5.0)
+
+    def test_closed_issue_keeps_fine_from_return(self):
+        issue = self.issue(30, status='returned', fine_amount=4)
+        self.assertEqual(BookIssueSerializer(issue).data['calculated_fine'], 4.0)
+
+    def test_stats_outstanding_fines_after_accrual(self):
+        self.issue(5, fine_amount=2)
+        self.issue(5)
+        self.issue(1)
+        self.issue(-3)
+        self.issue(10, status='returned', fine_amount=10)
+        self.assertEqual(library_stats(self.tenant)['outstanding_fines'], 2.0)
+
+        self.assertEqual(circulation.accrue_fines(), 3)
+
+        stats = library_stats(self.tenant)
+        self.assertEqual(stats['overdue_count'], 3)
+        self.assertEqual(stats['outstanding_fines'], 11.0)
+
+
+class SearchTests(CirculationFixtureMixin, TestCase):
+    THREADS = 1
+
+    def setUp(self):
+        super().setUp()
+        self.stone = self.add_book('Harry Potter and the Stone', 'J. Rowling', '9780000000002')
+        self.potions = self.add_book('Potions Handbook', 'Harry Green', '9780000000003')
+
+    def add_book(self, title, author, isbn, tenant=None):
+        return Book.objects.create(
+            tenant=tenant or self.tenant, title=title, author=author, isbn=isbn,
+            category='Fiction', total_copies=1, available_copies=1
+        )
+
+    def titles(self, query, prefix=False, search_function=search_books):
+        return [book.title for book in search_function(Book.objects.filter(tenant=self.tenant), query, prefix)]
+
+    def test_title_matches_rank_above_author_matches(self):
+        self.assertEqual(self.titles('harry'), ['Harry Potter and the Stone', 'Potions Handbook'])
+
+    def test_partial_word_falls_back_to_prefix_match(self):
+        self.assertEqual(self.titles('harr'), ['Harry Potter and the Stone', 'Potions Handbook'])
+        self.assertEqual(self.titles('harry sto'), ['Harry Potter and the Stone'])
+
+    def test_isbn(self):
+        self.assertEqual(self.titles('9780000000003'), ['Potions Handbook'])
+
+    def test_other_tenants_books_are_not_found(self):
+        other = Tenant.objects.create(name='Other School', email='other@school.test', school_code='LIB002')
+        self.add_book('Harry Potter and the Flame', 'J. Rowling', '9780000000004', tenant=other)
+
+        self.assertEqual(self.titles('flame'), [])
+
+    def test_memory_index_tolerates_typos(self):
+        self.assertEqual(self.titles('pottr', search_function=search._memory_search), ['Harry Potter and the Stone'])
+
+    def test_memory_index_sees_new_books(self):
+        self.assertEqual(self.titles('handbook', search_function=search._memory_search), ['Potions Handbook'])
+        self.add_book('Chemistry Handbook', 'Ada Lab', '9780000000005')
+
+        self.assertEqual(
+            sorted(self.titles('handbook', search_function=search._memory_search)),
+            ['Chemistry Handbook', 'Potions Handbook']
+        )
+
+
+class SuggestTests(CirculationFixtureMixin, TestCase):
+    THREADS = 1
+
+    def suggest(self, **params):
+        client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        client.force_authenticate(self.users[0])
+        return client.get('/api/library/books/suggest/', {'q': 'pop', **params})
+
+    def test_suggests_books_starting_with_each_word(self):
+        Book.objects.create(
+            tenant=self.tenant, title='Popular Science', author='Writer', isbn='9780000000009',
+            category='Science', total_copies=1, available_copies=1
+        )
+
+        response = self.suggest(q='popular sci')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['title'] for book in response.data], ['Popular Science'])
+
+    def test_limit_is_clamped(self):
+        for limit in ('0', '-5', 'many', '500'):
+            response = self.suggest(limit=limit)
+            self.assertEqual(response.status_code, 200, limit)
+            self.assertEqual([book['title'] for book in response.data], ['Popular Title'], limit)
+
+
+class AnalyticsTests(CirculationFixtureMixin, TestCase):
+    THREADS = 3
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(
+            email='admin@library.test', first_name='Lib', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.books = [self.book] + [
+            Book.objects.create(
+                tenant=self.tenant, title=f'Title {i}', author='Author', isbn=f'978000000010{i}',
+                category='Science', total_copies=1, available_copies=1
+            )
+            for i in range(1, 4)
+        ]
+        # Everyone borrows the popular title; two of them also borrow Title 1, one Title 2
+        for user, extra in zip(self.users, ([1, 2], [1], [3])):
+            for book in [self.book] + [self.books[i] for i in extra]:
+                BookIssue.objects.create(
+                    tenant=self.tenant, book=book, user=user, issue_date=timezone.now().date(),
+                    due_date=timezone.now().date() + timedelta(days=14)
+                )
+
+    def get(self, path, user=None):
+        client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        client.force_authenticate(user or self.admin)
+        return client.get(path)
+
+    def test_recommendations_rank_books_borrowed_together(self):
+        build_analytics(self.tenant)
+
+        response = self.get(f'/api/library/books/{self.book.id}/recommendations/', self.users[0])
+
+        self.assertEqual(response.status_code, 200)
+        ranked = [(book['title'], book['score']) for book in response.data]
+        self.assertEqual(ranked[0], ('Title 1', 2))
+        # Ties are ordered by id
+        self.assertCountEqual(ranked[1:], [('Title 2', 1), ('Title 3', 1)])
+
+    def test_recommendations_of_unknown_books_are_not_found(self):
+        other = Tenant.objects.create(name='Other Library', email='other@library.test', school_code='LIB003')
+        foreign = Book.objects.create(
+            tenant=other, title='Elsewhere', author='Author', isbn='9780000000199', category='Fiction'
+        )
+        for pk in ('not-a-uuid', uuid.uuid4(), foreign.id):
+            self.assertEqual(self.get(f'/api/library/books/{pk}/recommendations/').status_code, 404, pk)
+
+    def test_analytics_are_built_once_for_admins_only(self):
+        self.assertEqual(self.get('/api/library/books/analytics/', self.users[0]).status_code, 403)
+        self.assertFalse(CirculationSnapshot.objects.exists())
+
+        response = self.get('/api/library/books/analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['issues_processed'], 7)
+        self.assertEqual(response.data['category_demand']['Fiction'], {timezone.now().strftime('%Y-%m'): 3})
+
+        BookIssue.objects.create(
+            tenant=self.tenant, book=self.books[2], user=self.users[2], issue_date=timezone.now().date(),
+            due_date=timezone.now().date() + timedelta(days=14)
+        )
+        self.assertEqual(self.get('/api/library/books/analytics/').data['issues_processed'], 7)
+        self.assertEqual(self.get('/api/library/books/analytics/?refresh=true').data['issues_processed'], 8)
+
+
+# SQLite serializes writers with table locks rather than row locks, so the
+# concurrency tests only run against PostgreSQL
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCirculationTests(CirculationFixtureMixin, TransactionTestCase):
+    """Many desks issuing and returning the same title at once"""
+
+    def _hammer(self, target, args_list):
+        barrier = threading.Barrier(len(args_list))
+        results = []
+
+        def run(args):
+            barrier.wait()
+            try:
+                results.append(target(*args))
+            except circulation.CirculationError as e:
+                results.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(args,)) for args in args_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_issues_never_overbook(self):
+        results = self._hammer(circulation.issue_book, [
+            (self.tenant, self.book.id, user.id, 2) for user in self.users
+        ])
+
+        issued = [r for r in results if isinstance(r, BookIssue)]
+        self.assertEqual(len(issued), self.COPIES)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(BookIssue.objects.filter(book=self.book, status='issued').count(), self.COPIES)
+
+    def test_concurrent_returns_restock_once(self):
+        issue = circulation.issue_book(self.tenant, self.book.id, self.users[0].id, 2)
+
+        results = self._hammer(circulation.return_book, [
+            (self.tenant, issue.id) for _ in range(self.THREADS)
+        ])
+
+        self.assertEqual(len([r for r in results if isinstance(r, BookIssue)]), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, self.COPIES)
 
-# Create your tests here.
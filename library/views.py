@@ -2,16 +2,21 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum
 from django.utils import timezone
-from datetime import timedelta
 
-from .models import Book, BookIssue
+from .models import Book, BookIssue, BookRecommendation, CirculationSnapshot
+from .analytics import build_analytics
+from .search import search_books
+from .stats import library_stats
+from . import circulation
 from .serializers import (
     BookSerializer, BookIssueSerializer,
-    IssueBookSerializer, ReturnBookSerializer
+    IssueBookSerializer, ReturnBookSerializer,
+    BulkIssueBookSerializer, BulkReturnBookSerializer
 )
 from students.models import Student
+from school_management.instrumentation import query_budget
+from school_management.routers import replica_reads
 
 
 class BookViewSet(viewsets.ModelViewSet):
@@ -20,19 +25,7 @@ class BookViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         tenant = self.request.tenant
-        print(f"DEBUG Library: Tenant = {tenant}, Tenant ID = {tenant.id if tenant else 'None'}")
         queryset = Book.objects.filter(tenant=tenant)
-        print(f"DEBUG Library: Found {queryset.count()} books")
-        
-        # Search
-        search = self.request.query_params.get('search', '')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(author__icontains=search) |
-                Q(isbn__icontains=search) |
-                Q(category__icontains=search)
-            )
         
         # Filter by category
         category = self.request.query_params.get('category', '')
@@ -46,12 +39,72 @@ class BookViewSet(viewsets.ModelViewSet):
         elif availability == 'unavailable':
             queryset = queryset.filter(available_copies=0)
         
-        print(f"DEBUG Library: After filters {queryset.count()} books")
+        # Search, ordered by relevance
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            prefix = self.request.query_params.get('search_mode') == 'prefix'
+            return search_books(queryset, search, prefix=prefix)
+        
         return queryset.order_by('title')
     
     def perform_create(self, serializer):
         serializer.save(tenant=self.request.tenant)
     
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Type-ahead suggestions for a partially typed title, author or ISBN"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+        if not query:
+            return Response([])
+        
+        books = search_books(Book.objects.filter(tenant=request.tenant), query, prefix=True)
+        return Response(list(
+            books.values('id', 'title', 'author', 'isbn', 'available_copies')[:limit]
+        ))
+    
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        """Books most often borrowed by borrowers of this book"""
+        # 404 for ids that are malformed or belong to another school
+        book = self.get_object()
+        recommendations = BookRecommendation.objects.filter(
+            tenant=request.tenant,
+            book=book
+        ).select_related('recommended_book').order_by('rank')
+        
+        return Response([
+            {
+                **BookSerializer(recommendation.recommended_book).data,
+                'score': recommendation.score,
+            }
+            for recommendation in recommendations
+        ])
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Most-borrowed titles per class and category demand per month, for admins.
+        Served from the snapshot `manage.py build_library_analytics` keeps; the
+        first request (or ?refresh=true) builds it in the request.
+        """
+        if request.user.role not in ['super_admin', 'tenant_admin']:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        snapshot = CirculationSnapshot.objects.filter(tenant=request.tenant).first()
+        refresh = request.query_params.get('refresh') == 'true'
+        if snapshot is None or refresh:
+            snapshot = build_analytics(request.tenant)
+        
+        return Response({
+            'popular_by_class': snapshot.popular_by_class,
+            'category_demand': snapshot.category_demand,
+            'issues_processed': snapshot.issues_processed,
+            'built_at': snapshot.built_at,
+        })
+    
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get list of unique categories"""
@@ -59,35 +112,12 @@ class BookViewSet(viewsets.ModelViewSet):
         categories = Book.objects.filter(tenant=tenant).values_list('category', flat=True).distinct()
         return Response(list(categories))
     
+    @query_budget(5)
+    @replica_reads
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get library statistics"""
-        tenant = request.tenant
-        
-        total_books = Book.objects.filter(tenant=tenant).count()
-        total_copies = Book.objects.filter(tenant=tenant).aggregate(
-            total=Sum('total_copies')
-        )['total'] or 0
-        available_copies = Book.objects.filter(tenant=tenant).aggregate(
-            available=Sum('available_copies')
-        )['available'] or 0
-        issued_count = BookIssue.objects.filter(
-            tenant=tenant,
-            status='issued'
-        ).count()
-        overdue_count = BookIssue.objects.filter(
-            tenant=tenant,
-            status='issued',
-            due_date__lt=timezone.now().date()
-        ).count()
-        
-        return Response({
-            'total_books': total_books,
-            'total_copies': total_copies,
-            'available_copies': available_copies,
-            'issued_count': issued_count,
-            'overdue_count': overdue_count
-        })
+        return Response(library_stats(request.tenant))
 
 
 class BookIssueViewSet(viewsets.ModelViewSet):
@@ -118,104 +148,82 @@ class BookIssueViewSet(viewsets.ModelViewSet):
         serializer = IssueBookSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        tenant = request.tenant
-        book_id = serializer.validated_data['book_id']
-        user_id = serializer.validated_data['user_id']
-        duration_weeks = serializer.validated_data['duration_weeks']
-        remarks = serializer.validated_data.get('remarks', '')
-        
-        # Check if book exists and is available
         try:
-            book = Book.objects.get(id=book_id, tenant=tenant)
-        except Book.DoesNotExist:
-            return Response(
-                {'error': 'Book not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        if book.available_copies < 1:
-            return Response(
-                {'error': 'No copies available for this book'},
-                status=status.HTTP_400_BAD_REQUEST
+            issue = circulation.issue_book(
+                request.tenant,
+                serializer.validated_data['book_id'],
+                serializer.validated_data['user_id'],
+                serializer.validated_data['duration_weeks'],
+                serializer.validated_data.get('remarks', '')
             )
-        
-        # Calculate due date (duration in weeks, multiples of 7 days)
-        issue_date = timezone.now().date()
-        due_date = issue_date + timedelta(weeks=duration_weeks)
-        
-        # Create issue record
-        issue = BookIssue.objects.create(
-            tenant=tenant,
-            book=book,
-            user_id=user_id,
-            issue_date=issue_date,
-            due_date=due_date,
-            status='issued',
-            remarks=remarks
-        )
-        
-        # Decrease available copies
-        book.available_copies -= 1
-        book.save()
+        except circulation.CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
         return Response(
             BookIssueSerializer(issue).data,
             status=status.HTTP_201_CREATED
         )
     
+    @action(detail=False, methods=['post'])
+    def bulk_issue(self, request):
+        """Issue several scanned books to one borrower"""
+        serializer = BulkIssueBookSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            issues, errors = circulation.issue_books(
+                request.tenant,
+                serializer.validated_data['books'],
+                serializer.validated_data['user_id'],
+                serializer.validated_data['duration_weeks'],
+                serializer.validated_data.get('remarks', '')
+            )
+        except circulation.CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        return Response({
+            'issued': len(issues),
+            'issues': BookIssueSerializer(
+                BookIssue.objects.filter(id__in=[issue.id for issue in issues]).select_related('book', 'user'),
+                many=True
+            ).data,
+            'errors': errors
+        }, status=status.HTTP_201_CREATED if issues else status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['post'])
     def return_book(self, request):
         """Return a book"""
         serializer = ReturnBookSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        tenant = request.tenant
-        issue_id = serializer.validated_data['issue_id']
-        condition = serializer.validated_data['condition']
-        remarks = serializer.validated_data.get('remarks', '')
-        
-        # Get issue record
         try:
-            issue = BookIssue.objects.get(id=issue_id, tenant=tenant)
-        except BookIssue.DoesNotExist:
-            return Response(
-                {'error': 'Issue record not found'},
-                status=status.HTTP_404_NOT_FOUND
+            issue = circulation.return_book(
+                request.tenant,
+                serializer.validated_data['issue_id'],
+                serializer.validated_data['condition'],
+                serializer.validated_data.get('remarks', '')
             )
+        except circulation.CirculationError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
-        if issue.status != 'issued':
-            return Response(
-                {'error': 'Book is not currently issued'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Calculate fine (1 rupee per day after due date)
-        return_date = timezone.now().date()
-        fine_amount = 0
-        if return_date > issue.due_date:
-            days_overdue = (return_date - issue.due_date).days
-            fine_amount = days_overdue * 1.0  # 1 rupee per day
-        
-        # Update issue record
-        issue.return_date = return_date
-        issue.fine_amount = fine_amount
-        
-        if condition == 'lost':
-            issue.status = 'lost'
-        elif condition == 'damaged':
-            issue.status = 'damaged'
-        else:
-            issue.status = 'returned'
-            # Only increase available copies if book is returned in good condition
-            issue.book.available_copies += 1
-            issue.book.save()
-        
-        if remarks:
-            issue.remarks = remarks
+        return Response(BookIssueSerializer(issue).data)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_return(self, request):
+        """Return several issues at once"""
+        serializer = BulkReturnBookSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        issue.save()
+        issues, errors = circulation.return_books(request.tenant, serializer.validated_data['returns'])
         
-        return Response(BookIssueSerializer(issue).data)
+        return Response({
+            'returned': len(issues),
+            'issues': BookIssueSerializer(
+                BookIssue.objects.filter(id__in=[issue.id for issue in issues]).select_related('book', 'user'),
+                many=True
+            ).data,
+            'errors': errors
+        }, status=status.HTTP_200_OK if issues else status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
     def my_books(self, request):
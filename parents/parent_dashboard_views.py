@@ -1,66 +1,102 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
-from django.db.models import Q
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Q
+from django.http import JsonResponse
+
+from attendance.models import Attendance
+from exams.models import Result
 from parents.models import Parent, StudentParent
+from school_management.aio import async_api_view, gather
+from school_management.instrumentation import query_budget
+from school_management.routers import replica_reads
 from students.models import Student
-from attendance.models import Attendance
-from datetime import datetime, timedelta
+from timetable import grid as timetable_grid
+
+
+RECENT_RESULTS = 10
+
 
+def _attendance_stats(queryset):
+    """Totals per status in one query instead of a COUNT per status"""
+    return queryset.aggregate(
+        total_days=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+    )
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_child_attendance(request, student_id):
+
+def _percentage(stats):
+    total = stats['total_days']
+    return round(stats['present'] / total * 100, 2) if total > 0 else 0
+
+
+def _student_data(student):
+    return {
+        'id': str(student.id),
+        'name': student.user.full_name,
+        'admission_number': student.admission_number,
+        'class': student.class_name,
+        'section': student.section,
+    }
+
+
+async def _load_child(request, student_id):
     """
-    Get attendance records for a specific child
-    Only accessible by the child's parent or tenant admin
+    The student, if the user may see them; returns (student, error response)
+    Parents must be linked to the child; tenant admins and teachers see everyone
     """
     user = request.user
     tenant = request.tenant
-    
-    # Verify student exists in tenant
-    try:
-        student = Student.objects.get(id=student_id, tenant=tenant)
-    except Student.DoesNotExist:
-        return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Check if user is parent of this student or is admin
+
+    def load_student():
+        return Student.objects.select_related('user').filter(id=student_id, tenant=tenant).first()
+
+    def load_parent():
+        if user.role != 'parent':
+            return None
+        return Parent.objects.filter(user=user, tenant=tenant).first()
+
+    student, parent = await gather(load_student, load_parent)
+    if student is None:
+        return None, JsonResponse({'error': 'Student not found'}, status=404)
+
     if user.role == 'parent':
-        try:
-            parent = Parent.objects.get(user=user, tenant=tenant)
-            # Verify this parent is linked to this student
-            if not StudentParent.objects.filter(
-                parent=parent, 
-                student=student, 
-                tenant=tenant
-            ).exists():
-                return Response(
-                    {'error': 'You do not have permission to view this student\'s attendance'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except Parent.DoesNotExist:
-            return Response(
-                {'error': 'Parent profile not found'},
-                status=status.HTTP_403_FORBIDDEN
+        if parent is None:
+            return None, JsonResponse({'error': 'Parent profile not found'}, status=403)
+        # Verify this parent is linked to this student
+        linked = await StudentParent.objects.filter(parent=parent, student=student, tenant=tenant).aexists()
+        if not linked:
+            return None, JsonResponse(
+                {'error': 'You do not have permission to view this student\'s attendance'},
+                status=403
             )
-    elif user.role not in ['tenant_admin', 'teacher']:
-        return Response(
-            {'error': 'You do not have permission to view attendance'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-    
+    return student, None
+
+
+@query_budget(7)
+@replica_reads
+@async_api_view(roles=['parent', 'tenant_admin', 'teacher'])
+async def get_child_attendance(request, student_id):
+    """
+    Get attendance records for a specific child
+    Only accessible by the child's parent or tenant admin
+    """
+    student, error = await _load_child(request, student_id)
+    if error:
+        return error
+
     # Get query parameters for filtering
-    start_date = request.query_params.get('start_date')
-    end_date = request.query_params.get('end_date')
-    status_filter = request.query_params.get('status')
-    
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    status_filter = request.GET.get('status')
+
     # Build query
     attendance_records = Attendance.objects.filter(
         student=student,
-        tenant=tenant
-    ).select_related('marked_by')
-    
+        tenant=request.tenant
+    )
+
     # Apply date filters
     if start_date:
         attendance_records = attendance_records.filter(date__gte=start_date)
@@ -68,118 +104,92 @@ def get_child_attendance(request, student_id):
         attendance_records = attendance_records.filter(date__lte=end_date)
     if status_filter:
         attendance_records = attendance_records.filter(status=status_filter)
-    
+
     # If no date range specified, default to last 30 days
     if not start_date and not end_date:
         thirty_days_ago = datetime.now().date() - timedelta(days=30)
         attendance_records = attendance_records.filter(date__gte=thirty_days_ago)
-    
-    # Serialize data
-    data = []
-    for record in attendance_records:
-        data.append({
-            'id': str(record.id),
-            'date': record.date,
-            'status': record.status,
-            'status_display': record.get_status_display(),
-            'remarks': record.remarks,
-            'marked_by': record.marked_by.full_name if record.marked_by else 'System',
-            'marked_at': record.marked_at,
-        })
-    
-    # Calculate statistics
-    total_days = attendance_records.count()
-    present_days = attendance_records.filter(status='present').count()
-    absent_days = attendance_records.filter(status='absent').count()
-    late_days = attendance_records.filter(status='late').count()
-    
-    attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
-    
-    return Response({
-        'student': {
-            'id': str(student.id),
-            'name': student.user.full_name,
-            'admission_number': student.admission_number,
-            'class': student.class_name,
-            'section': student.section,
-        },
+
+    def load_records():
+        return [
+            {
+                'id': str(record.id),
+                'date': record.date,
+                'status': record.status,
+                'status_display': record.get_status_display(),
+                'remarks': record.remarks,
+                'marked_by': record.marked_by.full_name if record.marked_by else 'System',
+                'marked_at': record.marked_at,
+            }
+            for record in attendance_records.select_related('marked_by')
+        ]
+
+    data, stats = await gather(load_records, lambda: _attendance_stats(attendance_records))
+
+    return JsonResponse({
+        'student': _student_data(student),
         'statistics': {
-            'total_days': total_days,
-            'present': present_days,
-            'absent': absent_days,
-            'late': late_days,
-            'attendance_percentage': round(attendance_percentage, 2),
+            **stats,
+            'attendance_percentage': _percentage(stats),
         },
         'records': data
     })
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_my_children_attendance(request):
+@query_budget(5)
+@replica_reads
+@async_api_view()
+async def get_my_children_attendance(request):
     """
     Get attendance summary for all children of logged-in parent
     """
-    user = request.user
     tenant = request.tenant
-    
+
     # Verify user is a parent
-    try:
-        parent = Parent.objects.get(user=user, tenant=tenant)
-    except Parent.DoesNotExist:
-        return Response(
-            {'error': 'You are not registered as a parent'},
-            status=status.HTTP_403_FORBIDDEN
+    parent = await Parent.objects.select_related('user').filter(user=request.user, tenant=tenant).afirst()
+    if parent is None:
+        return JsonResponse({'error': 'You are not registered as a parent'}, status=403)
+
+    # Children and their attendance (last 30 days) are independent of each other
+    thirty_days_ago = datetime.now().date() - timedelta(days=30)
+    links = StudentParent.objects.filter(parent=parent, tenant=tenant)
+
+    def load_links():
+        return list(links.select_related('student__user'))
+
+    def load_stats():
+        rows = Attendance.objects.filter(
+            tenant=tenant,
+            student__in=links.values('student'),
+            date__gte=thirty_days_ago
+        ).values('student').annotate(
+            total_days=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
         )
-    
-    # Get all children
-    student_links = StudentParent.objects.filter(
-        parent=parent,
-        tenant=tenant
-    ).select_related('student__user')
-    
-    if not student_links.exists():
-        return Response({
+        return {row.pop('student'): row for row in rows}
+
+    student_links, stats = await gather(load_links, load_stats)
+
+    if not student_links:
+        return JsonResponse({
             'message': 'No children found',
             'children': []
         })
-    
-    # Get attendance for each child (last 30 days)
-    thirty_days_ago = datetime.now().date() - timedelta(days=30)
+
     children_attendance = []
-    
     for link in student_links:
-        student = link.student
-        attendance_records = Attendance.objects.filter(
-            student=student,
-            tenant=tenant,
-            date__gte=thirty_days_ago
-        )
-        
-        total_days = attendance_records.count()
-        present_days = attendance_records.filter(status='present').count()
-        absent_days = attendance_records.filter(status='absent').count()
-        
-        attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
-        
+        child_stats = stats.get(link.student_id, {'total_days': 0, 'present': 0, 'absent': 0})
         children_attendance.append({
-            'student': {
-                'id': str(student.id),
-                'name': student.user.full_name,
-                'admission_number': student.admission_number,
-                'class': student.class_name,
-                'section': student.section,
-            },
+            'student': _student_data(link.student),
             'statistics': {
-                'total_days': total_days,
-                'present': present_days,
-                'absent': absent_days,
-                'attendance_percentage': round(attendance_percentage, 2),
+                **child_stats,
+                'attendance_percentage': _percentage(child_stats),
             },
             'is_primary': link.is_primary,
         })
-    
-    return Response({
+
+    return JsonResponse({
         'parent': {
             'id': str(parent.id),
             'name': parent.user.full_name,
@@ -187,3 +197,71 @@ def get_my_children_attendance(request):
         },
         'children': children_attendance
     })
+
+
+# 8 once the class grid is compiled; until then each request compiles it
+@query_budget(15)
+@async_api_view(roles=['parent', 'tenant_admin', 'teacher'])
+async def get_child_overview(request, student_id):
+    """
+    Dashboard for one child: attendance over the last 30 days, recent
+    results and today's timetable, loaded concurrently
+    """
+    student, error = await _load_child(request, student_id)
+    if error:
+        return error
+
+    tenant = request.tenant
+    today = datetime.now().date()
+
+    def load_attendance():
+        return _attendance_stats(Attendance.objects.filter(
+            student=student,
+            tenant=tenant,
+            date__gte=today - timedelta(days=30)
+        ))
+
+    def load_results():
+        results = Result.objects.filter(
+            student=student,
+            tenant=tenant
+        ).select_related('exam_subject__exam')[:RECENT_RESULTS]
+        return [
+            {
+                'id': str(result.id),
+                'exam': result.exam_subject.exam.name,
+                'subject': result.exam_subject.subject_name,
+                'marks_obtained': result.marks_obtained,
+                'max_marks': result.exam_subject.max_marks,
+                'percentage': round(result.percentage, 2),
+                'grade': result.grade,
+                'exam_date': result.exam_subject.exam_date,
+            }
+            for result in results
+        ]
+
+    def load_timetable():
+        day = today.strftime('%A').lower()
+        # A GET must not write: a missing grid is compiled for this response only
+        compiled = timetable_grid.get_class_grid(
+            tenant.id, student.class_name, student.section or '', save=False
+        )
+        for grid_day, periods in timetable_grid.grid_by_day(compiled.grid):
+            if grid_day == day:
+                return periods
+        return []
+
+    attendance, results, timetable = await gather(load_attendance, load_results, load_timetable)
+
+    return JsonResponse({
+        'student': _student_data(student),
+        'attendance': {
+            **attendance,
+            'attendance_percentage': _percentage(attendance),
+        },
+        'recent_results': results,
+        'today': {
+            'date': today,
+            'timetable': timetable,
+        },
+    })
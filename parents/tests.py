@@ -1,3 +1,120 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from attendance.models import Attendance
+from school_classes.models import SchoolClass
+from students.models import Student
+from tenants.models import Tenant
+from timetable.models import TimeSlot, Timetable, TimetableGrid
+from .models import Parent, StudentParent
+
+
+# The async views run their queries in executor threads, which only see
+# committed rows, hence TransactionTestCase. Under `manage.py test` the replica
+# is a separate empty database, so these tests read everything from 'default'.
+@override_settings(DATABASE_ROUTERS=[])
+class ParentDashboardTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Parent School', email='parents@school.test', school_code='PS001')
+        self.parent_user = self.make_user('parent@school.test', 'parent')
+        self.parent = Parent.objects.create(tenant=self.tenant, user=self.parent_user, relation='mother')
+        self.student = self.make_student('child@school.test', 'ADM-1')
+        StudentParent.objects.create(tenant=self.tenant, parent=self.parent, student=self.student, is_primary=True)
+        self.other_student = self.make_student('other@school.test', 'ADM-2')
+
+        today = datetime.date.today()
+        for days_ago, status in ((1, 'present'), (2, 'present'), (3, 'absent')):
+            Attendance.objects.create(
+                tenant=self.tenant, student=self.student, date=today - datetime.timedelta(days=days_ago), status=status
+            )
+        SchoolClass.objects.create(
+            tenant=self.tenant, grade='8', section='A', class_name='Grade 8-A', academic_year='2026-2027'
+        )
+        Timetable.objects.create(
+            tenant=self.tenant, class_name='Grade 8-A', section='A', day=today.strftime('%A').lower(),
+            time_slot=TimeSlot.objects.create(
+                tenant=self.tenant, period_number=1, start_time=datetime.time(8), end_time=datetime.time(9)
+            ),
+            subject='Maths', academic_year='2026-2027'
+        )
+
+    def make_user(self, email, role):
+        return User.objects.create_user(
+            email=email, first_name='Test', last_name=role.title(), role=role, tenant=self.tenant
+        )
+
+    def make_student(self, email, admission_number):
+        return Student.objects.create(
+            tenant=self.tenant, user=self.make_user(email, 'student'), admission_number=admission_number,
+            date_of_birth=datetime.date(2012, 1, 1), gender='female', class_name='Grade 8-A', section='A',
+            admission_date=datetime.date(2020, 6, 1), academic_year='2026-2027'
+        )
+
+    def request(self, user, path, method='get', token=None, client=None):
+        headers = {'X-Tenant-ID': str(self.tenant.id)}
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+        if token is not None:
+            headers['Authorization'] = f'Bearer {token}'
+        return getattr(client or AsyncClient(), method)(path, headers=headers)
+
+    async def test_child_attendance(self):
+        response = await self.request(self.parent_user, f'/api/parents/child/{self.student.id}/attendance/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['records']), 3)
+        self.assertEqual(data['statistics']['present'], 2)
+        self.assertEqual(data['statistics']['attendance_percentage'], 66.67)
+
+    async def test_unlinked_child_is_forbidden(self):
+        response = await self.request(self.parent_user, f'/api/parents/child/{self.other_student.id}/attendance/')
+
+        self.assertEqual(response.status_code, 403)
+
+    async def test_my_children_attendance(self):
+        response = await self.request(self.parent_user, '/api/parents/dashboard/attendance/')
+
+        self.assertEqual(response.status_code, 200)
+        children = response.json()['children']
+        self.assertEqual([child['student']['id'] for child in children], [str(self.student.id)])
+        self.assertEqual(children[0]['statistics']['absent'], 1)
+
+    async def test_child_overview_does_not_store_grids(self):
+        response = await self.request(self.parent_user, f'/api/parents/child/{self.student.id}/overview/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['attendance']['total_days'], 3)
+        self.assertEqual([entry['subject'] for entry in data['today']['timetable']], ['Maths'])
+        self.assertFalse(await TimetableGrid.objects.aexists())
+
+    async def test_missing_or_bad_token_is_rejected(self):
+        url = '/api/parents/dashboard/attendance/'
+        response = await self.request(None, url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        response = await self.request(None, url, token='not-a-token')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_role_is_checked(self):
+        student_user = await User.objects.aget(email='child@school.test')
+        response = await self.request(student_user, f'/api/parents/child/{self.student.id}/attendance/')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'error': 'Unauthorized'})
+
+    async def test_other_methods_are_not_allowed_without_csrf_token(self):
+        # csrf_exempt: the method check answers, not CsrfViewMiddleware
+        response = await self.request(
+            self.parent_user, '/api/parents/dashboard/attendance/', method='post',
+            client=AsyncClient(enforce_csrf_checks=True)
+        )
+
+        self.assertEqual(response.status_code, 405)
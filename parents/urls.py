@@ -17,5 +17,6 @@ urlpatterns = [
     
     # Parent Dashboard - View Children's Data
     path('child/<uuid:student_id>/attendance/', parent_dashboard_views.get_child_attendance, name='child-attendance'),
+    path('child/<uuid:student_id>/overview/', parent_dashboard_views.get_child_overview, name='child-overview'),
     path('dashboard/attendance/', parent_dashboard_views.get_my_children_attendance, name='my-children-attendance'),
 ]
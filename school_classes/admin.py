@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from .models import SchoolClass
 
 
@@ -10,6 +11,10 @@ class SchoolClassAdmin(admin.ModelAdmin):
     raw_id_fields = ['tenant', 'class_teacher']
     ordering = ['grade', 'section']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_student_count=Count('students'))
+    
     def get_student_count(self, obj):
-        return obj.student_count
+        return obj._student_count
     get_student_count.short_description = 'Students'
+    get_student_count.admin_order_field = '_student_count'
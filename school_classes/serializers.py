@@ -19,7 +19,7 @@ class SchoolClassSerializer(serializers.ModelSerializer):
     class_teacher_details = TeacherBasicSerializer(source='class_teacher', read_only=True)
     class_teacher_id = serializers.SerializerMethodField()
     student_count = serializers.SerializerMethodField()
-    tenant_id = serializers.UUIDField(source='tenant.id', read_only=True)
+    tenant_id = serializers.UUIDField(read_only=True)
     
     class Meta:
         model = SchoolClass
@@ -43,8 +43,12 @@ class SchoolClassSerializer(serializers.ModelSerializer):
         }
     
     def get_student_count(self, obj):
-        """Get the count of students in this class"""
-        return obj.student_count
+        """Student count from the viewset's _student_count annotation"""
+        count = getattr(obj, '_student_count', None)
+        if count is None:
+            # Nested uses (e.g. course details) have no annotation to read
+            return obj.student_count
+        return count
     
     def get_class_teacher_id(self, obj):
         """Get the class teacher ID if exists"""
@@ -111,7 +115,7 @@ class SchoolClassSerializer(serializers.ModelSerializer):
 class SchoolClassListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for listing classes"""
     class_teacher_name = serializers.SerializerMethodField()
-    student_count = serializers.IntegerField(read_only=True)
+    student_count = serializers.IntegerField(source='_student_count', read_only=True)
     
     class Meta:
         model = SchoolClass
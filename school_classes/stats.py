@@ -0,0 +1,35 @@
+"""
+Class statistics from a single GROUP BY over classes joined to students.
+"""
+from django.db.models import Count, Q
+
+
+def class_statistics(classes):
+    """Totals and per-grade counts for a (filtered) SchoolClass queryset"""
+    rows = classes.order_by().values('grade').annotate(
+        classes=Count('id', distinct=True),
+        with_teachers=Count('id', distinct=True, filter=Q(class_teacher__isnull=False)),
+        students=Count('students'),
+    ).order_by('grade')
+
+    by_grade = []
+    total_classes = with_teachers = total_students = 0
+    for row in rows:
+        total_classes += row['classes']
+        with_teachers += row['with_teachers']
+        total_students += row['students']
+        by_grade.append({
+            'grade': row['grade'],
+            'classes': row['classes'],
+            'withTeachers': row['with_teachers'],
+            'withoutTeachers': row['classes'] - row['with_teachers'],
+            'students': row['students'],
+        })
+
+    return {
+        'totalClasses': total_classes,
+        'withTeachers': with_teachers,
+        'withoutTeachers': total_classes - with_teachers,
+        'totalStudents': total_students,
+        'byGrade': by_grade,
+    }
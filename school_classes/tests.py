@@ -1,3 +1,35 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from tenants.models import Tenant
+from .models import SchoolClass
+
+
+class ClassStatisticsTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Class School', email='classes@school.test', school_code='CLS001')
+        admin = User.objects.create_user(
+            email='admin@classes.test', first_name='Class', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        self.client.force_authenticate(admin)
+        for grade, section, year in (('8', 'A', '2026-2027'), ('8', 'B', '2026-2027'), ('9', 'A', '2026-2027'),
+                                     ('8', 'A', '2025-2026')):
+            SchoolClass.objects.create(tenant=self.tenant, grade=grade, section=section, academic_year=year)
+
+    def statistics(self, **params):
+        response = self.client.get('/api/classes/statistics/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_every_class_by_grade(self):
+        data = self.statistics()
+
+        self.assertEqual(data['totalClasses'], 4)
+        self.assertEqual([(row['grade'], row['classes']) for row in data['byGrade']], [('8', 3), ('9', 1)])
+
+    def test_list_filters_and_search_apply(self):
+        self.assertEqual(self.statistics(academic_year='2026-2027')['totalClasses'], 3)
+        self.assertEqual(self.statistics(academic_year='2026-2027', section='A')['totalClasses'], 2)
+        self.assertEqual(self.statistics(search='Grade 9')['totalClasses'], 1)
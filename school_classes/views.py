@@ -7,8 +7,11 @@ from django.db.models import Count, Q
 
 from .models import SchoolClass
 from .serializers import SchoolClassSerializer, SchoolClassListSerializer
+from .stats import class_statistics
 from teachers.models import Teacher
 from teachers.serializers import TeacherSerializer
+from school_management.instrumentation import query_budget
+from school_management.routers import replica_reads
 
 
 class SchoolClassViewSet(viewsets.ModelViewSet):
@@ -49,8 +52,6 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         )
         
         return queryset
-        
-        return queryset
     
     def get_serializer_class(self):
         """Use full serializer for all actions to include teacher details"""
@@ -62,11 +63,8 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         
-        # Reload the instance with teacher details
-        instance = SchoolClass.objects.select_related(
-            'class_teacher',
-            'class_teacher__user'
-        ).get(pk=serializer.instance.pk)
+        # Reload the instance with teacher details and student count
+        instance = self.get_queryset().get(pk=serializer.instance.pk)
         response_serializer = self.get_serializer(instance)
         
         headers = self.get_success_headers(response_serializer.data)
@@ -80,11 +78,8 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         
-        # Reload the instance with teacher details
-        instance = SchoolClass.objects.select_related(
-            'class_teacher',
-            'class_teacher__user'
-        ).get(pk=instance.pk)
+        # Reload the instance with teacher details and student count
+        instance = self.get_queryset().get(pk=instance.pk)
         response_serializer = self.get_serializer(instance)
         
         return Response(response_serializer.data)
@@ -94,7 +89,7 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         
         # Unassign students from this class before deletion
-        if instance.student_count > 0:
+        if instance._student_count > 0:
             # Set school_class to None for all students in this class
             instance.students.update(school_class=None)
         
@@ -142,22 +137,24 @@ class SchoolClassViewSet(viewsets.ModelViewSet):
         
         return Response(teacher_data, status=status.HTTP_200_OK)
     
+    @query_budget(4)
+    @replica_reads
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """
         Get statistics about classes
         Endpoint: /api/classes/statistics/
         """
-        queryset = self.get_queryset()
-        
-        total_classes = queryset.count()
-        with_teachers = queryset.filter(class_teacher__isnull=False).count()
-        without_teachers = total_classes - with_teachers
-        total_students = sum(c.student_count for c in queryset)
-        
-        return Response({
-            'totalClasses': total_classes,
-            'withTeachers': with_teachers,
-            'withoutTeachers': without_teachers,
-            'totalStudents': total_students,
-        }, status=status.HTTP_200_OK)
+        tenant = request.user.tenant
+        
+        if not tenant:
+            return Response(
+                {"error": "User is not associated with any tenant"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Same filters and search as the class list
+        return Response(
+            class_statistics(self.filter_queryset(self.get_queryset())),
+            status=status.HTTP_200_OK
+        )
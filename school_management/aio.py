@@ -0,0 +1,88 @@
+"""
+Helpers for async views.
+
+DRF's @api_view only runs synchronous functions, so the async dashboards are
+plain Django views wrapped in async_api_view, which authenticates the JWT the
+way DRF does and checks the caller's role:
+
+    @async_api_view(roles=['parent', 'tenant_admin'])
+    async def child_overview(request, student_id):
+        student, results = await gather(load_student, load_results)
+        return JsonResponse({...})
+
+Django's async ORM (aget, afirst, ...) runs each query on the request's one
+sync thread, so awaiting several of them still runs them back to back.
+gather() runs blocking ORM callables in the default executor instead, each
+thread with its own database connection, so a dashboard waits for its
+slowest query rather than the sum of all of them. Every executor thread keeps
+a connection open (subject to CONN_MAX_AGE), which counts against the
+database's connection limit.
+
+Run the project on an ASGI server (see gunicorn.conf.py) to get the benefit;
+under WSGI these views still work, one request per worker thread. Every
+middleware in settings.MIDDLEWARE is async-capable (WhiteNoise through
+school_management.static), so under ASGI the chain stays on the event loop;
+MiddlewareMixin-based ones such as TenantMiddleware run their
+process_request hooks through sync_to_async, since a tenant cache miss
+queries the database.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+def _run(func):
+    # The request's query recorder follows through the copied context (see instrumentation.py)
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather(*funcs):
+    """Run blocking ORM callables concurrently; returns their results in order"""
+    return await asyncio.gather(*(
+        sync_to_async(_run, thread_sensitive=False)(func) for func in funcs
+    ))
+
+
+def _authenticate(request):
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+def _unauthorized(detail):
+    data = detail if isinstance(detail, dict) else {'detail': detail}
+    response = JsonResponse(data, status=401)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def async_api_view(methods=('GET',), roles=None):
+    """Async counterpart of @api_view + IsAuthenticated for JWT-authenticated views"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                user = await sync_to_async(_authenticate)(request)
+            except AuthenticationFailed as e:
+                return _unauthorized(e.detail)
+            if user is None:
+                return _unauthorized('Authentication credentials were not provided.')
+            if roles is not None and user.role not in roles:
+                return JsonResponse({'error': 'Unauthorized'}, status=403)
+            request.user = user
+            return await view(request, *args, **kwargs)
+
+        # Bearer tokens are not sent automatically by browsers, as with DRF
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
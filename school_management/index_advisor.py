@@ -0,0 +1,248 @@
+"""
+Index suggestions from captured query shapes.
+
+QueryInstrumentationMiddleware writes the query shapes of real requests to
+QUERY_CAPTURE_PATH (see instrumentation.py). load() sums them up per shape,
+and advise() runs EXPLAIN ANALYZE on PostgreSQL for the SELECTs that cost the
+most in total, looking for scans that read many rows only to throw most of
+them away: in a Filter, in a join that matches few of them, or in a sort
+that a LIMIT cuts down to one page:
+
+    Seq Scan on library_book_issues  (actual rows=12 loops=1)
+      Filter: ((tenant_id = '...'::uuid) AND ((status)::text = 'overdue'::text))
+      Rows Removed by Filter: 48210
+
+Each such scan becomes a suggested index on the columns it filters on:
+equality columns first (tenant first, as elsewhere in this project), then the
+join column, then at most one range or sort column. Indexes that already
+start with those columns are not suggested again. measure()
+creates a suggested index inside a transaction that is rolled back and
+compares the plans with and without it.
+
+The EXPLAIN ANALYZE runs execute the captured SELECTs with their captured
+parameters, each under a statement timeout, so point it at a staging copy
+rather than the primary.
+"""
+import json
+import re
+from collections import Counter
+
+from django.apps import apps
+from django.db import transaction
+
+
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_CAST = re.compile(r'::"?\w+"?(?: varying| with(?:out)? time zone)?(?:\[\])?')
+_IDENTIFIER = re.compile(r'(?<![\w.])(?:(\w+)\.)?([a-z_]\w*)\b(\)?\s*(?:<=|>=|<|>))?')
+
+
+def load(path):
+    """Query shapes in a QUERY_CAPTURE_PATH file, most total time first"""
+    shapes = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict) or not entry.get('shape'):
+                continue
+            shape = shapes.setdefault(entry['shape'], {
+                'shape': entry['shape'], 'calls': 0, 'ms': 0.0, 'views': Counter(),
+                'sql': None, 'params': None, 'slowest': -1,
+            })
+            calls, ms = entry.get('count') or 1, entry.get('ms') or 0
+            shape['calls'] += calls
+            shape['ms'] += ms
+            shape['views'][entry.get('view')] += 1
+            # Explain the parameters that made the shape slowest, not the first seen
+            if entry.get('sql') and ms / calls > shape['slowest']:
+                shape['sql'], shape['params'], shape['slowest'] = entry['sql'], entry.get('params'), ms / calls
+    return sorted(shapes.values(), key=lambda shape: -shape['ms'])
+
+
+def _explain(cursor, sql, params, analyze=True, timeout_ms=5000):
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cursor.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+    cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def explain(connection, sql, params, analyze=True, timeout_ms=5000):
+    """EXPLAIN one statement; ANALYZE runs it inside a transaction that is rolled back"""
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        try:
+            return _explain(cursor, sql, params, analyze, timeout_ms)
+        finally:
+            transaction.set_rollback(True, using=connection.alias)
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _nodes(child)
+
+
+def _columns(condition, alias, table_columns):
+    """Columns of the scanned table in a plan condition, as (equality, range) lists"""
+    equality, ranges = [], []
+    condition = _CAST.sub('', _LITERAL.sub("''", condition or ''))
+    for qualifier, name, comparison in _IDENTIFIER.findall(condition):
+        if name not in table_columns or qualifier not in ('', alias):
+            # Columns of the other side of a join
+            continue
+        target = ranges if comparison else equality
+        if name not in equality and name not in ranges:
+            target.append(name)
+    return equality, ranges
+
+
+def _table_info(cursor, relation, cache):
+    """(table, its columns, column lists of its indexes), resolving partitions to their parent"""
+    if relation not in cache:
+        cursor.execute(
+            "SELECT inhparent::regclass::text FROM pg_inherits WHERE inhrelid = to_regclass(%s)", [relation]
+        )
+        row = cursor.fetchone()
+        table = row[0] if row else relation
+        cursor.execute("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """, [table])
+        columns = {row[0] for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT array_agg(a.attname ORDER BY k.ordinality)
+            FROM pg_index x
+            CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ordinality)
+            JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+            WHERE x.indrelid = %s::regclass AND x.indpred IS NULL
+            GROUP BY x.indexrelid
+        """, [table])
+        indexes = [list(row[0]) for row in cursor.fetchall()]
+        cache[relation] = (table, columns, indexes)
+    return cache[relation]
+
+
+def _covered(columns, indexes):
+    return any(set(index[:len(columns)]) == set(columns) for index in indexes)
+
+
+def _rows(node):
+    return (node.get('Actual Rows') or 0) * (node.get('Actual Loops') or 1)
+
+
+def _scan_below(node, through_joins=False):
+    """The scan feeding node through Hash, Sort or Materialize (and the outer side of joins), if any"""
+    passing = ('Hash', 'Sort', 'Materialize')
+    if through_joins:
+        passing += ('Nested Loop', 'Hash Join', 'Merge Join')
+    while node['Node Type'] in passing and node.get('Plans'):
+        node = node['Plans'][0]
+    return node if node['Node Type'] in SCAN_NODES else None
+
+
+def _wasteful_scans(plan):
+    """
+    (scan, rows it read for nothing, join condition, sort key) for scans that
+    drop rows in a Filter, feed a join that keeps few of them, or feed a sort
+    of which a LIMIT keeps only the top
+    """
+    for node in _nodes(plan):
+        if node['Node Type'] in SCAN_NODES and node.get('Filter'):
+            removed = (node.get('Rows Removed by Filter') or 0) * (node.get('Actual Loops') or 1)
+            yield node, removed - _rows(node), None, None
+        condition = node.get('Hash Cond') or node.get('Merge Cond')
+        if condition:
+            for child in node.get('Plans', ()):
+                scan = _scan_below(child)
+                if scan is not None:
+                    yield scan, _rows(scan) - _rows(node), condition, None
+        if node['Node Type'] == 'Limit' and node.get('Plans') and node['Plans'][0]['Node Type'] == 'Sort':
+            sort = node['Plans'][0]
+            # select_related joins keep the rows of the outer side, so look through them
+            scan = _scan_below(sort['Plans'][0], through_joins=True)
+            if scan is not None:
+                yield scan, _rows(scan) - _rows(node), None, ', '.join(sort.get('Sort Key', ()))
+
+
+def _candidate(node, table_columns, join=None, sort_key=None):
+    """Equality columns (tenant first), then the join column, then a range or sort column"""
+    equality, ranges = [], []
+    for condition in (node.get('Index Cond'), node.get('Recheck Cond'), node.get('Filter'), join):
+        eq, rng = _columns(condition, node.get('Alias'), table_columns)
+        equality += [name for name in eq if name not in equality]
+        ranges += [name for name in rng if name not in ranges]
+    if 'tenant_id' in equality:
+        equality.remove('tenant_id')
+        equality.insert(0, 'tenant_id')
+    if sort_key:
+        ranges = [name for name in sum(_columns(sort_key, node.get('Alias'), table_columns), []) if name not in equality]
+    return equality + [name for name in ranges if name not in equality][:1]
+
+
+def _model_index(table, columns):
+    """('app.Model', "models.Index(fields=[...])") for a suggestion, if a model owns the table"""
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            by_column = {field.column: field.name for field in model._meta.concrete_fields}
+            fields = [by_column.get(column, column) for column in columns]
+            return model._meta.label, f'models.Index(fields={fields!r})'
+    return None, None
+
+
+def advise(connection, shapes, top=50, min_rows=1000, timeout_ms=5000):
+    """
+    Suggested indexes for the `top` most expensive SELECT shapes, most rows
+    saved first. Each suggestion is a dict with the table, columns, rows the
+    scans read for nothing, the shapes it comes from and their views.
+    """
+    suggestions = {}
+    cache = {}
+    errors = []
+    for shape in [shape for shape in shapes if shape['shape'].upper().startswith('SELECT') and shape['sql']][:top]:
+        try:
+            plan = explain(connection, shape['sql'], shape['params'], timeout_ms=timeout_ms)
+        except Exception as e:
+            errors.append((shape['shape'], str(e).strip()))
+            continue
+        with connection.cursor() as cursor:
+            for node, wasted, join, sort_key in _wasteful_scans(plan['Plan']):
+                if wasted < min_rows:
+                    continue
+                table, table_columns, indexes = _table_info(cursor, node['Relation Name'], cache)
+                columns = _candidate(node, table_columns, join, sort_key)
+                if not columns or _covered(columns, indexes):
+                    continue
+                key = (table, tuple(columns))
+                suggestion = suggestions.setdefault(key, {
+                    'table': table, 'columns': columns, 'rows_wasted': 0,
+                    'shapes': [], 'views': Counter(), 'sql': shape['sql'], 'params': shape['params'],
+                })
+                suggestion['rows_wasted'] += wasted * shape['calls']
+                if shape['shape'] not in suggestion['shapes']:
+                    suggestion['shapes'].append(shape['shape'])
+                    suggestion['views'].update(shape['views'])
+    for suggestion in suggestions.values():
+        suggestion['model'], suggestion['index'] = _model_index(suggestion['table'], suggestion['columns'])
+    return sorted(suggestions.values(), key=lambda s: -s['rows_wasted']), errors
+
+
+def measure(connection, suggestion, timeout_ms=5000):
+    """(ms without, ms with) the suggested index for its first shape, the index rolled back after"""
+    qn = connection.ops.quote_name
+    before = explain(connection, suggestion['sql'], suggestion['params'], timeout_ms=timeout_ms)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE INDEX advise_indexes_trial ON {qn(suggestion['table'])} "
+                f"({', '.join(qn(column) for column in suggestion['columns'])})"
+            )
+            after = _explain(cursor, suggestion['sql'], suggestion['params'], timeout_ms=timeout_ms)
+        finally:
+            transaction.set_rollback(True, using=connection.alias)
+    return before['Execution Time'], after['Execution Time']
@@ -0,0 +1,271 @@
+"""
+Per-request SQL instrumentation.
+
+QueryInstrumentationMiddleware records, for each request, the number of
+queries, the time spent in the database and how often each query shape (the
+SQL with its parameters and IN lists collapsed) repeats. A shape repeated
+QUERY_REPEAT_THRESHOLD times or more is reported as an N+1 candidate.
+
+Each response gets a Server-Timing header (db and app durations) and a log
+line on the 'school_management.queries' logger. Views can declare a budget:
+
+    @query_budget(5)
+    @api_view(['GET'])
+    def student_list_create(request): ...
+
+    class BookViewSet(viewsets.ModelViewSet):
+        @query_budget(3)
+        @action(detail=False, methods=['get'])
+        def stats(self, request): ...
+
+A view that goes over its budget raises QueryBudgetExceeded when
+QUERY_BUDGET_STRICT is on (the default under manage.py test) and logs a
+warning otherwise.
+
+The middleware publishes the request's recorder in the current_recorder
+context variable, and every connection carries one permanent execute_wrapper
+that hands its queries to whichever recorder is current. Context variables
+follow the request into the threads that sync_to_async runs ORM code in, so
+this counts the same queries whether the request is served over WSGI or ASGI,
+including those async views run through school_management.aio.gather.
+
+With QUERY_CAPTURE_PATH set, the middleware also appends every SELECT shape
+a sampled request ran (QUERY_CAPTURE_SAMPLE) to that JSONL file, with its
+count, time and the SQL and parameters of its slowest run, for
+`manage.py advise_indexes`. Writes are left out: the advisor only explains
+SELECTs, and their parameters carry what users submit (password hashes,
+personal details).
+
+    {"ts": 1718000000.12, "view": "attendance-by-date", "shape": "SELECT ...",
+     "count": 1, "ms": 41.2, "sql": "SELECT ... WHERE date = %s", "params": ["2026-10-19"]}
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger('school_management.queries')
+
+SHAPE_EXAMPLES = 3
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """Normalize SQL so the same query with different values has one shape"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def query_budget(max_queries, max_repeats=None):
+    """Declare how many queries a view (or a viewset/action) may run"""
+    def decorator(view):
+        view.query_budget = (max_queries, max_repeats)
+        return view
+    return decorator
+
+
+def _view_budget(request, view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    cls = getattr(view_func, 'cls', None)
+    if budget is None and cls is not None:
+        # DRF: view_func is the as_view() function; look at the handler first
+        actions = getattr(view_func, 'actions', None) or {}
+        method = request.method.lower()
+        handler = getattr(cls, actions.get(method, method), None)
+        budget = getattr(handler, 'query_budget', None) or getattr(cls, 'query_budget', None)
+    return budget
+
+
+class QueryRecorder:
+    """execute_wrapper callable collecting statistics for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.shape_durations = Counter()
+        self.samples = {}  # shape -> (seconds, sql, params) of its slowest run
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            shape = query_shape(sql)
+            with self.lock:
+                self.duration += elapsed
+                self.count += 1
+                self.shapes[shape] += 1
+                self.shape_durations[shape] += elapsed
+                if not many and elapsed > self.samples.get(shape, (0,))[0]:
+                    self.samples[shape] = (elapsed, sql, params)
+
+    def repeated(self, threshold):
+        """Query shapes run at least threshold times, most frequent first"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def captured(self, view):
+        """One JSON-ready entry per SELECT shape, for QUERY_CAPTURE_PATH"""
+        ts = round(time.time(), 3)
+        for shape, n in self.shapes.items():
+            if not shape.upper().startswith('SELECT'):
+                continue
+            _, sql, params = self.samples.get(shape, (None, None, None))
+            yield {
+                'ts': ts,
+                'view': view,
+                'shape': shape,
+                'count': n,
+                'ms': round(self.shape_durations[shape] * 1000, 2),
+                'sql': sql,
+                'params': list(params) if params is not None else None,
+            }
+
+
+def _record(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender=None, connection=None, **kwargs):
+    """Send the queries of a connection (default: this thread's) to the current recorder"""
+    for conn in [connection] if connection is not None else connections.all():
+        if _record not in conn.execute_wrappers:
+            conn.execute_wrappers.append(_record)
+
+
+# Connections are per thread; every new one gets the wrapper as it connects
+connection_created.connect(install_recorder)
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.repeat_threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+        self.strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+        self.capture_path = getattr(settings, 'QUERY_CAPTURE_PATH', '')
+        self.capture_sample = getattr(settings, 'QUERY_CAPTURE_SAMPLE', 1.0)
+        self.capture_lock = threading.Lock()
+        # Connections of this thread that were opened before the signal was connected
+        install_recorder()
+
+    def _start(self, request):
+        recorder = QueryRecorder()
+        request.query_recorder = recorder
+        request.query_budget = None
+        return recorder, current_recorder.set(recorder), time.perf_counter()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder, token, start = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self._finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder, token, start = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self._finish(request, response, recorder, start)
+
+    def _finish(self, request, response, recorder, start):
+        total = time.perf_counter() - start
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'app;dur={(total - recorder.duration) * 1000:.1f}'
+        )
+        self._report(request, response, recorder, total)
+        if self.capture_path and random.random() < self.capture_sample:
+            self._capture(request, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = _view_budget(request, view_func)
+        request.view_name = getattr(request.resolver_match, 'view_name', None) or view_func.__name__
+
+    def _capture(self, request, recorder):
+        view = getattr(request, 'view_name', None) or request.path
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in recorder.captured(view))
+        if not lines:
+            return
+        with self.capture_lock:
+            with open(self.capture_path, 'a') as f:
+                f.write(lines)
+
+    def _report(self, request, response, recorder, total):
+        view = getattr(request, 'view_name', None) or request.path
+        repeated = recorder.repeated(self.repeat_threshold)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'repeated_shapes': len(repeated),
+        }
+        logger.info(
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra={'query_stats': fields}
+        )
+        for shape, n in repeated[:SHAPE_EXAMPLES]:
+            logger.warning(
+                'Possible N+1 in %s: %d x %s', view, n, shape[:300],
+                extra={'query_stats': {**fields, 'shape': shape, 'repeats': n}}
+            )
+
+        if request.query_budget is None:
+            return
+        max_queries, max_repeats = request.query_budget
+        problems = []
+        if recorder.count > max_queries:
+            problems.append(f'{recorder.count} queries (budget {max_queries})')
+        if max_repeats is not None and recorder.shapes:
+            shape, n = recorder.shapes.most_common(1)[0]
+            if n > max_repeats:
+                problems.append(f'query repeated {n} times (budget {max_repeats}): {shape[:300]}')
+        if not problems:
+            return
+
+        message = f"{request.method} {request.path} ({view}) ran " + '; '.join(problems)
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning('Query budget exceeded: %s', message, extra={'query_stats': fields})
@@ -0,0 +1 @@
+# Empty file to make this directory a Python package
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from school_management import index_advisor
+
+
+class Command(BaseCommand):
+    help = 'Suggest indexes for the query shapes captured with QUERY_CAPTURE_PATH (EXPLAIN ANALYZE on PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='JSONL file written with QUERY_CAPTURE_PATH')
+        parser.add_argument('--top', type=int, default=50, help='Explain this many shapes, most total time first')
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Ignore scans that read fewer rows than this for nothing per query'
+        )
+        parser.add_argument('--timeout', type=int, default=5000, help='Statement timeout per EXPLAIN ANALYZE, in ms')
+        parser.add_argument(
+            '--measure', action='store_true',
+            help='Time each query with its suggested index, built in a transaction that is rolled back'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The index advisor needs PostgreSQL')
+        shapes = index_advisor.load(options['file'])
+        if not shapes:
+            raise CommandError(f"No query shapes in {options['file']}")
+
+        suggestions, errors = index_advisor.advise(
+            connection, shapes, top=options['top'], min_rows=options['min_rows'], timeout_ms=options['timeout']
+        )
+        for shape, error in errors:
+            self.stdout.write(self.style.WARNING(f'Could not explain {shape[:120]}: {error}'))
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS(
+                f'No missing indexes in the top {options["top"]} of {len(shapes)} query shapes'
+            ))
+            return
+
+        for suggestion in suggestions:
+            target = suggestion['model'] or suggestion['table']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{target}: index on ({', '.join(suggestion['columns'])})"
+            ))
+            if suggestion['index']:
+                self.stdout.write(f"  Add to Meta.indexes: {suggestion['index']}")
+            self.stdout.write(f"  Rows read for nothing: {suggestion['rows_wasted']}")
+            views = ', '.join(view for view, _ in suggestion['views'].most_common(3) if view)
+            if views:
+                self.stdout.write(f'  Views: {views}')
+            for shape in suggestion['shapes'][:3]:
+                self.stdout.write(f'  Query: {shape[:200]}')
+            if options['measure']:
+                before, after = index_advisor.measure(connection, suggestion, timeout_ms=options['timeout'])
+                self.stdout.write(f'  Measured: {before:.1f} ms -> {after:.1f} ms')
+        self.stdout.write('Then run `manage.py makemigrations` for the models you changed.')
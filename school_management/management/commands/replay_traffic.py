@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from school_management.traffic import REDACTED, Target, format_report, queries_from, summarize
+
+
+class Command(BaseCommand):
+    help = 'Replay API traffic recorded by TrafficRecorderMiddleware and report latency and queries per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='JSONL file written with TRAFFIC_RECORD_PATH')
+        parser.add_argument('--base-url', help='Replay against a running server instead of the in-process client')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--mode', choices=['thread', 'asyncio'], default='thread')
+        parser.add_argument(
+            '--speed', type=float, default=0,
+            help='Keep the recorded pacing sped up this many times (1 = real time); 0 sends as fast as possible'
+        )
+        parser.add_argument('--limit', type=int, help='Replay only the first N requests')
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help='Also replay POST, PUT, PATCH and DELETE requests; only against a disposable copy of the data'
+        )
+        parser.add_argument('--password', help='Send this instead of redacted passwords (e.g. for benchmark users)')
+        parser.add_argument('--output', help='Write the report as JSON')
+        parser.add_argument('--compare', help='JSON report of an earlier replay to compare p95 against')
+
+    def handle(self, *args, **options):
+        entries, skipped, writes = self._load(options)
+        if not entries:
+            raise CommandError(f"No replayable requests in {options['file']} ({skipped} lines skipped)")
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} lines without a method and API path'))
+        if writes:
+            self.stdout.write(self.style.WARNING(f'Skipped {writes} write requests; pass --allow-writes to replay them'))
+
+        self.tokens = self._tokens(entries)
+        self.target = Target(options['base_url'])
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+        started = time.perf_counter()
+        if options['mode'] == 'asyncio':
+            asyncio.run(self._replay_async(entries, options['concurrency'], options['speed']))
+        else:
+            self._replay_threads(entries, options['concurrency'], options['speed'])
+        wall = time.perf_counter() - started
+
+        report = {
+            'requests': len(entries),
+            'concurrency': options['concurrency'],
+            'seconds': round(wall, 2),
+            'throughput': round(len(entries) / wall, 1),
+            'endpoints': summarize(dict(sorted(self.samples.items()))),
+        }
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+        self.stdout.write(format_report(report, baseline))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def _load(self, options):
+        entries = []
+        skipped = writes = 0
+        with open(options['file']) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(entry, dict) or not entry.get('method') or not str(entry.get('path', '')).startswith('/'):
+                    skipped += 1
+                    continue
+                if not options['allow_writes'] and entry['method'] not in SAFE_METHODS:
+                    writes += 1
+                    continue
+                if options['password'] and isinstance(entry.get('body'), dict):
+                    entry['body'] = {
+                        key: options['password'] if value == REDACTED and 'password' in key.lower() else value
+                        for key, value in entry['body'].items()
+                    }
+                entry['endpoint'] = entry.get('view') or self._endpoint(entry['path'])
+                entries.append(entry)
+                if options['limit'] and len(entries) >= options['limit']:
+                    break
+        entries.sort(key=lambda entry: entry.get('ts') or 0)
+        return entries, skipped, writes
+
+    def _endpoint(self, path):
+        path = path.split('?', 1)[0]
+        try:
+            return resolve(path).view_name
+        except Resolver404:
+            return path
+
+    def _tokens(self, entries):
+        """One access token per recorded user, minted locally"""
+        users = User.objects.in_bulk({entry['user_id'] for entry in entries if entry.get('user_id')})
+        return {
+            str(user_id): str(RefreshToken.for_user(user).access_token)
+            for user_id, user in users.items()
+        }
+
+    def _request(self, entry):
+        headers = {}
+        if entry.get('tenant_id'):
+            headers['X-Tenant-ID'] = entry['tenant_id']
+        token = self.tokens.get(entry.get('user_id'))
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        return entry['method'], entry['path'], headers, entry.get('body')
+
+    def _record(self, entry, elapsed, status_code, server_timing):
+        with self.lock:
+            self.samples[entry['endpoint']].append((elapsed, queries_from(server_timing), status_code))
+
+    def _delay(self, entry, first_ts, start, speed):
+        if not speed or not entry.get('ts'):
+            return 0
+        return (entry['ts'] - first_ts) / speed - (time.perf_counter() - start)
+
+    def _replay_threads(self, entries, concurrency, speed):
+        first_ts = entries[0].get('ts') or 0
+        start = time.perf_counter()
+
+        def one(entry):
+            delay = self._delay(entry, first_ts, start, speed)
+            if delay > 0:
+                time.sleep(delay)
+            sent = time.perf_counter()
+            status_code, server_timing = self.target.send(*self._request(entry))
+            self._record(entry, (time.perf_counter() - sent) * 1000, status_code, server_timing)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, entries))
+
+    async def _replay_async(self, entries, concurrency, speed):
+        first_ts = entries[0].get('ts') or 0
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(entry):
+            delay = self._delay(entry, first_ts, start, speed)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with semaphore:
+                sent = time.perf_counter()
+                status_code, server_timing = await self.target.asend(*self._request(entry))
+                self._record(entry, (time.perf_counter() - sent) * 1000, status_code, server_timing)
+
+        await asyncio.gather(*(one(entry) for entry in entries))
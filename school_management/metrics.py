@@ -0,0 +1,362 @@
+"""
+Prometheus text-format metrics.
+
+MetricsMiddleware records, per view:
+
+- http_requests_total{view, method, status, tier}
+- http_request_duration_seconds (histogram) {view, method}
+- http_request_cpu_seconds_total{view}, to see which endpoints burn CPU
+  (sync requests only)
+- db_queries_total / db_query_seconds_total{view}, read from the
+  QueryRecorder that QueryInstrumentationMiddleware attaches to the request
+
+plus cache_requests_total{cache, result} for in-process caches that call
+record_cache(). "tier" is the tenant's subscription state (active, expired,
+unsubscribed) or "none" for requests without a tenant.
+
+Recording is lock-free: each thread increments its own shard and shards are
+only summed when metrics are collected. With several gunicorn workers, set
+METRICS_DIR to a directory shared by the workers; every process then writes
+its totals there at most every METRICS_FLUSH_INTERVAL seconds and the
+/metrics endpoint merges all of them. gunicorn's worker_exit hook flushes a
+worker one last time (see gunicorn.conf.py), and the files of exited workers
+are folded into one archive file and removed, so their counters are kept
+without the directory growing; memory gauges are only reported for live
+workers. A new process that finds a file under its own (reused) pid archives
+it before writing its own, so counters never go backwards.
+"""
+import bisect
+import fcntl
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests by view, method, status and tenant tier'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view'),
+    'http_request_cpu_seconds_total': ('counter', 'CPU time spent handling requests by view'),
+    'db_queries_total': ('counter', 'SQL queries run by view'),
+    'db_query_seconds_total': ('counter', 'Time spent in SQL queries by view'),
+    'cache_requests_total': ('counter', 'In-process cache lookups by cache and result'),
+    'process_resident_memory_bytes': ('gauge', 'Resident memory of each worker process'),
+    'process_cpu_seconds_total': ('gauge', 'Total CPU time of each worker process'),
+}
+
+
+class _Shard:
+    """Metrics of one thread; only that thread ever writes to it"""
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.histograms = {}
+
+    def observe(self, key, value):
+        counts = self.histograms.get(key)
+        if counts is None:
+            counts = self.histograms[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+        counts[bisect.bisect_left(DURATION_BUCKETS, value)] += 1
+        counts[-1] += value
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_last_flush = [0.0]
+# Whether metrics-<pid>.json was written by this process rather than an exited one
+_owns_file = [False]
+
+ARCHIVE = 'archived-metrics.json'
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name, labels=(), value=1):
+    _shard().counters[(name, labels)] += value
+
+
+def record_cache(cache, hit):
+    inc('cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+
+def tenant_tier(request):
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None:
+        return 'none'
+    if tenant.subscription_end is None:
+        return 'unsubscribed'
+    return 'active' if tenant.subscription_end >= date.today() else 'expired'
+
+
+def snapshot():
+    """Totals of this process, merged across threads"""
+    counters = defaultdict(float)
+    histograms = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, value in dict(shard.counters).items():
+            counters[key] += value
+        for key, counts in dict(shard.histograms).items():
+            merged = histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(list(counts)):
+                merged[i] += count
+    return counters, histograms
+
+
+def _process_gauges():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, in KiB on Linux
+        rss = usage.ru_maxrss * 1024
+    pid = (('pid', str(os.getpid())),)
+    return {
+        ('process_resident_memory_bytes', pid): rss,
+        ('process_cpu_seconds_total', pid): usage.ru_utime + usage.ru_stime,
+    }
+
+
+def _path_for(pid):
+    return os.path.join(settings.METRICS_DIR, f'metrics-{pid}.json')
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _dump(counters, histograms, gauges=None):
+    return {
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'histograms': [[name, labels, counts] for (name, labels), counts in histograms.items()],
+        'gauges': [[name, labels, value] for (name, labels), value in (gauges or {}).items()],
+    }
+
+
+def _merge(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, counts in data['histograms']:
+        merged = histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(counts))
+        for i, count in enumerate(counts):
+            merged[i] += count
+
+
+@contextmanager
+def _directory_lock():
+    with open(os.path.join(settings.METRICS_DIR, 'metrics.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _archive(paths):
+    """Add the totals in paths (files of exited workers) to the archive and remove them"""
+    with _directory_lock():
+        # Another process may have archived some of them while we waited
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            return
+        counters, histograms = defaultdict(float), {}
+        archive = os.path.join(settings.METRICS_DIR, ARCHIVE)
+        for path in [archive] + paths:
+            data = _read(path)
+            if data is not None:
+                _merge(counters, histograms, data)
+        _write(archive, _dump(counters, histograms))
+        for path in paths:
+            os.remove(path)
+
+
+def flush():
+    """Write this process's totals to METRICS_DIR for the other workers to read"""
+    counters, histograms = snapshot()
+    path = _path_for(os.getpid())
+    if not _owns_file[0]:
+        if os.path.exists(path):
+            # Left by an exited worker that had the same pid
+            _archive([path])
+        _owns_file[0] = True
+    _write(path, _dump(counters, histograms, _process_gauges()))
+
+
+def _maybe_flush():
+    if not settings.METRICS_DIR:
+        return
+    now = time.monotonic()
+    if now - _last_flush[0] >= settings.METRICS_FLUSH_INTERVAL:
+        _last_flush[0] = now
+        flush()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Merge this process with the files of every other worker and the archive"""
+    counters, histograms = snapshot()
+    gauges = _process_gauges()
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        exited = []
+        for filename in os.listdir(settings.METRICS_DIR):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            pid = int(filename[len('metrics-'):-len('.json')])
+            path = os.path.join(settings.METRICS_DIR, filename)
+            if pid == os.getpid():
+                continue
+            if not _alive(pid):
+                exited.append(path)
+                continue
+            data = _read(path)
+            if data is None:
+                continue
+            _merge(counters, histograms, data)
+            for name, labels, value in data['gauges']:
+                gauges[(name, tuple(map(tuple, labels)))] = value
+        if exited:
+            _archive(exited)
+        archived = _read(os.path.join(settings.METRICS_DIR, ARCHIVE))
+        if archived is not None:
+            _merge(counters, histograms, archived)
+    return counters, histograms, gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render():
+    counters, histograms, gauges = collect()
+    by_name = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+        by_name[name].append(f'{name}{_labels(labels)} {_number(value)}')
+    for (name, labels), counts in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS + ('+Inf',), counts[:-1]):
+            cumulative += count
+            by_name[name].append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+        by_name[name].append(f'{name}_sum{_labels(labels)} {_number(counts[-1])}')
+        by_name[name].append(f'{name}_count{_labels(labels)} {cumulative}')
+
+    lines = []
+    for name in sorted(by_name):
+        kind, description = HELP.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(by_name[name])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, time.thread_time() - cpu_start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        # An async request's CPU time is spread over the event loop and executor
+        # threads it shares with other requests, so it is not attributed
+        self._record(request, response, time.perf_counter() - start, None)
+        return response
+
+    def _record(self, request, response, duration, cpu):
+        view = getattr(request, 'view_name', None) or 'unmatched'
+        shard = _shard()
+        counters = shard.counters
+        counters[('http_requests_total', (
+            ('view', view), ('method', request.method),
+            ('status', str(response.status_code)), ('tier', tenant_tier(request)),
+        ))] += 1
+        shard.observe(('http_request_duration_seconds', (('view', view), ('method', request.method))), duration)
+        view_label = (('view', view),)
+        if cpu is not None:
+            counters[('http_request_cpu_seconds_total', view_label)] += cpu
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            counters[('db_queries_total', view_label)] += recorder.count
+            counters[('db_query_seconds_total', view_label)] += recorder.duration
+
+        _maybe_flush()
+
+
+def _allowed(request):
+    """Scrapers need METRICS_TOKEN as a bearer token or an address in METRICS_ALLOWED_IPS"""
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # REMOTE_ADDR rather than X-Forwarded-For, which the client controls
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,17 @@
+"""
+Helpers shared by the apps' migrations.
+
+Some schema features (expression indexes, triggers, extensions) only exist on
+PostgreSQL, while development and the test suite also run on SQLite. Raw SQL
+for them goes through run_on_postgres, which other backends skip:
+
+    migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL))
+"""
+
+
+def run_on_postgres(sql):
+    """RunPython code that executes `sql` on PostgreSQL and does nothing elsewhere."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
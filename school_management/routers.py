@@ -0,0 +1,204 @@
+"""
+Read-replica routing.
+
+With REPLICA_DATABASE_URL set, settings.py adds a 'replica' database and
+ReplicaRouter sends the reads of opted-in code there; everything else,
+including all writes, stays on 'default'. Views opt in with a decorator,
+other code (reports, management commands) with a context manager:
+
+    @replica_reads
+    @api_view(['GET'])
+    def student_results(request, student_id): ...
+
+    class BookViewSet(viewsets.ModelViewSet):
+        @replica_reads
+        @action(detail=False, methods=['get'])
+        def stats(self, request): ...
+
+    with use_replica():
+        rows = attendance_report(tenant)
+
+Only decorate views that never write: the replica lags behind the primary,
+so a read there can miss rows written a moment ago. To keep users reading
+their own writes, ReplicaPinMiddleware notices any write during a request
+and pins the client to the primary for REPLICA_PIN_SECONDS, with a cookie
+(browsers) and a cache marker per user (API clients that drop cookies; it
+only spans workers when CACHES is shared, e.g. Redis). Reads inside
+transaction.atomic() always go to the primary.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+
+REPLICA_DB_ALIAS = 'replica'
+
+PIN_COOKIE = 'db_pin'
+
+
+class _RoutingState:
+    """Replica routing for one request (or one use_replica() block)"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.replica = False
+        self.wrote = False
+        self.pinned = None
+
+    def is_pinned(self):
+        if self.wrote:
+            return True
+        if self.pinned is not None:
+            return self.pinned
+        request = self.request
+        if request is None:
+            return False
+        if request.COOKIES.get(PIN_COOKIE):
+            self.pinned = True
+            return True
+        user = _known_user(request)
+        if user is None or not user.is_authenticated:
+            # The JWT user lookup itself runs before the user is known
+            return False
+        self.pinned = bool(cache.get(_pin_key(user.pk)))
+        return self.pinned
+
+
+_state = ContextVar('replica_routing', default=None)
+
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def _known_user(request):
+    """request.user if it is already resolved; resolving the lazy session user
+    here would run a query and route straight back into is_pinned()"""
+    user = vars(request).get('user')
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    return user
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send the reads of this block to the replica (if one is configured)"""
+    state = _state.get()
+    token = None
+    if state is None:
+        state = _RoutingState()
+        token = _state.set(state)
+    previous = state.replica
+    state.replica = True
+    try:
+        yield
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def replica_reads(view):
+    """Opt a read-only view (function, async function or viewset action) in to the replica"""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with use_replica():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with use_replica():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or not replica_configured():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or state.is_pinned():
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly, or Django would save an instance read from the replica back there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both; lets replica-read instances be assigned to saved ones
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Tracks writes per request and pins the client to the primary after one"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = _RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        user = self._pin(request, response, state)
+        if user is not None:
+            cache.set(_pin_key(user.pk), True, self.seconds)
+        return response
+
+    async def __acall__(self, request):
+        # ORM code run through sync_to_async gets a copy of this context, and
+        # the routers mark the same state object
+        state = _RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        user = self._pin(request, response, state)
+        if user is not None:
+            await cache.aset(_pin_key(user.pk), True, self.seconds)
+        return response
+
+    def _pin(self, request, response, state):
+        """Set the pin cookie after a write; returns the user to pin in the cache, if known"""
+        if not (state.wrote and replica_configured()):
+            return None
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=self.seconds, httponly=True,
+            samesite='Lax', secure=request.is_secure()
+        )
+        user = _known_user(request)
+        if user is not None and user.is_authenticated:
+            return user
+        return None
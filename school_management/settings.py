@@ -15,6 +15,7 @@ from decouple import config
 from datetime import timedelta
 import dj_database_url
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -61,11 +63,17 @@ INSTALLED_APPS = [
     'timetable',
     'school_classes',
     'courses',
+    # For the project-wide management commands in school_management/management
+    'school_management',
 ]
 
 MIDDLEWARE = [
+    'school_management.metrics.MetricsMiddleware',
+    'school_management.traffic.TrafficRecorderMiddleware',
+    'school_management.instrumentation.QueryInstrumentationMiddleware',
+    'school_management.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'school_management.static.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,26 +108,140 @@ WSGI_APPLICATION = 'school_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# True under `manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # PostgreSQL Configuration (Production & Development)
 # Render provides DATABASE_URL automatically for PostgreSQL
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# Connection handling, per worker process (gunicorn.conf.py sizes the workers):
+# - by default connections persist for CONN_MAX_AGE seconds
+# - DB_POOL_MAX_SIZE > 0 uses psycopg 3's connection pool instead; needs
+#   `pip install "psycopg[binary,pool]"`, which Django then prefers over psycopg2
+# - DB_EXTERNAL_POOLER=True for PgBouncer in transaction mode: no server-side
+#   cursors or prepared statements, which break when PgBouncer switches the
+#   server connection between transactions
+# CONN_HEALTH_CHECKS pings a persistent connection before a request reuses it.
+CONN_MAX_AGE = config('CONN_MAX_AGE', default=600, cast=int)
+CONN_HEALTH_CHECKS = config('CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=0, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+DB_EXTERNAL_POOLER = config('DB_EXTERNAL_POOLER', default=False, cast=bool)
+
+
+def _connection_settings(database):
+    """Apply the connection handling above to a DATABASES entry"""
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = CONN_HEALTH_CHECKS
+    if 'postgresql' not in database['ENGINE']:
+        return database
+    options = database.setdefault('OPTIONS', {})
+    if DB_POOL_MAX_SIZE:
+        # Django refuses persistent connections together with a pool
+        database['CONN_MAX_AGE'] = 0
+        options['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    if DB_EXTERNAL_POOLER:
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+        try:
+            import psycopg  # noqa: F401
+        except ImportError:
+            pass  # psycopg2 never uses server-side prepared statements
+        else:
+            options['prepare_threshold'] = None
+    return database
+
+
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        'default': _connection_settings(dj_database_url.parse(DATABASE_URL))
     }
 else:
     DATABASES = {
-        'default': {
+        'default': _connection_settings({
             'ENGINE': 'django.db.backends.postgresql',
             'NAME': config('DB_NAME', default='school_management'),
             'USER': config('DB_USER', default='postgres'),
             'PASSWORD': config('DB_PASSWORD', default=''),
             'HOST': config('DB_HOST', default='localhost'),
             'PORT': config('DB_PORT', default='5432'),
-        }
+        })
     }
 
+# Read replica for the views and reports that opt in (see school_management/routers.py);
+# clients are pinned to the primary for REPLICA_PIN_SECONDS after they write
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = _connection_settings(dj_database_url.parse(REPLICA_DATABASE_URL))
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+elif TESTING and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # A separate SQLite database stands in for the replica, so tests can see where reads go
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'NAME': None}}
+DATABASE_ROUTERS = ['school_management.routers.ReplicaRouter']
+
+
+# Query instrumentation (see school_management/instrumentation.py)
+# Views over their @query_budget fail under `manage.py test` and only log in production
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=TESTING, cast=bool)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+# Append the query shapes of sampled requests to this JSONL file for `manage.py advise_indexes`
+QUERY_CAPTURE_PATH = config('QUERY_CAPTURE_PATH', default='')
+QUERY_CAPTURE_SAMPLE = config('QUERY_CAPTURE_SAMPLE', default=1.0, cast=float)
+
+# Active tenants and their features are cached in each process for this many
+# seconds (see tenants/cache.py); 0 disables the cache. It is also how long other
+# workers keep serving a tenant after it is deactivated.
+TENANT_CACHE_TTL = config('TENANT_CACHE_TTL', default=0 if TESTING else 60, cast=int)
+
+# Optional PostgreSQL partitioning of attendance, results, audit_logs and
+# content_progress by tenant: '' (off), 'list' (one partition per tenant) or
+# 'hash' (TENANT_PARTITION_COUNT partitions); see tenants/partitioning.py
+TENANT_PARTITIONING = config('TENANT_PARTITIONING', default='')
+TENANT_PARTITION_COUNT = config('TENANT_PARTITION_COUNT', default=16, cast=int)
+
+# Prometheus metrics at /metrics/ (see school_management/metrics.py).
+# METRICS_DIR must be shared by all gunicorn workers of one instance.
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+# /metrics/ answers 403 unless the scraper sends "Authorization: Bearer
+# <METRICS_TOKEN>" or connects from one of METRICS_ALLOWED_IPS (comma-separated)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in config('METRICS_ALLOWED_IPS', default='').split(',') if ip.strip()]
+
+# Timetable generation jobs run in a thread of the web worker that created
+# them; turn this off to leave them to `manage.py run_timetable_jobs --watch`.
+# Jobs still running this long past their time limit are assumed to have died
+# with their worker and are picked up again by run_timetable_jobs.
+TIMETABLE_JOBS_IN_THREAD = config('TIMETABLE_JOBS_IN_THREAD', default=True, cast=bool)
+TIMETABLE_JOB_GRACE_SECONDS = config('TIMETABLE_JOB_GRACE_SECONDS', default=300, cast=int)
+
+# Append sampled API calls to this JSONL file for `manage.py replay_traffic`
+TRAFFIC_RECORD_PATH = config('TRAFFIC_RECORD_PATH', default='')
+TRAFFIC_RECORD_SAMPLE = config('TRAFFIC_RECORD_SAMPLE', default=1.0, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'school_management.queries': {
+            'handlers': ['console'],
+            'level': config('QUERY_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
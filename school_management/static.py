@@ -0,0 +1,37 @@
+"""
+WhiteNoise as sync- and async-capable middleware.
+
+whitenoise.middleware.WhiteNoiseMiddleware is sync-only, so under ASGI Django
+would run it in a thread and hop back to the event loop for everything below
+it on every request. Looking a path up in WhiteNoise's file table does no
+I/O (serving a hit only opens the file), so the async path does it on the
+event loop and awaits the rest of the chain.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Development only: searches the finders on disk
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,363 @@
+import datetime
+import io
+import json
+import os
+import subprocess
+import tempfile
+from collections import defaultdict
+from unittest import mock
+
+from django.db import transaction
+from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import AuditLog, User
+from library.models import Book, BookIssue
+from school_classes.models import SchoolClass
+from students.models import Student
+from tenants.models import Tenant
+from transport.models import Route, TransportAssignment, Vehicle
+from .instrumentation import QueryBudgetExceeded, QueryInstrumentationMiddleware, QueryRecorder, query_budget
+from .routers import PIN_COOKIE, ReplicaPinMiddleware, use_replica
+from . import metrics, traffic
+
+
+# Under `manage.py test` on SQLite, 'replica' is a separate empty database, so
+# a read that went there does not see rows written to 'default'. Not a TestCase:
+# reads inside its per-test transaction would all be kept on the primary.
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='root@school.test', password=None, first_name='Root', last_name='Admin'
+        )
+        AuditLog.objects.create(
+            user=self.admin, action='create', model_name='Tenant',
+            description='Created a school', ip_address='127.0.0.1'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _through_middleware(self, view, **cookies):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaPinMiddleware(view)(request)
+
+    def test_reads_go_to_replica_only_when_opted_in(self):
+        self.assertEqual(Tenant.objects.all().db, 'default')
+        with use_replica():
+            self.assertEqual(Tenant.objects.all().db, 'replica')
+            with transaction.atomic():
+                self.assertEqual(Tenant.objects.all().db, 'default')
+
+    def test_opted_in_view_reads_replica(self):
+        response = self.client.get('/api/auth/audit-logs/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        self.client.cookies[PIN_COOKIE] = '1'
+        response = self.client.get('/api/auth/audit-logs/')
+
+        self.assertEqual(len(response.json()), 1)
+
+    def test_write_pins_rest_of_request_and_sets_cookie(self):
+        seen = []
+
+        def view(request):
+            with use_replica():
+                seen.append(Tenant.objects.all().db)
+                Tenant.objects.create(name='Pinned School', email='pin@school.test', school_code='PIN001')
+                seen.append(Tenant.objects.all().db)
+            return HttpResponse()
+
+        response = self._through_middleware(view)
+
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE].value, '1')
+
+    def test_read_only_request_sets_no_cookie(self):
+        def view(request):
+            with use_replica():
+                list(Tenant.objects.all())
+            return HttpResponse()
+
+        self.assertNotIn(PIN_COOKIE, self._through_middleware(view).cookies)
+
+
+class MetricsFileTests(SimpleTestCase):
+    KEY = ('http_requests_total', (('view', 'test'),))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        settings = override_settings(METRICS_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def own_requests(self, count):
+        """Stand in for this process's shards"""
+        return mock.patch.object(
+            metrics, 'snapshot', side_effect=lambda: (defaultdict(float, {self.KEY: count}), {})
+        )
+
+    def write(self, pid, requests):
+        with open(os.path.join(self.dir, f'metrics-{pid}.json'), 'w') as f:
+            json.dump(metrics._dump({self.KEY: requests}, {}), f)
+
+    def read(self, filename):
+        with open(os.path.join(self.dir, filename)) as f:
+            return json.load(f)['counters'][0][2]
+
+    def exited_pid(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        return process.pid
+
+    def test_exited_worker_files_are_archived(self):
+        self.write(self.exited_pid(), 3)
+        self.write(self.exited_pid(), 4)
+
+        with self.own_requests(1):
+            self.assertEqual(metrics.collect()[0][self.KEY], 8)
+            self.assertEqual(sorted(os.listdir(self.dir)), [metrics.ARCHIVE, 'metrics.lock'])
+            self.assertEqual(metrics.collect()[0][self.KEY], 8)
+
+    def test_reused_pid_archives_previous_file(self):
+        self.write(os.getpid(), 5)
+
+        with self.own_requests(1), mock.patch.object(metrics, '_owns_file', [False]):
+            metrics.flush()
+
+        self.assertEqual(self.read(metrics.ARCHIVE), 5)
+        self.assertEqual(self.read(f'metrics-{os.getpid()}.json'), 1)
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def get(self, **headers):
+        return self.client.get('/metrics/', **headers)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+    def test_denied_when_nothing_is_configured(self):
+        self.assertEqual(self.get().status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret', METRICS_ALLOWED_IPS=[])
+    def test_token(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowlist_ignores_forwarded_for(self):
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.get(REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='10.0.0.5').status_code, 403)
+
+
+class AsyncMiddlewareTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_project_middleware_stays_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        for path in settings.MIDDLEWARE:
+            if path.startswith(('school_management.', 'tenants.')):
+                self.assertTrue(iscoroutinefunction(import_string(path)(get_response)), path)
+
+    async def test_queries_of_sync_views_are_counted_under_asgi(self):
+        admin = await User.objects.acreate(
+            email='root@school.test', first_name='Root', last_name='Admin', role='super_admin', is_superuser=True
+        )
+        token = RefreshToken.for_user(admin).access_token
+        response = await AsyncClient().get('/api/auth/profile/', headers={'Authorization': f'Bearer {token}'})
+
+        self.assertEqual(response.status_code, 200)
+        # At least the JWT user lookup
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+
+class QueryCaptureTests(SimpleTestCase):
+    def test_only_select_shapes_are_captured(self):
+        recorder = QueryRecorder()
+        execute = mock.Mock()
+        recorder(execute, 'SELECT "id" FROM "users" WHERE "email" = %s', ['a@school.test'], False, {})
+        recorder(execute, 'UPDATE "users" SET "password" = %s WHERE "id" = %s', ['pbkdf2$...', 1], False, {})
+        recorder(execute, 'INSERT INTO "audit_logs" ("description") VALUES (%s)', ['Logged in'], False, {})
+
+        captured = list(recorder.captured('login'))
+
+        self.assertEqual([entry['sql'] for entry in captured], ['SELECT "id" FROM "users" WHERE "email" = %s'])
+        self.assertEqual(captured[0]['params'], ['a@school.test'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    def run_view(self, view):
+        request = RequestFactory().get('/')
+        request.user = None
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        return middleware(request)
+
+    def test_view_over_its_budget_fails(self):
+        @query_budget(2)
+        def view(request):
+            for _ in range(3):
+                Tenant.objects.exists()
+            return HttpResponse()
+
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'ran 3 queries (budget 2)'):
+            self.run_view(view)
+
+    def test_repeated_shapes_over_max_repeats_fail(self):
+        @query_budget(10, max_repeats=2)
+        def view(request):
+            for code in ('A', 'B', 'C'):
+                Tenant.objects.filter(school_code=code).exists()
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(view)
+
+    def test_view_within_its_budget_passes(self):
+        @query_budget(3)
+        def view(request):
+            Tenant.objects.exists()
+            return HttpResponse()
+
+        self.assertEqual(self.run_view(view).status_code, 200)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_only_logs_when_not_strict(self):
+        @query_budget(0)
+        def view(request):
+            Tenant.objects.exists()
+            return HttpResponse()
+
+        with self.assertLogs('school_management.queries', 'WARNING'):
+            self.assertEqual(self.run_view(view).status_code, 200)
+
+
+class BudgetedEndpointTests(TestCase):
+    """
+    The endpoints with a @query_budget, with enough rows that an N+1 would
+    exceed it (QUERY_BUDGET_STRICT is on under manage.py test). Requests carry
+    a real JWT so the user lookup counts, as it does in production.
+    """
+    ROWS = 6
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Budget School', email='budget@school.test', school_code='BUD001')
+        self.admin = User.objects.create_user(
+            email='admin@budget.test', first_name='Budget', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        route = Route.objects.create(tenant=self.tenant, route_name='North')
+        vehicle = Vehicle.objects.create(
+            tenant=self.tenant, vehicle_number='BUS-1', capacity=40, driver_name='Driver',
+            driver_phone='555', route=route
+        )
+        for i in range(self.ROWS):
+            school_class = SchoolClass.objects.create(
+                tenant=self.tenant, grade=str(6 + i % 3), section=chr(65 + i), academic_year='2026-2027'
+            )
+            user = User.objects.create_user(
+                email=f'student{i}@budget.test', first_name=f'Student{i}', last_name='Budget',
+                role='student', tenant=self.tenant
+            )
+            student = Student.objects.create(
+                tenant=self.tenant, user=user, admission_number=f'BUD-{i}', date_of_birth=datetime.date(2012, 1, 1),
+                gender='female', school_class=school_class, class_name=school_class.class_name,
+                section=school_class.section, admission_date=datetime.date(2020, 6, 1), academic_year='2026-2027'
+            )
+            book = Book.objects.create(
+                tenant=self.tenant, title=f'Book {i}', author='Author', isbn=f'97800000001{i:02}',
+                category=f'Category {i % 2}', total_copies=2, available_copies=1
+            )
+            BookIssue.objects.create(
+                tenant=self.tenant, book=book, user=user, issue_date=datetime.date(2026, 9, 1),
+                due_date=datetime.date(2026, 9, 15)
+            )
+            if i % 2:
+                Vehicle.objects.create(
+                    tenant=self.tenant, vehicle_number=f'VAN-{i}', capacity=10, driver_name='Driver',
+                    driver_phone='555', route=route
+                )
+                TransportAssignment.objects.create(
+                    tenant=self.tenant, vehicle=vehicle, route=route,
+                    content_type=ContentType.objects.get_for_model(Student), object_id=student.id,
+                    pickup_point='Gate', monthly_fee=100, effective_from=datetime.date(2026, 6, 1)
+                )
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id), 'Authorization': f'Bearer {token}'})
+
+    def assertWithinBudget(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_library_stats(self):
+        self.assertWithinBudget('/api/library/books/stats/')
+
+    def test_class_statistics(self):
+        response = self.assertWithinBudget('/api/classes/statistics/')
+        self.assertEqual(response.data['totalStudents'], self.ROWS)
+
+    def test_fleet_occupancy(self):
+        response = self.assertWithinBudget('/api/transport/vehicles/occupancy/')
+        self.assertEqual(len(response.data['vehicles']), 1 + self.ROWS // 2)
+
+    def test_available_users(self):
+        # Including the content type lookup of a cold cache
+        ContentType.objects.clear_cache()
+        response = self.assertWithinBudget('/api/transport/assignments/available_users/')
+        self.assertEqual(len(response.data), self.ROWS - self.ROWS // 2)
+
+
+class TrafficRedactionTests(SimpleTestCase):
+    def test_keys_containing_sensitive_words_are_redacted(self):
+        body = {
+            'email': 'a@school.test', 'Password1': 'x', 'otp_code': '123456', 'refresh': 'r',
+            'user': {'reset_token': 't', 'name': 'Ada'}, 'items': [{'client_secret': 's'}],
+        }
+
+        self.assertEqual(traffic._redact(body), {
+            'email': 'a@school.test', 'Password1': traffic.REDACTED, 'otp_code': traffic.REDACTED,
+            'refresh': traffic.REDACTED, 'user': {'reset_token': traffic.REDACTED, 'name': 'Ada'},
+            'items': [{'client_secret': traffic.REDACTED}],
+        })
+
+
+class ReplayTrafficTests(TestCase):
+    def replay(self, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+            for method in ('GET', 'POST', 'DELETE'):
+                f.write(json.dumps({'ts': 1.0, 'method': method, 'path': '/api/auth/profile/'}) + '\n')
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        with mock.patch.object(traffic.Target, 'send', return_value=(200, '')) as send:
+            call_command('replay_traffic', f.name, '--concurrency', '1', *args, stdout=out)
+        return [call.args[0] for call in send.call_args_list], out.getvalue()
+
+    def test_writes_are_skipped_by_default(self):
+        methods, output = self.replay()
+
+        self.assertEqual(methods, ['GET'])
+        self.assertIn('Skipped 2 write requests', output)
+
+    def test_allow_writes(self):
+        methods, _ = self.replay('--allow-writes')
+
+        self.assertEqual(methods, ['GET', 'POST', 'DELETE'])
@@ -0,0 +1,204 @@
+"""
+Recording and replaying API traffic.
+
+TrafficRecorderMiddleware appends one JSON line per API request to
+TRAFFIC_RECORD_PATH (off when unset), sampled by TRAFFIC_RECORD_SAMPLE:
+
+    {"ts": 1718000000.12, "method": "GET", "path": "/api/classes/?page=2",
+     "view": "school-class-list", "user_id": "...", "tenant_id": "...",
+     "body": null, "status": 200, "ms": 12.3, "queries": 4}
+
+In JSON bodies, the values of keys containing "password", "token", "otp" or
+"secret" (any case, e.g. new_password or otp_code) are replaced by "<redacted>".
+`manage.py replay_traffic` sends such a file back through Target, either to
+the in-process test client or to a running server, and summarize() turns
+the samples into per-endpoint latency percentiles and query counts. It only
+replays GET, HEAD and OPTIONS requests unless given --allow-writes, since
+replayed writes change whatever database the target uses.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from urllib import error, request as urlrequest
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.test import AsyncClient, Client
+
+
+REDACTED = '<redacted>'
+
+# Any key containing one of these (e.g. new_password, otp_code, refresh_token)
+SENSITIVE_PARTS = ('password', 'token', 'otp', 'secret')
+# simplejwt's token fields
+SENSITIVE_KEYS = {'refresh', 'access'}
+
+MAX_BODY_BYTES = 64 * 1024
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _sensitive(key):
+    key = str(key).lower()
+    return key in SENSITIVE_KEYS or any(part in key for part in SENSITIVE_PARTS)
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if _sensitive(key) else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+class TrafficRecorderMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.path = getattr(settings, 'TRAFFIC_RECORD_PATH', '')
+        self.sample = getattr(settings, 'TRAFFIC_RECORD_SAMPLE', 1.0)
+        self.lock = threading.Lock()
+
+    def _sampled(self, request):
+        return self.path and request.path.startswith('/api/') and random.random() < self.sample
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._sampled(request):
+            return self.get_response(request)
+        body, started = self._body(request), time.time()
+        response = self.get_response(request)
+        self._write(request, response, body, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled(request):
+            return await self.get_response(request)
+        body, started = self._body(request), time.time()
+        response = await self.get_response(request)
+        self._write(request, response, body, started)
+        return response
+
+    def _body(self, request):
+        if request.content_type == 'application/json' and len(request.body) <= MAX_BODY_BYTES:
+            try:
+                return _redact(json.loads(request.body or b'null'))
+            except ValueError:
+                pass
+        return None
+
+    def _write(self, request, response, body, started):
+        user = getattr(request, 'user', None)
+        recorder = getattr(request, 'query_recorder', None)
+        entry = {
+            'ts': round(started, 3),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': getattr(request, 'view_name', None),
+            'user_id': str(user.id) if getattr(user, 'is_authenticated', False) else None,
+            'tenant_id': str(request.tenant_id) if getattr(request, 'tenant_id', None) else None,
+            'body': body,
+            'status': response.status_code,
+            'ms': round((time.time() - started) * 1000, 1),
+            'queries': recorder.count if recorder is not None else None,
+        }
+        line = json.dumps(entry, default=str) + '\n'
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+
+def queries_from(server_timing):
+    match = _QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class Target:
+    """Sends requests to the in-process test client, or over HTTP to base_url"""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.local = threading.local()
+
+    def send(self, method, path, headers, data=None):
+        """Returns (status code, Server-Timing header)"""
+        body = json.dumps(data) if data is not None else None
+        if self.base_url is None:
+            client = getattr(self.local, 'client', None)
+            if client is None:
+                client = self.local.client = Client()
+            response = client.generic(method, path, body or '', content_type='application/json', headers=headers)
+            return response.status_code, response.get('Server-Timing', '')
+
+        req = urlrequest.Request(
+            self.base_url + path,
+            data=body.encode() if body else None,
+            method=method,
+            headers={**headers, 'Content-Type': 'application/json'},
+        )
+        try:
+            with urlrequest.urlopen(req, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except error.HTTPError as e:
+            return e.code, e.headers.get('Server-Timing', '')
+
+    async def asend(self, method, path, headers, data=None):
+        """send() for asyncio callers; in-process requests use AsyncClient"""
+        if self.base_url is not None:
+            return await asyncio.to_thread(self.send, method, path, headers, data)
+        body = json.dumps(data) if data is not None else ''
+        response = await AsyncClient().generic(method, path, body, content_type='application/json', headers=headers)
+        return response.status_code, response.get('Server-Timing', '')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    """samples: {endpoint: [(ms, queries or None, status), ...]} -> per-endpoint stats"""
+    endpoints = {}
+    for name, rows in samples.items():
+        latencies = [row[0] for row in rows]
+        queries = [row[1] for row in rows if row[1] is not None]
+        endpoints[name] = {
+            'count': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 400),
+            'p50': round(percentile(latencies, 0.50), 1),
+            'p95': round(percentile(latencies, 0.95), 1),
+            'p99': round(percentile(latencies, 0.99), 1),
+            'queries': round(sum(queries) / len(queries), 1) if queries else None,
+            'max_queries': max(queries) if queries else None,
+        }
+    return endpoints
+
+
+def format_report(report, baseline=None):
+    summary = (f"{report['requests']} requests, concurrency {report['concurrency']}: "
+               f"{report['seconds']}s, {report['throughput']} req/s")
+    if baseline and baseline.get('throughput'):
+        summary += f" (baseline {baseline['throughput']} req/s, {report['throughput'] / baseline['throughput'] - 1:+.0%})"
+    lines = [summary]
+    header = f"{'endpoint':<32}{'count':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'max q':>7}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    lines += [header, '-' * len(header)]
+    for name, row in report['endpoints'].items():
+        line = (f"{name[:31]:<32}{row['count']:>7}{row['errors']:>5}{row['p50']:>9}{row['p95']:>9}"
+                f"{row['p99']:>9}{str(row['queries']):>9}{str(row['max_queries']):>7}")
+        base = (baseline or {}).get('endpoints', {}).get(name)
+        if base and base['p95']:
+            line += f"{(row['p95'] - base['p95']) / base['p95'] * 100:>+12.0f}%"
+        lines.append(line)
+    return '\n'.join(lines)
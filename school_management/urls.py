@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
@@ -33,6 +35,7 @@ urlpatterns = [
     path('api/timetable/', include('timetable.urls')),
     path('api/library/', include('library.urls')),
     path('api/courses/', include('courses.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
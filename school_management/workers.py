@@ -0,0 +1,7 @@
+"""gunicorn worker classes (see gunicorn.conf.py)"""
+from uvicorn_worker import UvicornWorker
+
+
+class DjangoUvicornWorker(UvicornWorker):
+    # Django does not implement the ASGI lifespan protocol
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, 'lifespan': 'off'}
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from students.models import PromotionRun
+from students.promotion import DEFAULT_CHUNK_SIZE, apply_run
+
+
+class Command(BaseCommand):
+    help = 'Apply or resume an academic year promotion run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('run_id', help='PromotionRun id')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Resume a run left in "running" state by a worker that died'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run = PromotionRun.objects.get(id=options['run_id'])
+        except (PromotionRun.DoesNotExist, ValueError):
+            raise CommandError(f"Promotion run {options['run_id']} not found")
+
+        apply_run(run.id, chunk_size=options['chunk_size'], force=options['force'])
+        run.refresh_from_db()
+        if run.status != 'completed':
+            raise CommandError(f'Run is {run.status}: {run.error}')
+
+        counters = run.result.get('counters', {})
+        self.stdout.write(self.style.SUCCESS(
+            f"Promoted {counters.get('promoted', 0)}, retained {counters.get('retained', 0)}, "
+            f"graduated {counters.get('graduated', 0)} students"
+        ))
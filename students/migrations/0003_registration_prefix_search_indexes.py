@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+from school_management.migration_utils import run_on_postgres
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_student_school_class'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='academicregistration',
+            index=models.Index(fields=['student', 'is_current'], name='academic_re_student_699703_idx'),
+        ),
+        # Case-insensitive prefix (istartswith) lookups can only use these on PostgreSQL
+        migrations.RunPython(
+            run_on_postgres('CREATE INDEX students_admission_number_prefix_idx ON students (UPPER(admission_number) text_pattern_ops);'),
+            run_on_postgres('DROP INDEX IF EXISTS students_admission_number_prefix_idx;'),
+        ),
+    ]
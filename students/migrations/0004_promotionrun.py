@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_registration_prefix_search_indexes'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromotionRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('from_year', models.CharField(max_length=20)),
+                ('to_year', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('planned', 'Planned'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='planned', max_length=20)),
+                ('plan', models.JSONField(default=dict, help_text='Class mapping and per-class student counts')),
+                ('total_students', models.IntegerField(default=0)),
+                ('processed_students', models.IntegerField(default=0)),
+                ('cursor', models.UUIDField(blank=True, help_text='Last student processed, for resuming', null=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='promotion_runs', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'promotion_runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['tenant', 'status'], name='promotion_r_tenant__0be1a4_idx')],
+            },
+        ),
+    ]
@@ -88,6 +88,47 @@ class AcademicRegistration(models.Model):
     class Meta:
         db_table = 'academic_registrations'
         ordering = ['-registration_date']
+        indexes = [
+            models.Index(fields=['student', 'is_current']),
+        ]
     
     def __str__(self):
         return f"{self.student} - {self.academic_year}"
+
+
+class PromotionRun(models.Model):
+    """Academic year rollover: a planned class mapping and its (resumable) application"""
+    STATUS_CHOICES = (
+        ('planned', 'Planned'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE, related_name='promotion_runs')
+    from_year = models.CharField(max_length=20)
+    to_year = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned')
+    plan = models.JSONField(default=dict, help_text="Class mapping and per-class student counts")
+    total_students = models.IntegerField(default=0)
+    processed_students = models.IntegerField(default=0)
+    cursor = models.UUIDField(null=True, blank=True, help_text="Last student processed, for resuming")
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'promotion_runs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.from_year} -> {self.to_year} ({self.status})"
@@ -0,0 +1,290 @@
+"""
+Academic year rollover.
+
+A PromotionRun is planned first: every SchoolClass of the old year is mapped
+to a (grade, section) in the new year, or to graduation, and the students
+affected are counted. The stored plan doubles as the dry-run diff.
+
+Applying a run creates the missing classes, then walks the old year's
+students by primary key in chunks. Each chunk is one transaction that:
+
+- moves students with one CASE UPDATE (class, class_name, section, year),
+- marks graduates inactive,
+- closes current AcademicRegistrations and bulk_creates the new ones,
+- saves the run's cursor and counters.
+
+A run that stops half way can be applied again and continues after its
+cursor; already-promoted students have left the old year and are skipped.
+"""
+import re
+import threading
+import traceback
+
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Count, Q, UUIDField, Value, When
+from django.utils import timezone
+
+from school_classes.models import SchoolClass
+from .models import AcademicRegistration, PromotionRun, Student
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class PromotionError(Exception):
+    pass
+
+
+def _next_grade(grade):
+    try:
+        return str(int(grade) + 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def _target_class_name(old_class, grade, section):
+    # 'Grade 8-A' -> 'Grade 9-A'; otherwise the SchoolClass default naming
+    pattern = r'\b' + re.escape(str(old_class.grade)) + r'\b'
+    if re.search(pattern, old_class.class_name or '') and section == old_class.section:
+        return re.sub(pattern, str(grade), old_class.class_name, count=1)
+    return f"Grade {grade}-{section}"
+
+
+def _student_condition(class_id, class_name, section):
+    # Students are matched by class FK, or by name/section when the FK was never set
+    return Q(school_class_id=class_id) | Q(
+        school_class__isnull=True, class_name=class_name, section=section
+    )
+
+
+def build_plan(tenant, from_year, to_year, grade_map=None, final_grade=None, class_map=None):
+    """Map every class of from_year to a new-year class or to graduation"""
+    if from_year == to_year:
+        raise PromotionError('The new academic year must differ from the current one')
+
+    old_classes = list(SchoolClass.objects.filter(tenant=tenant, academic_year=from_year))
+    if not old_classes:
+        raise PromotionError(f'No classes found for academic year {from_year}')
+
+    grade_map = {str(k): v for k, v in (grade_map or {}).items()}
+    overrides = {str(item['from_class_id']): item for item in (class_map or [])}
+    if final_grade is None:
+        numeric = [int(c.grade) for c in old_classes if str(c.grade).isdigit()]
+        final_grade = str(max(numeric)) if numeric else None
+
+    # Students per old class in one aggregate
+    counts = {}
+    unmapped = 0
+    by_name = {(c.class_name, c.section or ''): str(c.id) for c in old_classes}
+    rows = Student.objects.filter(tenant=tenant, academic_year=from_year, is_active=True).values(
+        'school_class_id', 'class_name', 'section'
+    ).annotate(total=Count('id')).order_by()
+    old_ids = {str(c.id) for c in old_classes}
+    for row in rows:
+        class_id = str(row['school_class_id']) if row['school_class_id'] else None
+        if class_id not in old_ids:
+            class_id = by_name.get((row['class_name'], row['section'] or '')) if not class_id else None
+        if class_id:
+            counts[class_id] = counts.get(class_id, 0) + row['total']
+        else:
+            unmapped += row['total']
+
+    existing = {
+        (c.grade, c.section): c
+        for c in SchoolClass.objects.filter(tenant=tenant, academic_year=to_year)
+    }
+
+    mappings = []
+    for old in sorted(old_classes, key=lambda c: (str(c.grade), c.section)):
+        override = overrides.get(str(old.id))
+        if override is not None:
+            to_grade = override.get('to_grade')
+            to_section = override.get('to_section') or old.section
+        elif str(old.grade) in grade_map:
+            to_grade = grade_map[str(old.grade)]
+            to_section = old.section
+        elif final_grade is not None and str(old.grade) == str(final_grade):
+            to_grade = None
+            to_section = None
+        else:
+            to_grade = _next_grade(old.grade)
+            to_section = old.section
+            if to_grade is None:
+                raise PromotionError(
+                    f'Grade {old.grade} is not numeric; add it to grade_map or class_map'
+                )
+
+        target = existing.get((str(to_grade), to_section)) if to_grade else None
+        mappings.append({
+            'from_class_id': str(old.id),
+            'from_class_name': old.class_name,
+            'from_grade': old.grade,
+            'from_section': old.section,
+            'class_teacher_id': str(old.class_teacher_id) if old.class_teacher_id else None,
+            'graduate': to_grade is None,
+            'to_grade': str(to_grade) if to_grade else None,
+            'to_section': to_section,
+            'to_class_name': (
+                target.class_name if target else _target_class_name(old, to_grade, to_section)
+            ) if to_grade else None,
+            'create_class': bool(to_grade) and target is None,
+            'students': counts.get(str(old.id), 0),
+        })
+
+    return {
+        'mappings': mappings,
+        'final_grade': final_grade,
+        'promoted': sum(m['students'] for m in mappings if not m['graduate']),
+        'graduating': sum(m['students'] for m in mappings if m['graduate']),
+        'unmapped_students': unmapped,
+        'classes_to_create': sum(1 for m in mappings if m['create_class']),
+    }
+
+
+def _ensure_classes(run, plan, carry_class_teachers, retaining):
+    """Create the new-year classes the plan needs; returns {(grade, section): SchoolClass}"""
+    wanted = {}
+    for mapping in plan['mappings']:
+        keys = []
+        if retaining:
+            # Retained students repeat their grade in the new year
+            keys.append((mapping['from_grade'], mapping['from_section'], mapping['from_class_name']))
+        if not mapping['graduate']:
+            keys.append((mapping['to_grade'], mapping['to_section'], mapping['to_class_name']))
+        for grade, section, class_name in keys:
+            wanted.setdefault((str(grade), section), (class_name, mapping))
+
+    SchoolClass.objects.bulk_create([
+        SchoolClass(
+            tenant_id=run.tenant_id,
+            grade=grade,
+            section=section,
+            class_name=class_name,
+            academic_year=run.to_year,
+            class_teacher_id=mapping['class_teacher_id'] if carry_class_teachers else None,
+        )
+        for (grade, section), (class_name, mapping) in wanted.items()
+    ], ignore_conflicts=True)
+
+    return {
+        (c.grade, c.section): c
+        for c in SchoolClass.objects.filter(tenant_id=run.tenant_id, academic_year=run.to_year)
+    }
+
+
+def _move(queryset, moves, to_year):
+    """One CASE UPDATE moving students of each old class to its new class"""
+    if not moves:
+        return 0
+    return queryset.update(
+        school_class_id=Case(
+            *[When(condition, then=Value(new.id)) for condition, new in moves],
+            output_field=UUIDField()
+        ),
+        class_name=Case(
+            *[When(condition, then=Value(new.class_name)) for condition, new in moves],
+            output_field=CharField()
+        ),
+        section=Case(
+            *[When(condition, then=Value(new.section)) for condition, new in moves],
+            output_field=CharField()
+        ),
+        academic_year=to_year,
+        updated_at=timezone.now(),
+    )
+
+
+def apply_run(run_id, chunk_size=DEFAULT_CHUNK_SIZE, force=False):
+    """Apply (or resume) a planned run"""
+    claimable = ['planned', 'failed'] + (['running'] if force else [])
+    claimed = PromotionRun.objects.filter(id=run_id, status__in=claimable).update(
+        status='running', started_at=timezone.now(), error=''
+    )
+    if not claimed:
+        return
+
+    run = PromotionRun.objects.get(id=run_id)
+    plan = run.plan
+    options = plan.get('options', {})
+    retain_ids = set(options.get('retain_student_ids', []))
+    counters = run.result.get('counters', {'promoted': 0, 'retained': 0, 'graduated': 0})
+
+    try:
+        classes = _ensure_classes(run, plan, options.get('carry_class_teachers', False), bool(retain_ids))
+
+        promote = []
+        retain = []
+        mapped = Q(pk__in=[])
+        graduate = Q(pk__in=[])
+        for mapping in plan['mappings']:
+            condition = _student_condition(
+                mapping['from_class_id'], mapping['from_class_name'], mapping['from_section']
+            )
+            mapped |= condition
+            if retain_ids:
+                retain.append((condition, classes[(str(mapping['from_grade']), mapping['from_section'])]))
+            if mapping['graduate']:
+                graduate |= condition
+            else:
+                promote.append((condition, classes[(mapping['to_grade'], mapping['to_section'])]))
+
+        remaining = Student.objects.filter(
+            tenant_id=run.tenant_id, academic_year=run.from_year, is_active=True
+        ).filter(mapped)
+
+        while True:
+            chunk = remaining.order_by('id')
+            if run.cursor:
+                chunk = chunk.filter(id__gt=run.cursor)
+            ids = list(chunk.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+
+            kept = [student_id for student_id in ids if str(student_id) in retain_ids]
+            with transaction.atomic():
+                in_chunk = Student.objects.filter(id__in=ids)
+                counters['retained'] += _move(in_chunk.filter(id__in=kept), retain, run.to_year)
+                counters['promoted'] += _move(in_chunk.exclude(id__in=kept).exclude(graduate), promote, run.to_year)
+                counters['graduated'] += in_chunk.exclude(id__in=kept).filter(graduate).update(
+                    is_active=False, updated_at=timezone.now()
+                )
+
+                moved = list(in_chunk.filter(academic_year=run.to_year).values_list('id', 'class_name', 'section'))
+                AcademicRegistration.objects.filter(student_id__in=ids, is_current=True).update(is_current=False)
+                AcademicRegistration.objects.bulk_create([
+                    AcademicRegistration(
+                        tenant_id=run.tenant_id,
+                        student_id=student_id,
+                        academic_year=run.to_year,
+                        class_name=class_name,
+                        section=section,
+                        is_current=True,
+                    )
+                    for student_id, class_name, section in moved
+                ])
+
+                run.cursor = ids[-1]
+                run.processed_students += len(ids)
+                run.result = {**run.result, 'counters': counters}
+                run.save(update_fields=['cursor', 'processed_students', 'result'])
+
+        run.status = 'completed'
+    except Exception as e:
+        run.status = 'failed'
+        run.error = str(e) if isinstance(e, PromotionError) else traceback.format_exc()
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def _run_in_thread(run_id):
+    try:
+        apply_run(run_id)
+    finally:
+        connection.close()
+
+
+def start_run(run):
+    """Apply a run in a background thread once the current transaction commits"""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(run.id,), daemon=True).start()
+    )
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Student
+from .models import Student, PromotionRun
 from accounts.models import User
 from accounts.serializers import UserSerializer
 
@@ -88,3 +88,34 @@ class UpdateStudentSerializer(serializers.Serializer):
     
     # Status
     is_active = serializers.BooleanField(required=False)
+
+
+class ClassMappingSerializer(serializers.Serializer):
+    from_class_id = serializers.UUIDField()
+    to_grade = serializers.CharField(max_length=10, allow_null=True, help_text="null to graduate the class")
+    to_section = serializers.CharField(max_length=10, required=False)
+
+
+class PromotionRequestSerializer(serializers.Serializer):
+    from_year = serializers.CharField(max_length=20)
+    to_year = serializers.CharField(max_length=20)
+    grade_map = serializers.DictField(
+        child=serializers.CharField(max_length=10, allow_null=True),
+        required=False,
+        help_text="Grade overrides, e.g. {'LKG': 'UKG', 'UKG': '1'}; null graduates"
+    )
+    final_grade = serializers.CharField(max_length=10, required=False)
+    class_map = ClassMappingSerializer(many=True, required=False)
+    retain_student_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    carry_class_teachers = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=True)
+
+
+class PromotionRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PromotionRun
+        fields = [
+            'id', 'from_year', 'to_year', 'status', 'plan', 'total_students',
+            'processed_students', 'result', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,169 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from school_classes.models import SchoolClass
+from tenants.models import Tenant
+from .models import AcademicRegistration, PromotionRun, Student
+from .promotion import apply_run, build_plan
+from . import promotion
+
+
+class PromotionFixtureMixin:
+    FROM_YEAR = '2025-2026'
+    TO_YEAR = '2026-2027'
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Promotion School', email='promotion@school.test', school_code='PRO001')
+        self.admin = User.objects.create_user(
+            email='admin@promotion.test', first_name='Pro', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.grade8 = self.make_class('8')
+        self.grade9 = self.make_class('9')
+        self.juniors = self.make_students(self.grade8, 12)
+        self.seniors = self.make_students(self.grade9, 3)
+
+    def make_class(self, grade, section='A', year=None):
+        return SchoolClass.objects.create(
+            tenant=self.tenant, grade=grade, section=section, academic_year=year or self.FROM_YEAR
+        )
+
+    def make_students(self, school_class, count):
+        students = []
+        for i in range(count):
+            user = User.objects.create_user(
+                email=f'{school_class.grade}-{i}@promotion.test', first_name=f'Student{i}',
+                last_name=f'Grade{school_class.grade}', role='student', tenant=self.tenant
+            )
+            student = Student.objects.create(
+                tenant=self.tenant, user=user, admission_number=f'PRO-{school_class.grade}-{i}',
+                date_of_birth=datetime.date(2012, 1, 1), gender='female', school_class=school_class,
+                class_name=school_class.class_name, section=school_class.section,
+                admission_date=datetime.date(2020, 6, 1), academic_year=self.FROM_YEAR
+            )
+            AcademicRegistration.objects.create(
+                tenant=self.tenant, student=student, academic_year=self.FROM_YEAR,
+                class_name=school_class.class_name, section=school_class.section
+            )
+            students.append(student)
+        return students
+
+    def plan_run(self, retain=()):
+        plan = build_plan(self.tenant, self.FROM_YEAR, self.TO_YEAR)
+        plan['options'] = {
+            'retain_student_ids': [str(student.id) for student in retain],
+            'carry_class_teachers': False,
+        }
+        return PromotionRun.objects.create(
+            tenant=self.tenant, from_year=self.FROM_YEAR, to_year=self.TO_YEAR, plan=plan,
+            total_students=plan['promoted'] + plan['graduating']
+        )
+
+    def assertRolledOver(self, run, promoted, retained=0, graduated=3):
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'completed', run.error)
+        self.assertEqual(run.result['counters'], {'promoted': promoted, 'retained': retained, 'graduated': graduated})
+        self.assertEqual(run.processed_students, 15)
+        # Everyone still enrolled has exactly one current registration, in the new year
+        for student in Student.objects.filter(tenant=self.tenant, is_active=True):
+            registrations = AcademicRegistration.objects.filter(student=student, is_current=True)
+            self.assertEqual([r.academic_year for r in registrations], [self.TO_YEAR])
+
+
+class PromotionPlanTests(PromotionFixtureMixin, TestCase):
+    def test_dry_run_plans_without_moving_anyone(self):
+        client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        client.force_authenticate(self.admin)
+
+        response = client.post(
+            '/api/students/promotions/', {'from_year': self.FROM_YEAR, 'to_year': self.TO_YEAR}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        plan = response.data['plan']
+        self.assertEqual((plan['promoted'], plan['graduating'], plan['final_grade']), (12, 3, '9'))
+        self.assertEqual(
+            [(m['from_grade'], m['to_grade'], m['graduate'], m['create_class']) for m in plan['mappings']],
+            [('8', '9', False, True), ('9', None, True, False)]
+        )
+        self.assertEqual(response.data['status'], 'planned')
+        self.assertFalse(Student.objects.filter(academic_year=self.TO_YEAR).exists())
+        self.assertFalse(SchoolClass.objects.filter(academic_year=self.TO_YEAR).exists())
+
+
+class ApplyPromotionTests(PromotionFixtureMixin, TestCase):
+    def test_apply_promotes_and_graduates(self):
+        run = self.plan_run()
+
+        apply_run(run.id, chunk_size=4)
+
+        self.assertRolledOver(run, promoted=12)
+        new_class = SchoolClass.objects.get(tenant=self.tenant, academic_year=self.TO_YEAR, grade='9')
+        self.assertEqual(new_class.class_name, 'Grade 9-A')
+        student = Student.objects.get(id=self.juniors[0].id)
+        self.assertEqual(
+            (student.school_class_id, student.class_name, student.academic_year),
+            (new_class.id, 'Grade 9-A', self.TO_YEAR)
+        )
+        self.assertFalse(Student.objects.filter(id__in=[s.id for s in self.seniors], is_active=True).exists())
+
+    def test_retained_students_repeat_their_grade(self):
+        run = self.plan_run(retain=self.juniors[:2])
+
+        apply_run(run.id)
+
+        self.assertRolledOver(run, promoted=10, retained=2)
+        retained = Student.objects.get(id=self.juniors[0].id)
+        self.assertEqual((retained.class_name, retained.academic_year), ('Grade 8-A', self.TO_YEAR))
+        self.assertEqual(retained.school_class.academic_year, self.TO_YEAR)
+
+    def test_failed_run_resumes_after_its_cursor(self):
+        run = self.plan_run()
+        move = promotion._move
+        calls = []
+
+        def fail_in_second_chunk(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('worker lost its connection')
+            return move(*args)
+
+        with mock.patch.object(promotion, '_move', side_effect=fail_in_second_chunk):
+            apply_run(run.id, chunk_size=5)
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.processed_students), ('failed', 5))
+        self.assertIn('worker lost its connection', run.error)
+
+        apply_run(run.id, chunk_size=5)
+
+        self.assertRolledOver(run, promoted=12)
+
+    def test_running_run_needs_force(self):
+        run = self.plan_run()
+        PromotionRun.objects.filter(id=run.id).update(status='running')
+
+        apply_run(run.id)
+        self.assertFalse(Student.objects.filter(academic_year=self.TO_YEAR).exists())
+
+        out = StringIO()
+        call_command('run_promotion', str(run.id), '--force', stdout=out)
+
+        self.assertIn('Promoted 12, retained 0, graduated 3 students', out.getvalue())
+        self.assertRolledOver(run, promoted=12)
+
+    def test_chunk_runs_a_fixed_number_of_statements(self):
+        # No per-student queries: that is what keeps 10,000 students within a minute
+        run = self.plan_run()
+
+        with CaptureQueriesContext(connection) as captured:
+            apply_run(run.id, chunk_size=20)
 
-# Create your tests here.
+        self.assertRolledOver(run, promoted=12)
+        self.assertLess(len(captured), 20)
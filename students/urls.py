@@ -5,4 +5,7 @@ urlpatterns = [
     path('', views.student_list_create, name='student_list_create'),
     path('profile/', views.student_profile, name='student_profile'),
     path('<uuid:student_id>/', views.student_detail, name='student_detail'),
+    path('promotions/', views.promotion_list_create, name='promotion_list_create'),
+    path('promotions/<uuid:run_id>/', views.promotion_detail, name='promotion_detail'),
+    path('promotions/<uuid:run_id>/apply/', views.promotion_apply, name='promotion_apply'),
 ]
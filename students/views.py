@@ -5,8 +5,12 @@ from rest_framework.response import Response
 from django.db import transaction
 from datetime import datetime
 
-from .models import Student, AcademicRegistration
-from .serializers import StudentSerializer, CreateStudentSerializer, UpdateStudentSerializer
+from .models import Student, AcademicRegistration, PromotionRun
+from .serializers import (
+    StudentSerializer, CreateStudentSerializer, UpdateStudentSerializer,
+    PromotionRequestSerializer, PromotionRunSerializer
+)
+from .promotion import PromotionError, build_plan, start_run
 from accounts.models import User
 from parents.models import Parent
 
@@ -202,3 +206,95 @@ def student_profile(request):
         return Response(StudentSerializer(student).data)
     except Student.DoesNotExist:
         return Response({'error': 'Student profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def promotion_list_create(request):
+    """List rollover runs or plan a new one (dry run unless dry_run is false)"""
+    tenant_id = getattr(request, 'tenant_id', None)
+    
+    if not tenant_id:
+        return Response({'error': 'Tenant context required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if request.user.role not in ['super_admin', 'tenant_admin']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if request.method == 'GET':
+        runs = PromotionRun.objects.filter(tenant_id=tenant_id).order_by('-created_at')
+        return Response(PromotionRunSerializer(runs, many=True).data)
+    
+    serializer = PromotionRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    
+    try:
+        plan = build_plan(
+            request.tenant,
+            data['from_year'],
+            data['to_year'],
+            grade_map=data.get('grade_map'),
+            final_grade=data.get('final_grade'),
+            class_map=[
+                {**item, 'from_class_id': str(item['from_class_id'])}
+                for item in data.get('class_map', [])
+            ],
+        )
+    except PromotionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    plan['options'] = {
+        'retain_student_ids': [str(student_id) for student_id in data.get('retain_student_ids', [])],
+        'carry_class_teachers': data['carry_class_teachers'],
+    }
+    
+    with transaction.atomic():
+        run = PromotionRun.objects.create(
+            tenant_id=tenant_id,
+            from_year=data['from_year'],
+            to_year=data['to_year'],
+            plan=plan,
+            total_students=plan['promoted'] + plan['graduating'],
+            created_by=request.user
+        )
+        if not data['dry_run']:
+            start_run(run)
+    
+    return Response(
+        PromotionRunSerializer(run).data,
+        status=status.HTTP_201_CREATED if data['dry_run'] else status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def promotion_detail(request, run_id):
+    """Plan and progress of a rollover run"""
+    if request.user.role not in ['super_admin', 'tenant_admin']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        run = PromotionRun.objects.get(id=run_id, tenant_id=getattr(request, 'tenant_id', None))
+    except PromotionRun.DoesNotExist:
+        return Response({'error': 'Promotion run not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(PromotionRunSerializer(run).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def promotion_apply(request, run_id):
+    """Apply a planned run, or resume one that failed part way"""
+    if request.user.role not in ['super_admin', 'tenant_admin']:
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        run = PromotionRun.objects.get(id=run_id, tenant_id=getattr(request, 'tenant_id', None))
+    except PromotionRun.DoesNotExist:
+        return Response({'error': 'Promotion run not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if run.status not in ['planned', 'failed']:
+        return Response({'error': f'Run is already {run.status}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    start_run(run)
+    return Response(PromotionRunSerializer(run).data, status=status.HTTP_202_ACCEPTED)
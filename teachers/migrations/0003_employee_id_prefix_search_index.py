@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:43
+
+from django.db import migrations
+
+from school_management.migration_utils import run_on_postgres
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teachers', '0002_teacher_department_teacher_salary'),
+    ]
+
+    operations = [
+        # Case-insensitive prefix (istartswith) lookups can only use these on PostgreSQL
+        migrations.RunPython(
+            run_on_postgres('CREATE INDEX teachers_employee_id_prefix_idx ON teachers (UPPER(employee_id) text_pattern_ops);'),
+            run_on_postgres('DROP INDEX IF EXISTS teachers_employee_id_prefix_idx;'),
+        ),
+    ]
@@ -0,0 +1,135 @@
+"""
+In-process cache of active tenants and their enabled features.
+
+TenantMiddleware resolves the tenant of every request by id or slug; with
+the cache that is a dict lookup instead of a query. Entries live for
+TENANT_CACHE_TTL seconds (0 disables the cache). Saving or deleting a tenant
+or feature drops it from this process right away (see signals.py); other
+gunicorn workers pick the change up when their entry expires. That includes
+deactivation: a tenant switched off in one worker keeps being served by the
+others for up to TENANT_CACHE_TTL seconds. Lower the TTL (or set it to 0) if
+that window matters more than the saved query.
+
+Every caller gets its own copy of the cached Tenant, so a request that changes
+or saves request.tenant cannot leak the change into other threads' requests.
+
+warm() loads every active tenant and its features in two queries, so a
+freshly started worker does not pay for them on its first requests.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from school_management.metrics import record_cache
+
+from .models import Tenant, TenantFeature
+
+
+_lock = threading.Lock()
+_tenants = {}   # ('id', str) or ('slug', str) -> (expires, Tenant)
+_features = {}  # tenant id -> (expires, frozenset of enabled features)
+
+
+def _ttl():
+    return getattr(settings, 'TENANT_CACHE_TTL', 0)
+
+
+def _remember(tenant, expires):
+    _tenants[('id', str(tenant.id))] = (expires, tenant)
+    _tenants[('slug', tenant.slug)] = (expires, tenant)
+
+
+def _lookup(key, query):
+    ttl = _ttl()
+    if not ttl:
+        return query()
+    now = time.monotonic()
+    cached = _tenants.get(key)
+    if cached is not None and cached[0] > now:
+        record_cache('tenant', True)
+        return copy.copy(cached[1])
+    record_cache('tenant', False)
+    tenant = query()
+    # Misses are not cached: unknown ids and slugs come from the client
+    if tenant is not None:
+        with _lock:
+            _remember(copy.copy(tenant), now + ttl)
+    return tenant
+
+
+def get_by_id(tenant_id):
+    """Active tenant with this id, or None (also for malformed ids)"""
+    def query():
+        try:
+            return Tenant.objects.filter(id=tenant_id, is_active=True).first()
+        except ValidationError:
+            return None
+    return _lookup(('id', str(tenant_id)), query)
+
+
+def get_by_slug(slug):
+    """Active tenant with this slug, or None"""
+    return _lookup(('slug', slug), lambda: Tenant.objects.filter(slug=slug, is_active=True).first())
+
+
+def features(tenant_id):
+    """Names of the features enabled for a tenant"""
+    def query():
+        return frozenset(TenantFeature.objects.filter(
+            tenant_id=tenant_id, is_enabled=True
+        ).values_list('feature', flat=True))
+
+    ttl = _ttl()
+    if not ttl:
+        return query()
+    now = time.monotonic()
+    cached = _features.get(str(tenant_id))
+    if cached is not None and cached[0] > now:
+        record_cache('tenant_features', True)
+        return cached[1]
+    record_cache('tenant_features', False)
+    enabled = query()
+    _features[str(tenant_id)] = (now + ttl, enabled)
+    return enabled
+
+
+def invalidate(tenant):
+    """Forget a tenant (by id and slug) and its features in this process"""
+    with _lock:
+        # Scan rather than pop by key so a renamed slug goes too
+        for key, (_, cached) in list(_tenants.items()):
+            if cached.id == tenant.id:
+                del _tenants[key]
+        _features.pop(str(tenant.id), None)
+
+
+def invalidate_features(tenant_id):
+    _features.pop(str(tenant_id), None)
+
+
+def clear():
+    with _lock:
+        _tenants.clear()
+        _features.clear()
+
+
+def warm():
+    """Load every active tenant and its enabled features; returns the tenant count"""
+    ttl = _ttl()
+    if not ttl:
+        return 0
+    expires = time.monotonic() + ttl
+    tenants = list(Tenant.objects.filter(is_active=True))
+    enabled = {}
+    for tenant_id, feature in TenantFeature.objects.filter(
+        tenant__is_active=True, is_enabled=True
+    ).values_list('tenant_id', 'feature'):
+        enabled.setdefault(str(tenant_id), set()).add(feature)
+    with _lock:
+        for tenant in tenants:
+            _remember(tenant, expires)
+            _features[str(tenant.id)] = (expires, frozenset(enabled.get(str(tenant.id), ())))
+    return len(tenants)
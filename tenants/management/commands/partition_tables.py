@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from tenants import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Partition the largest tenant tables by tenant (PostgreSQL, TENANT_PARTITIONING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tables', nargs='+', choices=partitioning.PARTITIONED_TABLES,
+            default=list(partitioning.PARTITIONED_TABLES)
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Print the statements without running them')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL')
+        how = partitioning.mode()
+        if how is None:
+            # New tenants only get their partitions while the setting is on
+            raise CommandError("Set TENANT_PARTITIONING to 'list' or 'hash' first")
+
+        for table in options['tables']:
+            try:
+                statements, moved = partitioning.partition_table(table, dry_run=options['dry_run'])
+            except partitioning.PartitioningError as e:
+                raise CommandError(f'{table}: {e}')
+            if not statements:
+                self.stdout.write(f'{table}: already partitioned')
+            elif options['dry_run']:
+                self.stdout.write(';\n'.join(statements) + ';\n')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{table}: {how}-partitioned, {moved} rows copied'))
+
+        if how == 'list' and not options['dry_run']:
+            # Tenants created while the setting was off have their rows in the DEFAULT partition
+            for table, moved in partitioning.sync_tenant_partitions().items():
+                if moved:
+                    self.stdout.write(f'{table}: moved {moved} rows out of {table}_default')
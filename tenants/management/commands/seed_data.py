@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from tenants.seeding import BATCH_SIZE, BENCH_DOMAIN, BENCH_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = 'Seed benchmark schools at production volume (COPY on PostgreSQL, one process per school)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=10)
+        parser.add_argument('--students', type=int, default=1000, help='Students per school')
+        parser.add_argument('--days', type=int, default=200, help='School days of attendance (200 is about a year)')
+        parser.add_argument('--exams', type=int, default=4, help='Fully marked exams per school')
+        parser.add_argument(
+            '--workers', type=int,
+            help='Schools seeded in parallel; defaults to the CPU count on PostgreSQL and 1 elsewhere'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers is None:
+            # SQLite allows a single writer, so parallel processes would only wait on each other
+            workers = os.cpu_count() if connection.vendor == 'postgresql' else 1
+        method = 'COPY' if connection.vendor == 'postgresql' else 'batched INSERTs'
+        self.stdout.write(
+            f"Seeding {options['tenants']} schools x {options['students']} students "
+            f"with {workers} worker(s) using {method}"
+        )
+
+        def progress(name, counts, seconds):
+            self.stdout.write(f'  {name}: {sum(counts.values())} rows in {seconds:.1f}s')
+
+        started = time.monotonic()
+        totals = seed(
+            options['tenants'], options['students'], options['days'], options['exams'],
+            workers=workers, batch_size=options['batch_size'], progress=progress
+        )
+        elapsed = time.monotonic() - started
+
+        for table, count in sorted(totals.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {table:<28}{count:>12}')
+        rows = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s). '
+            f'Users are <role><n>.<school_code>@{BENCH_DOMAIN}, password {BENCH_PASSWORD}'
+        ))
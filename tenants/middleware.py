@@ -1,5 +1,5 @@
 from django.utils.deprecation import MiddlewareMixin
-from .models import Tenant
+from . import cache as tenant_cache
 
 
 class TenantMiddleware(MiddlewareMixin):
@@ -27,25 +27,21 @@ class TenantMiddleware(MiddlewareMixin):
         
         if tenant_id:
             # Tenant ID provided directly
-            try:
-                tenant = Tenant.objects.get(id=tenant_id, is_active=True)
+            tenant = tenant_cache.get_by_id(tenant_id)
+            if tenant is not None:
                 request.tenant = tenant
                 request.tenant_id = tenant.id
                 return
-            except Tenant.DoesNotExist:
-                pass
         
         # Fallback: Try to extract tenant from subdomain
         if len(parts) >= 2 and parts[0] not in ['www', 'localhost', '127']:
             # It's a subdomain (e.g., school1.domain.com)
             tenant_slug = parts[0]
-            try:
-                tenant = Tenant.objects.get(slug=tenant_slug, is_active=True)
+            tenant = tenant_cache.get_by_slug(tenant_slug)
+            if tenant is not None:
                 request.tenant = tenant
                 request.tenant_id = tenant.id
                 return
-            except Tenant.DoesNotExist:
-                pass
         
         # No tenant found
         request.tenant = None
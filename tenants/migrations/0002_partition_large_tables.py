@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 14:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+        ('accounts', '0003_name_prefix_search_indexes'),
+        ('attendance', '0001_initial'),
+        ('courses', '0001_initial'),
+        ('exams', '0002_exam_class_name_exam_section'),
+    ]
+
+    # Intentionally empty: converting the tables is left to
+    # `manage.py partition_tables` (see tenants/partitioning.py), so the schema
+    # migrate builds does not depend on TENANT_PARTITIONING. Kept because later
+    # migrations depend on it.
+    operations = []
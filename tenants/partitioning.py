@@ -0,0 +1,280 @@
+"""
+Optional PostgreSQL partitioning of the largest tenant tables by tenant_id.
+
+TENANT_PARTITIONING selects the scheme for PARTITIONED_TABLES:
+
+- 'list': one partition per tenant (attendance_t_<tenant uuid hex>) plus a
+  DEFAULT partition. A query filtering on tenant only touches that tenant's
+  partition, and deleting a tenant drops its partitions instead of deleting
+  their rows one by one. Partitions are created with the tenant (signals.py);
+  rows of tenants created while the setting was off wait in the DEFAULT
+  partition until `manage.py partition_tables` moves them to their own.
+- 'hash': TENANT_PARTITION_COUNT partitions by hash of tenant_id, for many
+  small tenants. Scans are still pruned to one partition, but a tenant's
+  rows share it with others and are deleted as usual.
+
+partition_table() converts a table in place: it creates a partitioned table
+with the same columns, defaults, checks, indexes and foreign keys, copies the
+rows over while holding a lock that blocks writes (not reads), swaps the two
+and drops the original. Run it through `manage.py partition_tables`; no
+migration does it, so `migrate` builds the same schema whatever the setting
+and the write lock is taken only when an operator chooses to.
+
+PostgreSQL requires the partition key in every primary key and unique
+constraint, so tenant_id is appended to them: the primary key becomes
+(id, tenant_id) - Django keeps treating id as the pk - and, for example,
+results' unique (student_id, exam_subject_id) becomes
+(student_id, exam_subject_id, tenant_id), which is equivalent since a student
+belongs to one tenant. audit_logs.tenant_id is nullable and cannot be part of
+a primary key, so that table gets a unique (id, tenant_id) instead. No other
+table may reference a partitioned table with a foreign key.
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+
+
+PARTITIONED_TABLES = ('attendance', 'results', 'audit_logs', 'content_progress')
+
+MODES = ('list', 'hash')
+
+_INDEX_DEF = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (?:ONLY )?\S+ USING (.*)$')
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def mode():
+    value = getattr(settings, 'TENANT_PARTITIONING', '')
+    return value if value in MODES else None
+
+
+def tenant_partition(table, tenant_id):
+    return f'{table}_t_{uuid.UUID(str(tenant_id)).hex}'
+
+
+def _literal(tenant_id):
+    # Partition bounds cannot be query parameters; a parsed UUID is safe to inline
+    return f"'{uuid.UUID(str(tenant_id))}'"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", [table]
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def _columns_with_tenant(columns):
+    """'a, b' -> 'a, b, tenant_id' unless the partition key is already there"""
+    names = [name.strip() for name in columns.split(',')]
+    if 'tenant_id' not in names:
+        names.append('tenant_id')
+    return ', '.join(names)
+
+
+def _split_index_columns(rest):
+    """'btree (a, b) WHERE x' -> ('btree', 'a, b', ' WHERE x'), matching parentheses"""
+    method, _, tail = rest.partition(' (')
+    depth = 1
+    for i, char in enumerate(tail):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if depth == 0:
+            return method, tail[:i], tail[i + 1:]
+    raise PartitioningError(f'Cannot parse index definition: {rest}')
+
+
+def _plan(cursor, table, how, count, tenant_ids):
+    """The DDL converting table, as (statements, renames to apply after the swap)"""
+    qn = default_connection.ops.quote_name
+    new = f'{table}__partitioned'
+
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = %s::regclass AND conrelid <> confrelid
+    """, [table])
+    referencing = cursor.fetchall()
+    if referencing:
+        raise PartitioningError(
+            f'{table} is referenced by foreign keys ({", ".join(f"{t}.{c}" for t, c in referencing)}); '
+            'partitioned tables cannot be'
+        )
+
+    cursor.execute("""
+        SELECT attnotnull FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attname = 'tenant_id' AND NOT attisdropped
+    """, [table])
+    row = cursor.fetchone()
+    if row is None:
+        raise PartitioningError(f'{table} has no tenant_id column')
+    tenant_required = row[0]
+
+    cursor.execute("""
+        SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f') ORDER BY conname
+    """, [table])
+    constraints = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        ORDER BY i.relname
+    """, [table])
+    indexes = cursor.fetchall()
+
+    partition_by = 'LIST' if how == 'list' else 'HASH'
+    statements = [
+        f'LOCK TABLE {qn(table)} IN EXCLUSIVE MODE',
+        f'CREATE TABLE {qn(new)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+        f'INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY {partition_by} (tenant_id)',
+    ]
+    renames = []
+
+    for name, kind, definition in constraints:
+        temp = f'{name[:55]}__p'
+        if kind == 'f':
+            statements.append(f'ALTER TABLE {qn(new)} ADD CONSTRAINT {qn(temp)} {definition}')
+        else:
+            columns = re.match(r'^(?:PRIMARY KEY|UNIQUE) \((.*)\)$', definition).group(1)
+            columns = _columns_with_tenant(columns)
+            if kind == 'p' and tenant_required:
+                statements.append(f'ALTER TABLE {qn(new)} ADD CONSTRAINT {qn(temp)} PRIMARY KEY ({columns})')
+            else:
+                statements.append(f'ALTER TABLE {qn(new)} ADD CONSTRAINT {qn(temp)} UNIQUE ({columns})')
+        renames.append(f'ALTER TABLE {qn(table)} RENAME CONSTRAINT {qn(temp)} TO {qn(name)}')
+
+    for name, definition in indexes:
+        match = _INDEX_DEF.match(definition)
+        if match is None:
+            raise PartitioningError(f'Cannot parse index definition: {definition}')
+        unique, _, rest = match.groups()
+        method, columns, tail = _split_index_columns(rest)
+        if unique:
+            columns = _columns_with_tenant(columns)
+        temp = f'{name[:55]}__p'
+        statements.append(
+            f'CREATE {unique or ""}INDEX {qn(temp)} ON {qn(new)} USING {method} ({columns}){tail}'
+        )
+        renames.append(f'ALTER INDEX {qn(temp)} RENAME TO {qn(name)}')
+
+    if how == 'list':
+        for tenant_id in tenant_ids:
+            statements.append(
+                f'CREATE TABLE {qn(tenant_partition(table, tenant_id))} PARTITION OF {qn(new)} '
+                f'FOR VALUES IN ({_literal(tenant_id)})'
+            )
+        # Rows without a tenant (audit_logs) and tenants created before their partition
+        statements.append(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(new)} DEFAULT')
+    else:
+        for remainder in range(count):
+            statements.append(
+                f'CREATE TABLE {qn(f"{table}_p{remainder}")} PARTITION OF {qn(new)} '
+                f'FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})'
+            )
+
+    statements += [
+        f'INSERT INTO {qn(new)} SELECT * FROM {qn(table)}',
+        f'DROP TABLE {qn(table)}',
+        f'ALTER TABLE {qn(new)} RENAME TO {qn(table)}',
+    ]
+    return statements, renames
+
+
+def _tenant_ids(cursor):
+    cursor.execute('SELECT id FROM tenants ORDER BY created_at')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def partition_table(table, how=None, count=None, connection=None, dry_run=False):
+    """
+    Convert one table; returns (statements, rows moved), or ([], None) if the
+    table is partitioned already. dry_run only plans the statements.
+    """
+    connection = connection or default_connection
+    how = how or mode()
+    if how not in MODES:
+        raise PartitioningError(f'Unknown partitioning scheme {how!r}; use one of {", ".join(MODES)}')
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Partitioning needs PostgreSQL')
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return [], None
+        statements, renames = _plan(
+            cursor, table, how, count or settings.TENANT_PARTITION_COUNT, _tenant_ids(cursor)
+        )
+        statements += renames + [f'ANALYZE {connection.ops.quote_name(table)}']
+        if dry_run:
+            return statements, None
+        moved = None
+        for sql in statements:
+            cursor.execute(sql)
+            if sql.startswith('INSERT INTO'):
+                moved = cursor.rowcount
+    return statements, moved
+
+
+def _list_partitioned_tables(cursor):
+    if mode() != 'list':
+        return []
+    return [table for table in PARTITIONED_TABLES if is_partitioned(cursor, table)]
+
+
+def _attach_tenant(cursor, table, tenant_id):
+    """Give a tenant its own partition, moving any rows it has in the DEFAULT one"""
+    qn = default_connection.ops.quote_name
+    partition = tenant_partition(table, tenant_id)
+    cursor.execute('SELECT to_regclass(%s)', [partition])
+    if cursor.fetchone()[0] is not None:
+        return 0
+    cursor.execute(f'CREATE TABLE {qn(partition)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(f"""
+        WITH moved AS (DELETE FROM {qn(table + '_default')} WHERE tenant_id = %s RETURNING *)
+        INSERT INTO {qn(partition)} SELECT * FROM moved
+    """, [str(tenant_id)])
+    moved = cursor.rowcount
+    # Attaching creates the partition's indexes and foreign keys from the parent's
+    cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(partition)} FOR VALUES IN ({_literal(tenant_id)})')
+    return moved
+
+
+def sync_tenant_partitions(connection=None):
+    """Attach a partition for every tenant that lacks one; returns {table: rows moved}"""
+    connection = connection or default_connection
+    moved = {}
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        tables = _list_partitioned_tables(cursor)
+        tenant_ids = _tenant_ids(cursor) if tables else []
+        for table in tables:
+            moved[table] = sum(_attach_tenant(cursor, table, tenant_id) for tenant_id in tenant_ids)
+    return moved
+
+
+def create_tenant_partitions(tenant_id, connection=None):
+    """Give a new tenant its own partition of every list-partitioned table"""
+    connection = connection or default_connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for table in _list_partitioned_tables(cursor):
+            _attach_tenant(cursor, table, tenant_id)
+
+
+def drop_tenant_partitions(tenant_id, connection=None):
+    """
+    Drop a tenant's partitions, and with them its rows, in one statement per
+    table. Each drop briefly locks the whole table, like any DDL on it.
+    """
+    connection = connection or default_connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in _list_partitioned_tables(cursor):
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(tenant_partition(table, tenant_id))}')
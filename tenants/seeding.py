@@ -0,0 +1,346 @@
+"""
+Large-volume seed data for benchmarks and load tests.
+
+Every school gets classes, teachers, students with registrations and one
+parent each, a weekly timetable, a year of attendance, fully marked exams
+and a library catalog with some books out on loan. All users share
+BENCH_PASSWORD, hashed once up front.
+
+Rows are built as plain tuples with ids generated in Python, so nothing has
+to be read back after an insert and no model instances are created. On
+PostgreSQL they are streamed with COPY; elsewhere they are inserted in
+large executemany batches. seed() spreads schools over a process pool, one
+school per task.
+"""
+import csv
+import io
+import multiprocessing
+import random
+import string
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, time as dt_time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from attendance.models import Attendance
+from exams.models import Exam, ExamSubject, Result
+from library.models import Book, BookIssue
+from parents.models import Parent, StudentParent
+from school_classes.models import SchoolClass
+from students.models import AcademicRegistration, Student
+from teachers.models import Teacher
+from timetable.models import TimeSlot, Timetable
+from .models import Tenant, TenantFeature
+
+
+# Every benchmark user logs in with this password
+BENCH_PASSWORD = 'Bench@2025'
+BENCH_DOMAIN = 'bench.local'
+BENCH_YEAR = '2024-2025'
+
+BATCH_SIZE = 5000
+STUDENTS_PER_CLASS = 35
+FEATURES = ['attendance', 'exams', 'library', 'transport', 'timetable', 'courses']
+SUBJECTS = ['Mathematics', 'Science', 'English', 'History', 'Geography']
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+EXAM_TYPES = ['unit_test', 'quarterly', 'midterm', 'final']
+FIRST_NAMES = ['Aarav', 'Ananya', 'Rohan', 'Diya', 'Kabir', 'Isha', 'Vivaan', 'Meera', 'Arjun', 'Sara']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Singh', 'Das', 'Nair', 'Reddy', 'Gupta', 'Joshi']
+BOOK_WORDS = ['History', 'Science', 'Ocean', 'Garden', 'Stars', 'Mystery', 'River', 'Python', 'Algebra', 'Poems']
+# About 92% present
+STATUSES = ['present'] * 23 + ['absent', 'late']
+
+
+class RowWriter:
+    """Inserts tuples of column values; COPY on PostgreSQL, executemany elsewhere"""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+        self.counts = {}
+
+    def write(self, model, columns, rows):
+        """columns are attnames (tenant_id, not tenant); missing fields get their defaults"""
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                written += self._flush(model, columns, batch)
+                batch = []
+        if batch:
+            written += self._flush(model, columns, batch)
+        self.counts[model._meta.db_table] = self.counts.get(model._meta.db_table, 0) + written
+        return written
+
+    def _flush(self, model, columns, rows):
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        missing = [field for name, field in fields.items() if name not in columns]
+        ordered = [fields[name] for name in columns] + missing
+        db_columns = ', '.join(connection.ops.quote_name(field.column) for field in ordered)
+        table = connection.ops.quote_name(model._meta.db_table)
+        full_rows = (list(row) + [self._default(field) for field in missing] for row in rows)
+
+        with connection.cursor() as cursor:
+            if not self.use_copy:
+                # Prepared values through executemany skip building model instances;
+                # cursor.db is the real connection, cheaper than the thread-local proxy
+                db = cursor.db
+                cursor.executemany(
+                    f'INSERT INTO {table} ({db_columns}) VALUES ({", ".join(["%s"] * len(ordered))})',
+                    [
+                        [field.get_db_prep_save(value, db) for field, value in zip(ordered, row)]
+                        for row in full_rows
+                    ]
+                )
+                return len(rows)
+
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in full_rows:
+                writer.writerow([r'\N' if value is None else value for value in row])
+            buffer.seek(0)
+            sql = f"COPY {table} ({db_columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        return len(rows)
+
+    @staticmethod
+    def _default(field):
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            now = timezone.now()
+            return now.date() if type(field) is models.DateField else now
+        return field.get_default()
+
+
+def _section(index):
+    letter, cycle = string.ascii_uppercase[index % 26], index // 26
+    return f'{letter}{cycle}' if cycle else letter
+
+
+def school_days(count, end=None):
+    """The last `count` weekdays up to and including end"""
+    days = []
+    day = end or date.today()
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+
+def _users(writer, tenant_id, role, count, password_hash, code):
+    ids = [uuid.uuid4() for _ in range(count)]
+    writer.write(User, ['id', 'email', 'password', 'first_name', 'last_name', 'role', 'tenant_id'], (
+        (
+            user_id,
+            f'{role}{i}.{code}@{BENCH_DOMAIN}'.lower(),
+            password_hash,
+            random.choice(FIRST_NAMES),
+            random.choice(LAST_NAMES),
+            role,
+            tenant_id,
+        )
+        for i, user_id in enumerate(ids)
+    ))
+    return ids
+
+
+def seed_tenant(number, students, days, exams, password_hash, batch_size=BATCH_SIZE):
+    """Create one school; returns (tenant name, rows written per table, seconds)"""
+    started = time.monotonic()
+    writer = RowWriter(batch_size)
+    code = f'BENCH{number}{uuid.uuid4().hex[:6]}'.upper()
+    today = date.today()
+
+    with transaction.atomic():
+        tenant = Tenant.objects.create(
+            name=f'Bench School {code}',
+            school_code=code,
+            email=f'office.{code}@{BENCH_DOMAIN}'.lower(),
+            subscription_start=today - timedelta(days=365),
+            subscription_end=today + timedelta(days=365),
+        )
+        tid = tenant.id
+        writer.write(TenantFeature, ['id', 'tenant_id', 'feature'], (
+            (uuid.uuid4(), tid, feature) for feature in FEATURES
+        ))
+        _users(writer, tid, 'tenant_admin', 1, password_hash, code)
+
+        # Teachers: one per class plus two spare for substitutions
+        class_count = max(1, students // STUDENTS_PER_CLASS)
+        teacher_users = _users(writer, tid, 'teacher', class_count + 2, password_hash, code)
+        teacher_ids = [uuid.uuid4() for _ in teacher_users]
+        writer.write(Teacher, [
+            'id', 'tenant_id', 'user_id', 'employee_id', 'date_of_birth', 'gender',
+            'qualification', 'joining_date', 'subjects',
+        ], (
+            (
+                teacher_id, tid, user_id, f'{code}-T{i}', date(1985, 1, 1),
+                random.choice(['male', 'female']), 'master', date(2018, 6, 1),
+                ', '.join(random.sample(SUBJECTS, 2)),
+            )
+            for i, (teacher_id, user_id) in enumerate(zip(teacher_ids, teacher_users))
+        ))
+
+        # Classes: grades 1-12, as many sections as the head count needs
+        classes = []
+        for i in range(class_count):
+            grade, section = str(i % 12 + 1), _section(i // 12)
+            classes.append((uuid.uuid4(), grade, section, f'Grade {grade}-{section}', teacher_ids[i]))
+        writer.write(SchoolClass, [
+            'id', 'tenant_id', 'grade', 'section', 'class_name', 'academic_year', 'class_teacher_id',
+        ], (
+            (class_id, tid, grade, section, class_name, BENCH_YEAR, teacher_id)
+            for class_id, grade, section, class_name, teacher_id in classes
+        ))
+
+        # Students with their registration and one parent each
+        student_users = _users(writer, tid, 'student', students, password_hash, code)
+        student_ids = [uuid.uuid4() for _ in student_users]
+        student_class = [classes[i % class_count] for i in range(students)]
+        writer.write(Student, [
+            'id', 'tenant_id', 'user_id', 'admission_number', 'date_of_birth', 'gender',
+            'school_class_id', 'class_name', 'section', 'admission_date', 'academic_year',
+        ], (
+            (
+                student_id, tid, user_id, f'{code}-S{i}', date(2012, 1, 1),
+                random.choice(['male', 'female']), school_class[0], school_class[3],
+                school_class[2], date(2024, 6, 1), BENCH_YEAR,
+            )
+            for i, (student_id, user_id, school_class) in enumerate(zip(student_ids, student_users, student_class))
+        ))
+        writer.write(AcademicRegistration, ['id', 'tenant_id', 'student_id', 'academic_year', 'class_name', 'section'], (
+            (uuid.uuid4(), tid, student_id, BENCH_YEAR, school_class[3], school_class[2])
+            for student_id, school_class in zip(student_ids, student_class)
+        ))
+        parent_users = _users(writer, tid, 'parent', students, password_hash, code)
+        parent_ids = [uuid.uuid4() for _ in parent_users]
+        writer.write(Parent, ['id', 'tenant_id', 'user_id', 'relation'], (
+            (parent_id, tid, user_id, random.choice(['father', 'mother']))
+            for parent_id, user_id in zip(parent_ids, parent_users)
+        ))
+        writer.write(StudentParent, ['id', 'tenant_id', 'student_id', 'parent_id', 'is_primary'], (
+            (uuid.uuid4(), tid, student_id, parent_id, True)
+            for student_id, parent_id in zip(student_ids, parent_ids)
+        ))
+
+        # Weekly timetable; class i takes teacher (i + period) so no teacher is double-booked
+        slot_ids = [uuid.uuid4() for _ in range(8)]
+        writer.write(TimeSlot, ['id', 'tenant_id', 'period_number', 'start_time', 'end_time'], (
+            (slot_id, tid, period + 1, dt_time(8 + period), dt_time(8 + period, 45))
+            for period, slot_id in enumerate(slot_ids)
+        ))
+        writer.write(Timetable, [
+            'id', 'tenant_id', 'class_name', 'section', 'day', 'time_slot_id', 'subject',
+            'teacher_id', 'academic_year',
+        ], (
+            (
+                uuid.uuid4(), tid, school_class[3], school_class[2], day, slot_id,
+                SUBJECTS[(i + period) % len(SUBJECTS)], teacher_ids[(i + period) % len(teacher_ids)], BENCH_YEAR,
+            )
+            for i, school_class in enumerate(classes)
+            for day in DAYS
+            for period, slot_id in enumerate(slot_ids)
+        ))
+
+        # Attendance for every student on every school day
+        writer.write(Attendance, ['id', 'tenant_id', 'student_id', 'date', 'status'], (
+            (uuid.uuid4(), tid, student_id, day, random.choice(STATUSES))
+            for day in school_days(days, today)
+            for student_id in student_ids
+        ))
+
+        # Exams spread over the year, one paper per subject and class, all marked
+        papers = {}
+        for n in range(exams):
+            start = today - timedelta(days=30 + (exams - 1 - n) * 60)
+            exam = Exam.objects.create(
+                tenant=tenant,
+                name=f'{EXAM_TYPES[n % len(EXAM_TYPES)].replace("_", " ").title()} {n + 1}',
+                exam_type=EXAM_TYPES[n % len(EXAM_TYPES)],
+                academic_year=BENCH_YEAR,
+                start_date=start,
+                end_date=start + timedelta(days=5),
+            )
+            rows = []
+            for school_class in classes:
+                for subject in SUBJECTS:
+                    paper_id = uuid.uuid4()
+                    papers.setdefault(school_class[0], []).append(paper_id)
+                    rows.append((paper_id, tid, exam.id, subject, school_class[3], 100, 35, start, 90))
+            writer.write(ExamSubject, [
+                'id', 'tenant_id', 'exam_id', 'subject_name', 'class_name', 'max_marks',
+                'passing_marks', 'exam_date', 'duration_minutes',
+            ], rows)
+        writer.write(Result, ['id', 'tenant_id', 'student_id', 'exam_subject_id', 'marks_obtained'], (
+            (uuid.uuid4(), tid, student_id, paper_id, random.randint(20, 100))
+            for student_id, school_class in zip(student_ids, student_class)
+            for paper_id in papers.get(school_class[0], [])
+        ))
+
+        # Library: one copy of the first tenth of the catalog is out, some of it overdue
+        book_count = max(50, students // 5)
+        on_loan = book_count // 10
+        book_ids = [uuid.uuid4() for _ in range(book_count)]
+        isbn_prefix = uuid.uuid4().hex[:8]
+        writer.write(Book, [
+            'id', 'tenant_id', 'title', 'author', 'isbn', 'category', 'total_copies',
+            'available_copies',
+        ], (
+            (
+                book_id, tid, f'{random.choice(BOOK_WORDS)} {random.choice(BOOK_WORDS)} {i}',
+                f'{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}', f'{isbn_prefix}{i:07d}',
+                random.choice(BOOK_WORDS), 3, 2 if i < on_loan else 3,
+            )
+            for i, book_id in enumerate(book_ids)
+        ))
+        issue_dates = [today - timedelta(days=random.randint(0, 30)) for _ in range(on_loan)]
+        writer.write(BookIssue, ['id', 'tenant_id', 'book_id', 'user_id', 'issue_date', 'due_date', 'status'], (
+            (uuid.uuid4(), tid, book_id, random.choice(student_users), issued, issued + timedelta(weeks=2), 'issued')
+            for book_id, issued in zip(book_ids, issue_dates)
+        ))
+
+    return tenant.name, writer.counts, time.monotonic() - started
+
+
+def _seed_in_worker(args):
+    # Each forked worker opens its own database connection
+    connections.close_all()
+    return seed_tenant(*args)
+
+
+def seed(tenants, students, days, exams, workers=1, batch_size=BATCH_SIZE, progress=None):
+    """Seed `tenants` schools, `workers` at a time; progress(name, counts, seconds) per school"""
+    password_hash = make_password(BENCH_PASSWORD)
+    tasks = [(number, students, days, exams, password_hash, batch_size) for number in range(tenants)]
+    totals = {}
+
+    def done(result):
+        name, counts, seconds = result
+        for table, count in counts.items():
+            totals[table] = totals.get(table, 0) + count
+        if progress:
+            progress(name, counts, seconds)
+
+    if workers <= 1:
+        for task in tasks:
+            done(seed_tenant(*task))
+        return totals
+
+    # Forked children must not share the parent's open connections
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for future in as_completed([pool.submit(_seed_in_worker, task) for task in tasks]):
+            done(future.result())
+    return totals
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Tenant, TenantFeature
+from . import cache, partitioning
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant(sender, instance, **kwargs):
+    cache.invalidate(instance)
+
+
+@receiver(post_save, sender=TenantFeature)
+@receiver(post_delete, sender=TenantFeature)
+def invalidate_tenant_features(sender, instance, **kwargs):
+    cache.invalidate_features(instance.tenant_id)
+
+
+@receiver(post_save, sender=Tenant)
+def create_tenant_partitions(sender, instance, created, **kwargs):
+    # Before the tenant's first rows, which would otherwise land in the DEFAULT partition
+    if created:
+        partitioning.create_tenant_partitions(instance.id)
+
+
+@receiver(pre_delete, sender=Tenant)
+def drop_tenant_partitions(sender, instance, **kwargs):
+    # Runs before the cascade, which then finds no rows left to delete there
+    partitioning.drop_tenant_partitions(instance.id)
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from . import cache as tenant_cache
+from .models import Tenant
+
+
+@override_settings(TENANT_CACHE_TTL=60)
+class TenantCacheTests(TestCase):
+    def setUp(self):
+        tenant_cache.clear()
+        self.addCleanup(tenant_cache.clear)
+        self.tenant = Tenant.objects.create(name='Cached School', email='cached@school.test', school_code='CAC001')
+
+    def test_hits_skip_the_query(self):
+        tenant_cache.get_by_id(self.tenant.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tenant_cache.get_by_slug(self.tenant.slug), self.tenant)
+
+    def test_callers_get_their_own_copy(self):
+        first = tenant_cache.get_by_id(self.tenant.id)
+        first.name = 'Changed in one request'
+
+        second = tenant_cache.get_by_id(self.tenant.id)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, 'Cached School')
+
+    def test_deactivating_drops_the_tenant_in_this_process(self):
+        tenant_cache.get_by_id(self.tenant.id)
+
+        self.tenant.is_active = False
+        self.tenant.save()
+
+        self.assertIsNone(tenant_cache.get_by_id(self.tenant.id))
@@ -0,0 +1,71 @@
+"""
+In-memory conflict index for timetable entries.
+
+The index maps (day, time_slot_id) to the teachers, rooms and classes already
+booked in that slot for one tenant and academic year. It is built with a
+single query and lets a whole batch of new entries be checked - against the
+database and against each other - in O(n).
+"""
+from collections import defaultdict
+
+from .models import Timetable
+
+
+def _room_key(room_number):
+    room = (room_number or '').strip().lower()
+    return room or None
+
+
+def _class_key(class_name, section):
+    return (class_name, section or '')
+
+
+class ConflictIndex:
+    def __init__(self, tenant_id, academic_year, exclude_ids=(), day=None, time_slot_id=None):
+        self.academic_year = academic_year
+        self._slots = defaultdict(lambda: {'teacher': {}, 'room': {}, 'class': {}})
+
+        queryset = Timetable.objects.filter(
+            tenant_id=tenant_id,
+            academic_year=academic_year,
+            is_active=True
+        ).exclude(id__in=exclude_ids)
+        # Narrow the index when only a single slot is being checked
+        if day:
+            queryset = queryset.filter(day=day)
+        if time_slot_id:
+            queryset = queryset.filter(time_slot_id=time_slot_id)
+
+        rows = queryset.values_list(
+            'id', 'day', 'time_slot_id', 'teacher_id', 'room_number', 'class_name', 'section'
+        )
+        for entry_id, day, time_slot_id, teacher_id, room_number, class_name, section in rows:
+            label = f"{class_name}{'-' + section if section else ''} ({entry_id})"
+            self.add(day, time_slot_id, teacher_id, room_number, class_name, section, label)
+
+    def check(self, day, time_slot_id, teacher_id, room_number, class_name, section):
+        """Return a list of conflict messages for a prospective entry"""
+        booked = self._slots.get((day, time_slot_id))
+        if not booked:
+            return []
+
+        conflicts = []
+        if teacher_id and teacher_id in booked['teacher']:
+            conflicts.append(f"Teacher is already booked in this period for {booked['teacher'][teacher_id]}")
+        room = _room_key(room_number)
+        if room and room in booked['room']:
+            conflicts.append(f"Room {room_number} is already booked in this period for {booked['room'][room]}")
+        klass = _class_key(class_name, section)
+        if klass in booked['class']:
+            conflicts.append(f"Class already has an entry in this period: {booked['class'][klass]}")
+        return conflicts
+
+    def add(self, day, time_slot_id, teacher_id, room_number, class_name, section, label):
+        """Book a slot so later entries see it as taken"""
+        booked = self._slots[(day, time_slot_id)]
+        if teacher_id:
+            booked['teacher'][teacher_id] = label
+        room = _room_key(room_number)
+        if room:
+            booked['room'][room] = label
+        booked['class'][_class_key(class_name, section)] = label
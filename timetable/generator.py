@@ -0,0 +1,327 @@
+"""
+Timetable generation for a tenant.
+
+Turns SchoolClass rows, teacher subjects, weekly period requirements, time
+slots and rooms into a solver Problem, runs the solver (optionally as a
+multi-process portfolio) and writes the result back as Timetable entries.
+Jobs are tracked in TimetableGenerationJob and run in a background thread or
+through the run_timetable_jobs management command. A thread dies with its
+gunicorn worker (e.g. when it is recycled after max_requests), so jobs left
+'running' past their time limit are handed back to the command by
+reclaim_stale_jobs().
+"""
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from school_classes.models import SchoolClass
+from teachers.models import Teacher
+from .models import TimeSlot, Timetable, TimetableGenerationJob
+from . import grid as timetable_grid, substitutions
+from .solver import FREE, Problem, solve_portfolio
+
+
+class GenerationError(Exception):
+    pass
+
+
+def _normalize(subject):
+    return subject.strip().lower()
+
+
+def _requirements_for(school_class, requirements):
+    """Resolve {subject: periods} for a class; class_id beats grade beats defaults"""
+    resolved = {}
+    for scope in ('default', 'grade', 'class'):
+        for item in requirements:
+            if item.get('class_id'):
+                matches = scope == 'class' and str(item['class_id']) == str(school_class.id)
+            elif item.get('grade'):
+                matches = scope == 'grade' and str(item['grade']) == str(school_class.grade)
+            else:
+                matches = scope == 'default'
+            if matches:
+                resolved[item['subject'].strip()] = int(item['periods_per_week'])
+    return {subject: periods for subject, periods in resolved.items() if periods > 0}
+
+
+class GenerationPlan:
+    """Solver problem plus the lookups needed to turn a solution back into rows"""
+
+    def __init__(self, tenant, academic_year, requirements, rooms=None, days=None, class_ids=None):
+        self.tenant = tenant
+        self.academic_year = academic_year
+        self.warnings = []
+        self.unassigned = []
+
+        day_choices = [day for day, _ in Timetable.DAY_CHOICES]
+        self.days = [day for day in day_choices if day in days] if days else day_choices
+        self.time_slots = list(TimeSlot.objects.filter(tenant=tenant, is_active=True).order_by('period_number'))
+        if not self.days or not self.time_slots:
+            raise GenerationError('At least one day and one active time slot are required')
+        n_slots = len(self.days) * len(self.time_slots)
+
+        classes = SchoolClass.objects.filter(tenant=tenant, academic_year=academic_year)
+        if class_ids:
+            classes = classes.filter(id__in=class_ids)
+        self.classes = list(classes.order_by('grade', 'section'))
+        if not self.classes:
+            raise GenerationError(f'No classes found for academic year {academic_year}')
+
+        # Classes that are not being generated keep their timetable, so their
+        # teachers and rooms are taken in those slots
+        planned = {(school_class.class_name, school_class.section) for school_class in self.classes}
+        slot_index = {
+            (day, time_slot.id): d * len(self.time_slots) + p
+            for d, day in enumerate(self.days)
+            for p, time_slot in enumerate(self.time_slots)
+        }
+        busy_teachers = set()
+        busy_rooms = {}
+        booked = Timetable.objects.filter(
+            tenant=tenant, academic_year=academic_year, is_active=True
+        ).values_list('class_name', 'section', 'day', 'time_slot_id', 'teacher_id', 'room_number')
+        for class_name, section, day, time_slot_id, teacher_id, room_number in booked:
+            slot = slot_index.get((day, time_slot_id))
+            if slot is None or (class_name, section) in planned:
+                continue
+            if teacher_id:
+                busy_teachers.add((teacher_id, slot))
+            if room_number and room_number.strip():
+                # Compared like ConflictIndex and the room constraint do
+                busy_rooms.setdefault(slot, set()).add(room_number.strip().lower())
+
+        teachers = list(Teacher.objects.filter(tenant=tenant, is_active=True).values_list('id', 'subjects'))
+        self.teacher_ids = [teacher_id for teacher_id, _ in teachers]
+        qualified = {}
+        for index, (_, subjects) in enumerate(teachers):
+            for subject in (subjects or '').split(','):
+                if subject.strip():
+                    qualified.setdefault(_normalize(subject), []).append(index)
+        teacher_index = {teacher_id: index for index, teacher_id in enumerate(self.teacher_ids)}
+        busy = [
+            (teacher_index[teacher_id], slot)
+            for teacher_id, slot in busy_teachers if teacher_id in teacher_index
+        ]
+
+        # Pick one teacher per (class, subject), hardest-to-staff pairs first
+        pairs = []
+        for c, school_class in enumerate(self.classes):
+            class_requirements = _requirements_for(school_class, requirements)
+            total = sum(class_requirements.values())
+            if total > n_slots:
+                raise GenerationError(
+                    f'{school_class.class_name} needs {total} periods but only {n_slots} are available'
+                )
+            for subject, periods in class_requirements.items():
+                pairs.append((c, subject, periods))
+        pairs.sort(key=lambda pair: (len(qualified.get(_normalize(pair[1]), [])), -pair[2]))
+
+        self.subjects = sorted({subject for _, subject, _ in pairs})
+        subject_index = {subject: index for index, subject in enumerate(self.subjects)}
+        load = [0] * len(self.teacher_ids)
+        for teacher, _ in busy:
+            load[teacher] += 1
+        lessons = [[] for _ in self.classes]
+        for c, subject, periods in pairs:
+            candidates = [
+                t for t in qualified.get(_normalize(subject), [])
+                if load[t] + periods <= n_slots
+            ]
+            class_teacher = teacher_index.get(self.classes[c].class_teacher_id)
+            if class_teacher in candidates:
+                teacher = class_teacher
+            elif candidates:
+                teacher = min(candidates, key=lambda t: load[t])
+            else:
+                teacher = FREE
+                self.unassigned.append({'class': self.classes[c].class_name, 'subject': subject})
+            if teacher != FREE:
+                load[teacher] += periods
+            lessons[c].extend([(subject_index[subject], teacher)] * periods)
+        if self.unassigned:
+            self.warnings.append(f'{len(self.unassigned)} class subjects have no qualified teacher with free periods')
+
+        self.rooms = []
+        self.room_available = None
+        room_capacity = None
+        if rooms:
+            period_index = {slot.period_number: p for p, slot in enumerate(self.time_slots)}
+            day_index = {day: d for d, day in enumerate(self.days)}
+            self.room_available = [[] for _ in range(n_slots)]
+            for room in rooms:
+                if isinstance(room, str):
+                    room = {'name': room}
+                blocked = set()
+                for day, period_number in room.get('unavailable', []):
+                    if day in day_index and period_number in period_index:
+                        blocked.add(day_index[day] * len(self.time_slots) + period_index[period_number])
+                self.rooms.append(room['name'])
+                for slot in range(n_slots):
+                    if slot not in blocked and room['name'].strip().lower() not in busy_rooms.get(slot, ()):
+                        self.room_available[slot].append(room['name'])
+            room_capacity = [len(available) for available in self.room_available]
+
+        self.problem = Problem(
+            len(self.days), len(self.time_slots), lessons,
+            len(self.teacher_ids), len(self.subjects), room_capacity, busy
+        )
+
+    def entries(self, solution):
+        """Build unsaved Timetable rows for a solution"""
+        problem = self.problem
+        n_periods = problem.n_periods
+        entries = []
+        for slot in range(problem.n_slots):
+            day = self.days[slot // n_periods]
+            time_slot = self.time_slots[slot % n_periods]
+            free_rooms = list(self.room_available[slot]) if self.room_available is not None else []
+            for c, school_class in enumerate(self.classes):
+                lesson = solution.grid[c][slot]
+                if lesson == FREE:
+                    continue
+                subject, teacher = problem.lessons[c][lesson]
+                room_number = None
+                if free_rooms:
+                    # Keep each class in its home room whenever that room is free
+                    home = self.rooms[c % len(self.rooms)]
+                    room_number = home if home in free_rooms else free_rooms[0]
+                    free_rooms.remove(room_number)
+                entries.append(Timetable(
+                    tenant=self.tenant,
+                    class_name=school_class.class_name,
+                    section=school_class.section,
+                    day=day,
+                    time_slot=time_slot,
+                    subject=self.subjects[subject],
+                    teacher_id=self.teacher_ids[teacher] if teacher != FREE else None,
+                    room_number=room_number,
+                    academic_year=self.academic_year,
+                ))
+        return entries
+
+
+def apply_entries(plan, entries):
+    """Replace the active timetable of the planned classes with the generated rows"""
+    with transaction.atomic():
+        for school_class in plan.classes:
+            Timetable.objects.filter(
+                tenant=plan.tenant,
+                academic_year=plan.academic_year,
+                class_name=school_class.class_name,
+                section=school_class.section,
+                is_active=True
+            ).update(is_active=False)
+        Timetable.objects.bulk_create(entries, batch_size=1000)
+        timetable_grid.invalidate_tenant(plan.tenant.id)
+        substitutions.invalidate(plan.tenant.id)
+
+
+def run_job(job_id):
+    """Claim a pending job and run it to completion"""
+    claimed = TimetableGenerationJob.objects.filter(id=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), progress=0
+    )
+    if not claimed:
+        return
+
+    job = TimetableGenerationJob.objects.select_related('tenant').get(id=job_id)
+    params = job.params
+
+    def report(fraction, hard, soft):
+        TimetableGenerationJob.objects.filter(id=job_id).update(
+            progress=min(99, int(fraction * 100)),
+            result={'hard_violations': hard, 'soft_violations': soft}
+        )
+
+    try:
+        plan = GenerationPlan(
+            job.tenant,
+            job.academic_year,
+            params.get('requirements', []),
+            rooms=params.get('rooms'),
+            days=params.get('days'),
+            class_ids=params.get('class_ids'),
+        )
+        solution = solve_portfolio(
+            plan.problem,
+            time_limit=params.get('time_limit', 30),
+            workers=params.get('workers', 1),
+            seed=params.get('seed'),
+            progress=report,
+        )
+        entries = plan.entries(solution)
+        applied = params.get('apply', True) and solution.hard == 0
+        if applied:
+            apply_entries(plan, entries)
+
+        job.result = {
+            'hard_violations': solution.hard,
+            'soft_violations': solution.soft,
+            'iterations': solution.iterations,
+            'elapsed_seconds': round(solution.elapsed, 2),
+            'classes': len(plan.classes),
+            'lessons': len(entries),
+            'applied': applied,
+            'unassigned': plan.unassigned,
+            'warnings': plan.warnings,
+            'entries': [
+                {
+                    'class_name': entry.class_name,
+                    'section': entry.section,
+                    'day': entry.day,
+                    'period_number': entry.time_slot.period_number,
+                    'subject': entry.subject,
+                    'teacher_id': str(entry.teacher_id) if entry.teacher_id else None,
+                    'room_number': entry.room_number,
+                }
+                for entry in entries
+            ],
+        }
+        if solution.hard:
+            job.result['warnings'].append('No clash-free timetable found within the time limit; nothing was applied')
+        job.status = 'completed'
+        job.progress = 100
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e) if isinstance(e, GenerationError) else traceback.format_exc()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'error', 'finished_at'])
+
+
+def reclaim_stale_jobs():
+    """Put jobs still 'running' well past their time limit back to pending; returns how many"""
+    now = timezone.now()
+    reclaimed = 0
+    for job in TimetableGenerationJob.objects.filter(status='running').only('id', 'params', 'started_at'):
+        limit = job.params.get('time_limit', 30) + settings.TIMETABLE_JOB_GRACE_SECONDS
+        if job.started_at and job.started_at > now - timedelta(seconds=limit):
+            continue
+        # Filter on started_at too, so a job reclaimed and restarted meanwhile is left alone
+        reclaimed += TimetableGenerationJob.objects.filter(
+            id=job.id, status='running', started_at=job.started_at
+        ).update(status='pending', progress=0)
+    return reclaimed
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+def start_job(job):
+    """
+    Run a job in a background thread once the creating transaction commits,
+    or leave it pending for run_timetable_jobs when TIMETABLE_JOBS_IN_THREAD is off
+    """
+    if not settings.TIMETABLE_JOBS_IN_THREAD:
+        return
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.id,), daemon=True).start()
+    )
@@ -0,0 +1,171 @@
+"""
+Compiled timetable grids.
+
+A grid is a dense day x period matrix for one class/section or one teacher,
+stored as JSON in TimetableGrid so read endpoints never have to re-query,
+re-group and re-serialize timetable entries. Grids are dropped whenever a
+Timetable or TimeSlot row changes (see signals.py) and rebuilt on next read.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+
+from school_classes.models import SchoolClass
+from teachers.models import Teacher
+from .models import TimeSlot, Timetable, TimetableGrid
+from .serializers import TimetableSerializer
+
+
+DAYS_ORDER = [day for day, _ in Timetable.DAY_CHOICES]
+
+# Used as the section part of a class key when no section filter is applied
+ALL_SECTIONS = '*'
+
+
+def class_key(class_name, section=None):
+    """Grid key for a class; section=None means every section of the class"""
+    return f"{class_name}|{ALL_SECTIONS if section is None else section}"
+
+
+def teacher_key(teacher_id):
+    return str(teacher_id)
+
+
+def _compile(tenant_id, entries):
+    """Build the dense grid for a list of timetable entries"""
+    slots = {
+        slot.id: slot
+        for slot in TimeSlot.objects.filter(tenant_id=tenant_id, is_active=True)
+    }
+    for entry in entries:
+        slots.setdefault(entry.time_slot_id, entry.time_slot)
+
+    periods = sorted(slots.values(), key=lambda slot: slot.period_number)
+    column = {slot.id: index for index, slot in enumerate(periods)}
+    row = {day: index for index, day in enumerate(DAYS_ORDER)}
+
+    cells = [[[] for _ in periods] for _ in DAYS_ORDER]
+    serialized = TimetableSerializer(entries, many=True).data
+    for entry, data in zip(entries, serialized):
+        if entry.day in row:
+            cells[row[entry.day]][column[entry.time_slot_id]].append(data)
+
+    return {
+        'days': DAYS_ORDER,
+        'periods': [
+            {
+                'id': str(slot.id),
+                'period_number': slot.period_number,
+                'start_time': slot.start_time.strftime('%H:%M'),
+                'end_time': slot.end_time.strftime('%H:%M'),
+            }
+            for slot in periods
+        ],
+        'cells': cells,
+    }
+
+
+def _store(tenant_id, scope, key, grid, store=True):
+    # Round-trip through JSON so the stored and returned grids are identical
+    payload = json.dumps(grid, cls=DjangoJSONEncoder, sort_keys=True)
+    grid = json.loads(payload)
+    etag = hashlib.md5(payload.encode()).hexdigest()
+    if not store:
+        return TimetableGrid(tenant_id=tenant_id, scope=scope, key=key, grid=grid, etag=etag)
+
+    try:
+        obj, _ = TimetableGrid.objects.update_or_create(
+            tenant_id=tenant_id, scope=scope, key=key,
+            defaults={'grid': grid, 'etag': etag}
+        )
+    except IntegrityError:
+        # Another request compiled the same grid concurrently
+        obj = TimetableGrid.objects.get(tenant_id=tenant_id, scope=scope, key=key)
+    return obj
+
+
+def get_class_grid(tenant_id, class_name, section=None, save=True):
+    """
+    Return the compiled TimetableGrid for a class, building it if missing. An
+    unknown class gets an empty grid that is not saved; save=False never
+    saves, for callers that must not write (e.g. views reading the replica).
+    """
+    key = class_key(class_name, section)
+    obj = TimetableGrid.objects.filter(tenant_id=tenant_id, scope='class', key=key).first()
+    if obj:
+        return obj
+
+    queryset = Timetable.objects.filter(
+        tenant_id=tenant_id,
+        class_name=class_name,
+        is_active=True
+    )
+    if section is not None:
+        queryset = queryset.filter(section=section)
+    entries = list(
+        queryset.select_related('teacher', 'teacher__user', 'time_slot')
+        .order_by('time_slot__period_number')
+    )
+    # Class names come from the client; only keep grids for classes that exist
+    store = save and bool(entries)
+    if save and not store:
+        classes = SchoolClass.objects.filter(tenant_id=tenant_id, class_name=class_name)
+        if section is not None:
+            classes = classes.filter(section=section)
+        store = classes.exists()
+    return _store(tenant_id, 'class', key, _compile(tenant_id, entries), store)
+
+
+def get_teacher_grid(tenant_id, teacher_id):
+    """
+    Return the compiled TimetableGrid for a teacher (teacher_id must be a valid
+    UUID), building it if missing. An unknown teacher gets an empty grid that
+    is not saved.
+    """
+    key = teacher_key(teacher_id)
+    obj = TimetableGrid.objects.filter(tenant_id=tenant_id, scope='teacher', key=key).first()
+    if obj:
+        return obj
+
+    entries = list(
+        Timetable.objects.filter(
+            tenant_id=tenant_id,
+            teacher_id=teacher_id,
+            is_active=True
+        ).select_related('teacher', 'teacher__user', 'time_slot')
+        .order_by('time_slot__period_number')
+    )
+    store = bool(entries) or Teacher.objects.filter(tenant_id=tenant_id, id=teacher_id).exists()
+    return _store(tenant_id, 'teacher', key, _compile(tenant_id, entries), store)
+
+
+def grid_by_day(grid):
+    """Flatten a grid into (day, [entries]) pairs for days that have entries"""
+    result = []
+    for day, row in zip(grid['days'], grid['cells']):
+        periods = [entry for cell in row for entry in cell]
+        if periods:
+            result.append((day, periods))
+    return result
+
+
+def invalidate_entries(tenant_id, entries):
+    """Drop the class and teacher grids touched by the given (class_name, section, teacher_id) tuples"""
+    class_keys = set()
+    teacher_keys = set()
+    for class_name, section, teacher_id in entries:
+        class_keys.add(class_key(class_name, section))
+        class_keys.add(class_key(class_name))
+        if teacher_id:
+            teacher_keys.add(teacher_key(teacher_id))
+
+    TimetableGrid.objects.filter(tenant_id=tenant_id, scope='class', key__in=class_keys).delete()
+    if teacher_keys:
+        TimetableGrid.objects.filter(tenant_id=tenant_id, scope='teacher', key__in=teacher_keys).delete()
+
+
+def invalidate_tenant(tenant_id):
+    """Drop every compiled grid for a tenant (e.g. after a time slot change)"""
+    TimetableGrid.objects.filter(tenant_id=tenant_id).delete()
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from timetable.generator import reclaim_stale_jobs, run_job
+from timetable.models import TimetableGenerationJob
+
+
+class Command(BaseCommand):
+    help = 'Run pending timetable generation jobs (for workers that should not use request threads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=str, help='Run a single job by ID')
+        parser.add_argument(
+            '--watch', type=float, metavar='SECONDS',
+            help='Keep running, checking for new and stale jobs every SECONDS'
+        )
+
+    def handle(self, *args, **options):
+        if options['watch'] is None:
+            self.run_pending(options['job'], verbose=True)
+            return
+        while True:
+            self.run_pending(options['job'])
+            close_old_connections()
+            time.sleep(options['watch'])
+
+    def run_pending(self, job=None, verbose=False):
+        reclaimed = reclaim_stale_jobs()
+        if reclaimed:
+            self.stdout.write(self.style.WARNING(f'Reclaimed {reclaimed} stale running jobs'))
+
+        jobs = TimetableGenerationJob.objects.filter(status='pending').order_by('created_at')
+        if job:
+            jobs = jobs.filter(id=job)
+
+        job_ids = list(jobs.values_list('id', flat=True))
+        if not job_ids:
+            if verbose:
+                self.stdout.write(self.style.WARNING('No pending timetable generation jobs'))
+            return
+
+        for job_id in job_ids:
+            run_job(job_id)
+            status = TimetableGenerationJob.objects.values_list('status', flat=True).get(id=job_id)
+            style = self.style.SUCCESS if status == 'completed' else self.style.ERROR
+            self.stdout.write(style(f'Job {job_id}: {status}'))
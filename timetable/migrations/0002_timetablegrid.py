@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:26
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+        ('timetable', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableGrid',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('scope', models.CharField(choices=[('class', 'Class'), ('teacher', 'Teacher')], max_length=10)),
+                ('key', models.CharField(help_text='class_name|section or teacher id', max_length=100)),
+                ('grid', models.JSONField(default=dict)),
+                ('etag', models.CharField(max_length=64)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'timetable_grids',
+                'unique_together': {('tenant', 'scope', 'key')},
+            },
+        ),
+    ]
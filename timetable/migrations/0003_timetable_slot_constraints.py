@@ -0,0 +1,87 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:28
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+
+
+# Timetable has no timestamp, so "newest" is the most recently written row
+WRITE_ORDER = {
+    'postgresql': 'xmin::text::bigint',
+    'sqlite': 'rowid',
+}
+
+
+def deactivate_clashing_entries(apps, schema_editor):
+    """
+    Keep the newest of any active entries that double-book a teacher, room or
+    class slot and deactivate the rest, so the constraints below can be built.
+    Rooms and sections are compared the way ConflictIndex does. Every
+    deactivated entry is listed with the entry it clashed with.
+    """
+    Timetable = apps.get_model('timetable', 'Timetable')
+    TimetableGrid = apps.get_model('timetable', 'TimetableGrid')
+    order = WRITE_ORDER.get(schema_editor.connection.vendor)
+    entries = Timetable.objects.filter(is_active=True).annotate(
+        written=RawSQL(order, []) if order else models.F('pk')
+    ).order_by('-written').values_list(
+        'id', 'tenant_id', 'academic_year', 'day', 'time_slot_id',
+        'teacher_id', 'room_number', 'class_name', 'section'
+    )
+
+    taken = {}
+    clashing = []
+    tenants = set()
+    for entry_id, tenant_id, year, day, time_slot_id, teacher_id, room, class_name, section in entries.iterator():
+        slot = (tenant_id, year, day, time_slot_id)
+        keys = [('class', class_name, section or '')]
+        if teacher_id is not None:
+            keys.append(('teacher', teacher_id))
+        room = (room or '').strip().lower()
+        if room:
+            keys.append(('room', room))
+        keys = [slot + key for key in keys]
+        kept = next((taken[key] for key in keys if key in taken), None)
+        if kept is not None:
+            clashing.append((entry_id, kept))
+            tenants.add(tenant_id)
+        else:
+            taken.update((key, entry_id) for key in keys)
+
+    if not clashing:
+        return
+    print(f'\n  Deactivated {len(clashing)} timetable entries that double-booked a slot:')
+    for entry_id, kept in clashing:
+        print(f'    {entry_id} (clashed with {kept})')
+    clashing = [entry_id for entry_id, _ in clashing]
+
+    for start in range(0, len(clashing), 500):
+        Timetable.objects.filter(id__in=clashing[start:start + 500]).update(is_active=False)
+    # Updates send no signals, so drop the compiled grids that showed the clashes
+    TimetableGrid.objects.filter(tenant_id__in=tenants).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teachers', '0002_teacher_department_teacher_salary'),
+        ('tenants', '0001_initial'),
+        ('timetable', '0002_timetablegrid'),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_clashing_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timetable',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True), ('teacher__isnull', False)), fields=('tenant', 'academic_year', 'day', 'time_slot', 'teacher'), name='timetable_unique_teacher_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetable',
+            constraint=models.UniqueConstraint(models.F('tenant'), models.F('academic_year'), models.F('day'), models.F('time_slot'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('room_number')), condition=models.Q(('is_active', True), ('room_number__isnull', False), models.Q(('room_number', ''), _negated=True)), name='timetable_unique_room_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetable',
+            constraint=models.UniqueConstraint(models.F('tenant'), models.F('academic_year'), models.F('day'), models.F('time_slot'), models.F('class_name'), django.db.models.functions.comparison.Coalesce('section', models.Value('')), condition=models.Q(('is_active', True)), name='timetable_unique_class_slot'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teachers', '0003_employee_id_prefix_search_index'),
+        ('tenants', '0002_partition_large_tables'),
+        ('timetable', '0004_timetablegenerationjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['tenant', 'teacher', 'is_active'], name='timetables_tenant__dfee6e_idx'),
+        ),
+    ]
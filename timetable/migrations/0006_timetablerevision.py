@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_partition_large_tables'),
+        ('timetable', '0005_timetable_teacher_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableRevision',
+            fields=[
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='tenants.tenant')),
+                ('version', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'timetable_revisions',
+            },
+        ),
+    ]
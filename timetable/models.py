@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models.functions import Coalesce, Lower, Trim
 
 
 class TimeSlot(models.Model):
@@ -48,7 +49,96 @@ class Timetable(models.Model):
         ordering = ['day', 'time_slot__period_number']
         indexes = [
             models.Index(fields=['tenant', 'class_name', 'section']),
+            # A teacher's current entries, skipping those of earlier academic years
+            models.Index(fields=['tenant', 'teacher', 'is_active']),
+        ]
+        # Backstop for ConflictIndex: no double-booked teacher, room or class per
+        # slot, comparing rooms and sections the same way it does
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'academic_year', 'day', 'time_slot', 'teacher'],
+                condition=models.Q(is_active=True, teacher__isnull=False),
+                name='timetable_unique_teacher_slot',
+            ),
+            models.UniqueConstraint(
+                'tenant', 'academic_year', 'day', 'time_slot', Lower(Trim('room_number')),
+                condition=models.Q(is_active=True, room_number__isnull=False) & ~models.Q(room_number=''),
+                name='timetable_unique_room_slot',
+            ),
+            models.UniqueConstraint(
+                'tenant', 'academic_year', 'day', 'time_slot', 'class_name', Coalesce('section', models.Value('')),
+                condition=models.Q(is_active=True),
+                name='timetable_unique_class_slot',
+            ),
         ]
     
     def __str__(self):
         return f"{self.class_name} - {self.day} - {self.subject}"
+
+
+class TimetableGrid(models.Model):
+    """Compiled day x period timetable grid for a class/section or a teacher"""
+    SCOPE_CHOICES = (
+        ('class', 'Class'),
+        ('teacher', 'Teacher'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE)
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=100, help_text="class_name|section or teacher id")
+    grid = models.JSONField(default=dict)
+    etag = models.CharField(max_length=64)
+    built_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'timetable_grids'
+        unique_together = ('tenant', 'scope', 'key')
+    
+    def __str__(self):
+        return f"{self.scope} grid - {self.key}"
+
+
+class TimetableGenerationJob(models.Model):
+    """Background run of the timetable generator for a tenant"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE)
+    academic_year = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.IntegerField(default=0, help_text="Percent complete")
+    params = models.JSONField(default=dict, help_text="Requirements, rooms, days, time limit and workers")
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'timetable_generation_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"Timetable generation {self.academic_year} - {self.status}"
+
+
+class TimetableRevision(models.Model):
+    """Per-tenant counter bumped on every timetable change, so every worker sees it"""
+    tenant = models.OneToOneField('tenants.Tenant', on_delete=models.CASCADE, primary_key=True)
+    version = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        db_table = 'timetable_revisions'
+    
+    def __str__(self):
+        return f"Timetable revision {self.version}"
@@ -1,9 +1,13 @@
 from rest_framework import serializers
-from .models import TimeSlot, Timetable
+from .models import TimeSlot, Timetable, TimetableGenerationJob
+from .substitutions import MAX_PERIOD
 from teachers.models import Teacher
 
 
 class TimeSlotSerializer(serializers.ModelSerializer):
+    # The substitution index keeps one bit per period of a day
+    period_number = serializers.IntegerField(min_value=0, max_value=MAX_PERIOD)
+    
     class Meta:
         model = TimeSlot
         fields = ['id', 'start_time', 'end_time', 'period_number', 'is_active']
@@ -81,3 +85,60 @@ class TeacherTimetableSerializer(serializers.Serializer):
     """Serializer for teacher-wise timetable view"""
     day = serializers.CharField()
     periods = serializers.ListField()
+
+
+class TimetableGenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TimetableGenerationJob
+        fields = [
+            'id', 'academic_year', 'status', 'progress', 'params', 'result',
+            'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class PeriodRequirementSerializer(serializers.Serializer):
+    subject = serializers.CharField(max_length=100)
+    periods_per_week = serializers.IntegerField(min_value=0, max_value=60)
+    grade = serializers.CharField(max_length=10, required=False)
+    class_id = serializers.UUIDField(required=False)
+
+
+class GenerateTimetableSerializer(serializers.Serializer):
+    academic_year = serializers.CharField(max_length=20)
+    requirements = PeriodRequirementSerializer(many=True)
+    rooms = serializers.ListField(required=False, help_text="Room names or {name, unavailable: [[day, period_number]]}")
+    days = serializers.ListField(
+        child=serializers.ChoiceField(choices=[day for day, _ in Timetable.DAY_CHOICES]),
+        required=False
+    )
+    class_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    time_limit = serializers.IntegerField(min_value=1, max_value=300, default=30)
+    workers = serializers.IntegerField(min_value=1, max_value=8, default=1)
+    seed = serializers.IntegerField(required=False)
+    apply = serializers.BooleanField(default=True)
+    
+    def validate_requirements(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one requirement is needed")
+        return value
+    
+    def validate_rooms(self, value):
+        for room in value:
+            if isinstance(room, str):
+                continue
+            if not isinstance(room, dict) or not room.get('name'):
+                raise serializers.ValidationError("Each room must be a name or an object with a 'name'")
+        return value
+    
+    def to_job_params(self):
+        """JSON-safe params for TimetableGenerationJob"""
+        data = dict(self.validated_data)
+        data.pop('academic_year')
+        data['requirements'] = [
+            {key: str(value) if key == 'class_id' else value for key, value in item.items()}
+            for item in data['requirements']
+        ]
+        if 'class_ids' in data:
+            data['class_ids'] = [str(class_id) for class_id in data['class_ids']]
+        return data
@@ -0,0 +1,73 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from teachers.models import Teacher
+from .models import TimeSlot, Timetable, TimetableGrid
+from . import grid, substitutions
+
+
+@receiver(pre_save, sender=Timetable)
+def remember_previous_placement(sender, instance, **kwargs):
+    """Keep the pre-update class/teacher so their grids can be dropped too"""
+    instance._grid_previous = None
+    if not instance._state.adding:
+        instance._grid_previous = Timetable.objects.filter(pk=instance.pk).values_list(
+            'class_name', 'section', 'teacher_id'
+        ).first()
+
+
+@receiver(post_save, sender=Timetable)
+@receiver(post_delete, sender=Timetable)
+def invalidate_timetable_grids(sender, instance, **kwargs):
+    entries = [(instance.class_name, instance.section, instance.teacher_id)]
+    previous = getattr(instance, '_grid_previous', None)
+    if previous:
+        entries.append(previous)
+    grid.invalidate_entries(instance.tenant_id, entries)
+    substitutions.invalidate(instance.tenant_id)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def invalidate_time_slot_grids(sender, instance, **kwargs):
+    grid.invalidate_tenant(instance.tenant_id)
+    substitutions.invalidate(instance.tenant_id)
+
+
+@receiver(post_delete, sender='teachers.Teacher')
+def invalidate_teacher_grids(sender, instance, **kwargs):
+    # Timetable.teacher is SET_NULL via a queryset update, which sends no signals
+    grid.invalidate_tenant(instance.tenant_id)
+    substitutions.invalidate(instance.tenant_id)
+
+
+def _drop_teacher_grids(tenant_id, teacher_id):
+    """Drop the teacher's grid and the grids of every class they teach (teacher_details)"""
+    entries = list(Timetable.objects.filter(
+        tenant_id=tenant_id, teacher_id=teacher_id, is_active=True
+    ).values_list('class_name', 'section', 'teacher_id').order_by().distinct())
+    grid.invalidate_entries(tenant_id, entries)
+    TimetableGrid.objects.filter(
+        tenant_id=tenant_id, scope='teacher', key=grid.teacher_key(teacher_id)
+    ).delete()
+
+
+@receiver(post_save, sender='teachers.Teacher')
+def invalidate_teacher_details(sender, instance, created, **kwargs):
+    # Subjects and active status feed the substitution index; the employee id
+    # is shown in teacher_details of every grid the teacher appears in
+    substitutions.invalidate(instance.tenant_id)
+    if not created:
+        _drop_teacher_grids(instance.tenant_id, instance.id)
+
+
+@receiver(post_save, sender='accounts.User')
+def invalidate_renamed_teacher(sender, instance, created, update_fields=None, **kwargs):
+    # Names appear in grids and the substitution index; logins only save last_login
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    teacher = Teacher.objects.filter(user=instance).values_list('tenant_id', 'id').first()
+    if teacher:
+        tenant_id, teacher_id = teacher
+        _drop_teacher_grids(tenant_id, teacher_id)
+        substitutions.invalidate(tenant_id)
@@ -0,0 +1,396 @@
+"""
+Timetable solver.
+
+Pure-Python tabu search over class timetables. Each class owns one cell per
+(day, period) slot and its lessons are a permutation over those cells, so a
+class can never be double-booked; moves swap two cells of the same class.
+The search minimises
+
+    HARD_WEIGHT * (teacher clashes + room overflow) + subject spread penalty
+
+where the spread penalty counts lessons of one subject beyond its fair share
+on a single day. Deliberately free of Django imports so it can run in worker
+processes for portfolio mode.
+"""
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+
+HARD_WEIGHT = 100
+
+FREE = -1
+
+
+class Problem:
+    """
+    Solver input.
+
+    lessons[c] is the list of (subject_id, teacher_id) lessons class c must
+    take each week; teacher_id is FREE when no teacher could be assigned.
+    room_capacity[s] is the number of rooms available in slot s, or None when
+    rooms are not constrained. busy holds (teacher_id, slot) pairs the teacher
+    already spends elsewhere, e.g. with a class that is not being generated.
+    """
+
+    def __init__(self, n_days, n_periods, lessons, n_teachers, n_subjects, room_capacity=None, busy=()):
+        self.n_days = n_days
+        self.n_periods = n_periods
+        self.n_slots = n_days * n_periods
+        self.lessons = lessons
+        self.n_teachers = n_teachers
+        self.n_subjects = n_subjects
+        self.room_capacity = room_capacity
+        self.busy = set(busy)
+
+        for c, class_lessons in enumerate(lessons):
+            if len(class_lessons) > self.n_slots:
+                raise ValueError(
+                    f"Class {c} needs {len(class_lessons)} periods but only {self.n_slots} are available"
+                )
+
+        # Fair share of a subject per day for the spread penalty
+        self.day_limit = []
+        for class_lessons in lessons:
+            counts = [0] * n_subjects
+            for subject, _ in class_lessons:
+                counts[subject] += 1
+            self.day_limit.append([max(1, math.ceil(count / n_days)) for count in counts])
+
+
+class Solution:
+    def __init__(self, grid, hard, soft, iterations, elapsed):
+        # grid[c][slot] is an index into problem.lessons[c], or FREE
+        self.grid = grid
+        self.hard = hard
+        self.soft = soft
+        self.iterations = iterations
+        self.elapsed = elapsed
+
+    @property
+    def cost(self):
+        return self.hard * HARD_WEIGHT + self.soft
+
+
+class _State:
+    """Mutable search state with incrementally maintained counters"""
+
+    def __init__(self, problem, rng):
+        self.p = problem
+        self.rng = rng
+        n_slots = problem.n_slots
+        self.grid = [[FREE] * n_slots for _ in problem.lessons]
+        self.teacher_count = [0] * (problem.n_teachers * n_slots)
+        # A busy slot counts as one booking, so any lesson placed there clashes
+        for teacher, slot in problem.busy:
+            self.teacher_count[teacher * n_slots + slot] = 1
+        self.occupied = [0] * n_slots
+        self.day_count = [[0] * (problem.n_subjects * problem.n_days) for _ in problem.lessons]
+        self.hard = 0
+        self.soft = 0
+        # teacher-slot cells and slots currently in violation, for picking moves
+        self.clashes = set()
+        self.overflow = set()
+        self.teacher_classes = [set() for _ in range(problem.n_teachers)]
+        for c, class_lessons in enumerate(problem.lessons):
+            for _, teacher in class_lessons:
+                if teacher != FREE:
+                    self.teacher_classes[teacher].add(c)
+        self.teacher_classes = [sorted(classes) for classes in self.teacher_classes]
+
+    # -- bookkeeping -----------------------------------------------------
+
+    def _place(self, c, slot, lesson):
+        p = self.p
+        self.grid[c][slot] = lesson
+        if lesson == FREE:
+            return
+        subject, teacher = p.lessons[c][lesson]
+        if teacher != FREE:
+            key = teacher * p.n_slots + slot
+            self.teacher_count[key] += 1
+            if self.teacher_count[key] > 1:
+                self.hard += 1
+                self.clashes.add(key)
+        if p.room_capacity is not None:
+            self.occupied[slot] += 1
+            if self.occupied[slot] > p.room_capacity[slot]:
+                self.hard += 1
+                self.overflow.add(slot)
+        key = subject * p.n_days + slot // p.n_periods
+        self.day_count[c][key] += 1
+        if self.day_count[c][key] > p.day_limit[c][subject]:
+            self.soft += 1
+
+    def _remove(self, c, slot):
+        p = self.p
+        lesson = self.grid[c][slot]
+        self.grid[c][slot] = FREE
+        if lesson == FREE:
+            return
+        subject, teacher = p.lessons[c][lesson]
+        if teacher != FREE:
+            key = teacher * p.n_slots + slot
+            if self.teacher_count[key] > 1:
+                self.hard -= 1
+            self.teacher_count[key] -= 1
+            if self.teacher_count[key] <= 1:
+                self.clashes.discard(key)
+        if p.room_capacity is not None:
+            if self.occupied[slot] > p.room_capacity[slot]:
+                self.hard -= 1
+            self.occupied[slot] -= 1
+            if self.occupied[slot] <= p.room_capacity[slot]:
+                self.overflow.discard(slot)
+        key = subject * p.n_days + slot // p.n_periods
+        if self.day_count[c][key] > p.day_limit[c][subject]:
+            self.soft -= 1
+        self.day_count[c][key] -= 1
+
+    def swap(self, c, a, b):
+        la, lb = self.grid[c][a], self.grid[c][b]
+        self._remove(c, a)
+        self._remove(c, b)
+        self._place(c, a, lb)
+        self._place(c, b, la)
+
+    # -- move evaluation -------------------------------------------------
+
+    def swap_delta(self, c, a, b):
+        """Change in weighted cost if cells a and b of class c were swapped"""
+        p = self.p
+        row = self.grid[c]
+        la, lb = row[a], row[b]
+        if la == lb:
+            return 0
+        n_slots = p.n_slots
+        tc = self.teacher_count
+        hard = 0
+        soft = 0
+
+        sa, ta = p.lessons[c][la] if la != FREE else (FREE, FREE)
+        sb, tb = p.lessons[c][lb] if lb != FREE else (FREE, FREE)
+
+        if ta != tb:
+            if ta != FREE:
+                hard += (tc[ta * n_slots + b] >= 1) - (tc[ta * n_slots + a] > 1)
+            if tb != FREE:
+                hard += (tc[tb * n_slots + a] >= 1) - (tc[tb * n_slots + b] > 1)
+
+        if p.room_capacity is not None and (la == FREE) != (lb == FREE):
+            occ, cap = self.occupied, p.room_capacity
+            # src loses a lesson, dst gains one
+            src, dst = (a, b) if la != FREE else (b, a)
+            hard += (occ[dst] >= cap[dst]) - (occ[src] > cap[src])
+
+        da, db = a // p.n_periods, b // p.n_periods
+        if da != db and sa != sb:
+            counts = self.day_count[c]
+            limits = p.day_limit[c]
+            if sa != FREE:
+                soft += (counts[sa * p.n_days + db] >= limits[sa]) - (counts[sa * p.n_days + da] > limits[sa])
+            if sb != FREE:
+                soft += (counts[sb * p.n_days + da] >= limits[sb]) - (counts[sb * p.n_days + db] > limits[sb])
+
+        return hard * HARD_WEIGHT + soft
+
+    # -- construction ----------------------------------------------------
+
+    def construct(self):
+        """Greedy start: busiest teachers first, each into its cheapest free slot"""
+        p = self.p
+        rng = self.rng
+        load = [0] * p.n_teachers
+        for class_lessons in p.lessons:
+            for _, teacher in class_lessons:
+                if teacher != FREE:
+                    load[teacher] += 1
+
+        def teacher_load(item):
+            teacher = p.lessons[item[0]][item[1]][1]
+            return load[teacher] if teacher != FREE else 0
+
+        order = [
+            (c, lesson)
+            for c, class_lessons in enumerate(p.lessons)
+            for lesson in range(len(class_lessons))
+        ]
+        rng.shuffle(order)
+        order.sort(key=teacher_load, reverse=True)
+
+        for c, lesson in order:
+            subject, teacher = p.lessons[c][lesson]
+            row = self.grid[c]
+            best, best_cost = [], None
+            for slot in range(p.n_slots):
+                if row[slot] != FREE:
+                    continue
+                cost = 0
+                if teacher != FREE:
+                    cost += self.teacher_count[teacher * p.n_slots + slot] * HARD_WEIGHT
+                if p.room_capacity is not None and self.occupied[slot] >= p.room_capacity[slot]:
+                    cost += HARD_WEIGHT
+                if self.day_count[c][subject * p.n_days + slot // p.n_periods] >= p.day_limit[c][subject]:
+                    cost += 1
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = [slot], cost
+                elif cost == best_cost:
+                    best.append(slot)
+            self._place(c, rng.choice(best), lesson)
+
+    # -- search ----------------------------------------------------------
+
+    def pick_conflict(self):
+        """Return a (class, slot) cell involved in a violation, or None"""
+        p = self.p
+        rng = self.rng
+        if self.clashes:
+            key = rng.choice(tuple(self.clashes))
+            teacher, slot = divmod(key, p.n_slots)
+            cells = [
+                c for c in self.teacher_classes[teacher]
+                if self.grid[c][slot] != FREE and p.lessons[c][self.grid[c][slot]][1] == teacher
+            ]
+            return rng.choice(cells), slot
+        if self.overflow:
+            slot = rng.choice(tuple(self.overflow))
+            cells = [c for c in range(len(p.lessons)) if self.grid[c][slot] != FREE]
+            return rng.choice(cells), slot
+        if self.soft:
+            for c in rng.sample(range(len(p.lessons)), len(p.lessons)):
+                row = self.grid[c]
+                counts = self.day_count[c]
+                limits = p.day_limit[c]
+                cells = [
+                    slot for slot, lesson in enumerate(row)
+                    if lesson != FREE and counts[
+                        p.lessons[c][lesson][0] * p.n_days + slot // p.n_periods
+                    ] > limits[p.lessons[c][lesson][0]]
+                ]
+                if cells:
+                    return c, rng.choice(cells)
+        return None
+
+
+def solve(problem, time_limit=30, seed=None, progress=None, progress_every=1.0, stop=None):
+    """
+    Run tabu search until a conflict-free, evenly spread timetable is found,
+    time_limit seconds elapse or the stop event is set. progress(fraction,
+    hard, soft) is called at most every progress_every seconds.
+    """
+    rng = random.Random(seed)
+    started = time.monotonic()
+    deadline = started + time_limit
+    state = _State(problem, rng)
+    state.construct()
+
+    n_slots = problem.n_slots
+    best_cost = state.hard * HARD_WEIGHT + state.soft
+    best_grid = [row[:] for row in state.grid]
+    best_hard, best_soft = state.hard, state.soft
+    tabu = {}
+    tenure = 10
+    iteration = 0
+    last_report = started
+
+    while best_cost > 0:
+        iteration += 1
+        if iteration % 64 == 0:
+            now = time.monotonic()
+            if now >= deadline or (stop is not None and stop.is_set()):
+                break
+            if progress and now - last_report >= progress_every:
+                progress(min(1.0, (now - started) / time_limit), best_hard, best_soft)
+                last_report = now
+
+        picked = state.pick_conflict()
+        if picked is None:
+            break
+        c, a = picked
+        current = state.hard * HARD_WEIGHT + state.soft
+
+        if rng.random() < 0.02:
+            # Random walk to escape plateaus
+            b = rng.randrange(n_slots - 1)
+            b += b >= a
+        else:
+            moves, move_delta = [], None
+            row = state.grid[c]
+            lesson_a = row[a]
+            for b in range(n_slots):
+                if b == a or row[b] == lesson_a:
+                    continue
+                delta = state.swap_delta(c, a, b)
+                is_tabu = tabu.get((c, lesson_a, b), 0) > iteration or tabu.get((c, row[b], a), 0) > iteration
+                if is_tabu and current + delta >= best_cost:
+                    continue
+                if move_delta is None or delta < move_delta:
+                    moves, move_delta = [b], delta
+                elif delta == move_delta:
+                    moves.append(b)
+            if not moves:
+                continue
+            b = rng.choice(moves)
+
+        row = state.grid[c]
+        tabu[(c, row[a], a)] = iteration + tenure + rng.randrange(5)
+        tabu[(c, row[b], b)] = iteration + tenure + rng.randrange(5)
+        state.swap(c, a, b)
+
+        cost = state.hard * HARD_WEIGHT + state.soft
+        if cost < best_cost:
+            best_cost = cost
+            best_grid = [row[:] for row in state.grid]
+            best_hard, best_soft = state.hard, state.soft
+
+    elapsed = time.monotonic() - started
+    if progress:
+        progress(1.0, best_hard, best_soft)
+    return Solution(best_grid, best_hard, best_soft, iteration, elapsed)
+
+
+# Set in each portfolio worker process; tells every search to stop once one has succeeded
+_stop = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _solve_seed(problem, time_limit, seed):
+    return solve(problem, time_limit=time_limit, seed=seed, stop=_stop)
+
+
+def solve_portfolio(problem, time_limit=30, workers=2, seed=None, progress=None):
+    """Run independent searches with different seeds in worker processes and keep the best"""
+    if workers <= 1:
+        return solve(problem, time_limit=time_limit, seed=seed, progress=progress)
+
+    rng = random.Random(seed)
+    seeds = [rng.randrange(2 ** 31) for _ in range(workers)]
+    best = None
+    done = 0
+    context = get_context('spawn')
+    # Running futures cannot be cancelled, so the searches poll this event instead
+    stop = context.Event()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(stop,)
+    ) as pool:
+        futures = [pool.submit(_solve_seed, problem, time_limit, s) for s in seeds]
+        try:
+            for future in as_completed(futures):
+                solution = future.result()
+                done += 1
+                if best is None or solution.cost < best.cost:
+                    best = solution
+                if progress:
+                    progress(done / workers, best.hard, best.soft)
+                if best.cost == 0:
+                    break
+        finally:
+            # Let the remaining searches return early instead of running out their time limit
+            stop.set()
+    return best
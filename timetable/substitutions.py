@@ -0,0 +1,150 @@
+"""
+Teacher substitution finder.
+
+FreePeriodIndex keeps, per tenant, one busy bitmap per teacher with a bit for
+every (day, period) they teach, plus each teacher's normalized subjects and
+daily schedule. It is built from Timetable with two queries and cached under
+the tenant's TimetableRevision, which invalidate() bumps whenever timetable
+data changes. The cache is per process, but the revision lives in the
+database, so every worker stops using its copy as soon as the change commits.
+A lookup costs one primary-key query plus O(teachers).
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from teachers.models import Teacher
+from .models import Timetable, TimetableRevision
+
+
+DAYS_ORDER = [day for day, _ in Timetable.DAY_CHOICES]
+
+# Bits reserved per day; period numbers must stay below this
+DAY_WIDTH = 64
+MAX_PERIOD = DAY_WIDTH - 1
+
+CACHE_TIMEOUT = 60 * 10
+
+ABSENT_STATUSES = ('absent', 'on_leave')
+
+
+def _cache_key(tenant_id, version):
+    return f'timetable:free_periods:{tenant_id}:{version}'
+
+
+def _bit(day, period_number):
+    # A negative shift raises, and a period past the day's width would land in the next day's bits
+    if not 0 <= period_number <= MAX_PERIOD:
+        raise ValueError(f'period must be between 0 and {MAX_PERIOD}')
+    return 1 << (DAYS_ORDER.index(day) * DAY_WIDTH + period_number)
+
+
+def _day_mask(day):
+    return ((1 << DAY_WIDTH) - 1) << (DAYS_ORDER.index(day) * DAY_WIDTH)
+
+
+class FreePeriodIndex:
+    def __init__(self, tenant_id):
+        self.teachers = {}
+        self.busy = {}
+        self.schedule = {}
+
+        teachers = Teacher.objects.filter(tenant_id=tenant_id, is_active=True).values_list(
+            'id', 'user__first_name', 'user__last_name', 'subjects'
+        )
+        for teacher_id, first_name, last_name, subjects in teachers:
+            self.teachers[teacher_id] = {
+                'name': f"{first_name} {last_name}",
+                'subjects': {s.strip().lower() for s in (subjects or '').split(',') if s.strip()},
+            }
+            self.busy[teacher_id] = 0
+            self.schedule[teacher_id] = {}
+
+        entries = Timetable.objects.filter(
+            tenant_id=tenant_id,
+            is_active=True,
+            teacher_id__in=self.teachers.keys()
+        ).values_list(
+            'id', 'teacher_id', 'day', 'time_slot__period_number', 'class_name',
+            'section', 'subject', 'room_number'
+        ).order_by('time_slot__period_number')
+        for entry_id, teacher_id, day, period_number, class_name, section, subject, room_number in entries:
+            if not 0 <= period_number <= MAX_PERIOD:
+                # Only possible for time slots written around TimeSlotSerializer
+                continue
+            self.busy[teacher_id] |= _bit(day, period_number)
+            self.schedule[teacher_id].setdefault(day, []).append({
+                'entry_id': str(entry_id),
+                'period_number': period_number,
+                'class_name': class_name,
+                'section': section or '',
+                'subject': subject,
+                'room_number': room_number or '',
+            })
+
+    def free_teachers(self, day, period_number, subject=None, exclude=()):
+        """
+        Teachers free in a period, qualified ones first, then by lightest day.
+        Raises ValueError for a period outside 0..MAX_PERIOD.
+        """
+        bit = _bit(day, period_number)
+        day_mask = _day_mask(day)
+        subject = subject.strip().lower() if subject else None
+
+        result = []
+        for teacher_id, teacher in self.teachers.items():
+            if teacher_id in exclude or self.busy[teacher_id] & bit:
+                continue
+            result.append({
+                'teacher_id': str(teacher_id),
+                'name': teacher['name'],
+                'qualified': bool(subject) and subject in teacher['subjects'],
+                'periods_that_day': (self.busy[teacher_id] & day_mask).bit_count(),
+            })
+        result.sort(key=lambda t: (not t['qualified'], t['periods_that_day']))
+        return result
+
+    def suggest(self, teacher_id, day, exclude=()):
+        """Propose a substitute for every period the teacher teaches on a day"""
+        exclude = set(exclude) | {teacher_id}
+        # Substitutions made here count against the substitute's load for later periods
+        extra_load = {}
+        suggestions = []
+
+        for period in self.schedule.get(teacher_id, {}).get(day, []):
+            candidates = self.free_teachers(day, period['period_number'], period['subject'], exclude)
+            candidates.sort(key=lambda t: (
+                not t['qualified'],
+                t['periods_that_day'] + extra_load.get(t['teacher_id'], 0)
+            ))
+            substitute = candidates[0] if candidates else None
+            if substitute:
+                extra_load[substitute['teacher_id']] = extra_load.get(substitute['teacher_id'], 0) + 1
+            suggestions.append({
+                **period,
+                'substitute': substitute,
+                'alternatives': candidates[1:5],
+            })
+        return suggestions
+
+
+def get_index(tenant_id):
+    version = TimetableRevision.objects.filter(tenant_id=tenant_id).values_list('version', flat=True).first() or 0
+    key = _cache_key(tenant_id, version)
+    index = cache.get(key)
+    if index is None:
+        index = FreePeriodIndex(tenant_id)
+        cache.set(key, index, CACHE_TIMEOUT)
+    return index
+
+
+def invalidate(tenant_id):
+    """Move the tenant to a new revision; indexes cached for the old one are never read again"""
+    if TimetableRevision.objects.filter(tenant_id=tenant_id).update(version=F('version') + 1):
+        return
+    try:
+        # Revision 1, so the index cached before the row existed (revision 0) goes too
+        with transaction.atomic():
+            TimetableRevision.objects.create(tenant_id=tenant_id)
+    except IntegrityError:
+        TimetableRevision.objects.filter(tenant_id=tenant_id).update(version=F('version') + 1)
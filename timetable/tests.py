@@ -1,3 +1,348 @@
-from django.test import TestCase
+import datetime
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from school_classes.models import SchoolClass
+from teachers.models import Teacher
+from tenants.models import Tenant
+from .generator import GenerationPlan, apply_entries, reclaim_stale_jobs, start_job
+from .models import TimeSlot, Timetable, TimetableGenerationJob, TimetableGrid, TimetableRevision
+from .solver import FREE, Problem, solve, solve_portfolio
+from . import grid as timetable_grid, substitutions
+from .conflicts import ConflictIndex
+
+
+class TimetableFixtureMixin:
+    YEAR = '2026-2027'
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(
+            name='Timetable School', email='timetable@school.test', school_code='TT001'
+        )
+        self.time_slots = [
+            TimeSlot.objects.create(
+                tenant=self.tenant, period_number=period,
+                start_time=datetime.time(7 + period), end_time=datetime.time(8 + period)
+            )
+            for period in (1, 2)
+        ]
+        self.teacher = self.make_teacher('maths@school.test', 'Maths')
+
+    def make_teacher(self, email, subjects):
+        user = User.objects.create_user(
+            email=email, first_name='Ada', last_name='Teacher', role='teacher', tenant=self.tenant
+        )
+        return Teacher.objects.create(
+            tenant=self.tenant, user=user, employee_id=email, date_of_birth=datetime.date(1980, 1, 1),
+            gender='female', qualification='master', joining_date=datetime.date(2020, 1, 1),
+            subjects=subjects
+        )
+
+    def make_class(self, section):
+        return SchoolClass.objects.create(
+            tenant=self.tenant, grade='8', section=section, class_name=f'Grade 8-{section}',
+            academic_year=self.YEAR
+        )
+
+    def book(self, class_name, section, period, teacher=None, room_number=None, day='monday'):
+        return Timetable.objects.create(
+            tenant=self.tenant, class_name=class_name, section=section, day=day,
+            time_slot=self.time_slots[period - 1], subject='Maths', teacher=teacher,
+            room_number=room_number, academic_year=self.YEAR
+        )
+
+
+class SolverTests(TestCase):
+    def clashes(self, problem, solution):
+        booked = {}
+        for c, row in enumerate(solution.grid):
+            for slot, lesson in enumerate(row):
+                if lesson != FREE:
+                    teacher = problem.lessons[c][lesson][1]
+                    booked[(teacher, slot)] = booked.get((teacher, slot), 0) + 1
+        return sum(count - 1 for count in booked.values())
+
+    def test_finds_clash_free_timetable(self):
+        # Three classes each see all three teachers once, a fourth sees one of them
+        lessons = [[(t, t) for t in range(3)] for _ in range(3)] + [[(0, 0)]]
+        problem = Problem(1, 4, lessons, n_teachers=3, n_subjects=3)
+        solution = solve(problem, time_limit=10, seed=3)
+
+        self.assertEqual(solution.hard, 0)
+        self.assertEqual(self.clashes(problem, solution), 0)
+        self.assertEqual(solution.grid[3].count(FREE), 3)
+
+    def test_avoids_busy_slots(self):
+        problem = Problem(1, 3, [[(0, 0)]], n_teachers=1, n_subjects=1, busy=[(0, 0), (0, 2)])
+        solution = solve(problem, time_limit=10, seed=1)
+        self.assertEqual(solution.grid[0], [FREE, 0, FREE])
+
+    def test_room_capacity_is_respected(self):
+        lessons = [[(0, 0)], [(0, 1)]]
+        problem = Problem(1, 2, lessons, n_teachers=2, n_subjects=1, room_capacity=[1, 1])
+        solution = solve(problem, time_limit=10, seed=1)
+        self.assertEqual(solution.hard, 0)
+        self.assertNotEqual(solution.grid[0].index(0), solution.grid[1].index(0))
+
+    def infeasible(self):
+        # Four lessons of one teacher in two slots: a clash is unavoidable
+        return Problem(1, 2, [[(0, 0), (0, 0)], [(0, 0), (0, 0)]], n_teachers=1, n_subjects=1)
+
+    def test_stop_event_ends_search_early(self):
+        stop = threading.Event()
+        stop.set()
+        started = time.monotonic()
+        solution = solve(self.infeasible(), time_limit=30, seed=1, stop=stop)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(solution.hard, 2)
+
+    def test_portfolio_keeps_best_solution(self):
+        lessons = [[(0, 0), (0, 0), (1, 1), (1, 1)] for _ in range(2)]
+        problem = Problem(1, 4, lessons, n_teachers=2, n_subjects=2)
+        reports = []
+        solution = solve_portfolio(problem, time_limit=30, workers=2, seed=5, progress=lambda *args: reports.append(args))
+
+        self.assertEqual(solution.cost, 0)
+        self.assertLess(solution.elapsed, 30)
+        self.assertEqual(reports[-1][1:], (0, 0))
+
+
+class GenerationPlanTests(TimetableFixtureMixin, TestCase):
+    REQUIREMENTS = [{'subject': 'Maths', 'periods_per_week': 1}]
+
+    def test_other_classes_bookings_are_busy_slots(self):
+        planned = self.make_class('A')
+        other = self.make_class('B')
+        self.book(other.class_name, other.section, 1, teacher=self.teacher, room_number='R1')
+
+        plan = GenerationPlan(
+            self.tenant, self.YEAR, self.REQUIREMENTS, rooms=['R1'], days=['monday'],
+            class_ids=[planned.id]
+        )
+        self.assertEqual(plan.problem.busy, {(0, 0)})
+        self.assertEqual(plan.room_available, [[], ['R1']])
+
+        entries = plan.entries(solve(plan.problem, time_limit=5, seed=1))
+        self.assertEqual([(entry.time_slot.period_number, entry.room_number) for entry in entries], [(2, 'R1')])
+        # Would raise IntegrityError on the teacher and room slot constraints
+        apply_entries(plan, entries)
+        self.assertEqual(Timetable.objects.filter(tenant=self.tenant, is_active=True).count(), 2)
+
+    def test_planned_classes_replace_their_own_bookings(self):
+        planned = self.make_class('A')
+        self.book(planned.class_name, planned.section, 1, teacher=self.teacher)
+
+        plan = GenerationPlan(self.tenant, self.YEAR, self.REQUIREMENTS, days=['monday'])
+        self.assertEqual(plan.problem.busy, set())
+
+
+@override_settings(TIMETABLE_JOB_GRACE_SECONDS=60)
+class GenerationJobTests(TimetableFixtureMixin, TestCase):
+    def make_job(self, status, started_seconds_ago=None, time_limit=30):
+        started_at = None
+        if started_seconds_ago is not None:
+            started_at = timezone.now() - timedelta(seconds=started_seconds_ago)
+        return TimetableGenerationJob.objects.create(
+            tenant=self.tenant, academic_year=self.YEAR, status=status,
+            params={'time_limit': time_limit}, started_at=started_at
+        )
+
+    def test_reclaims_running_jobs_past_their_time_limit(self):
+        stale = self.make_job('running', started_seconds_ago=120)
+        fresh = self.make_job('running', started_seconds_ago=60)
+        long_running = self.make_job('running', started_seconds_ago=120, time_limit=300)
+        finished = self.make_job('completed', started_seconds_ago=600)
+
+        self.assertEqual(reclaim_stale_jobs(), 1)
+        statuses = dict(TimetableGenerationJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.id], 'pending')
+        self.assertEqual(statuses[fresh.id], 'running')
+        self.assertEqual(statuses[long_running.id], 'running')
+        self.assertEqual(statuses[finished.id], 'completed')
+
+    @override_settings(TIMETABLE_JOBS_IN_THREAD=False)
+    def test_jobs_stay_pending_without_threads(self):
+        job = self.make_job('pending')
+        with self.captureOnCommitCallbacks() as callbacks:
+            start_job(job)
+        self.assertEqual(callbacks, [])
+
+
+class SubstitutionIndexTests(TimetableFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_index_is_cached_per_revision(self):
+        substitutions.get_index(self.tenant.id)
+        with self.assertNumQueries(1):
+            substitutions.get_index(self.tenant.id)
+
+        # Another worker changed the timetable: only the database row tells us
+        TimetableRevision.objects.filter(tenant=self.tenant).update(version=F('version') + 1)
+        with self.assertNumQueries(3):
+            substitutions.get_index(self.tenant.id)
+
+    def test_timetable_change_is_seen_through_the_cache(self):
+        self.assertEqual(len(substitutions.get_index(self.tenant.id).free_teachers('monday', 1)), 1)
+        self.book('Grade 8-A', 'A', 1, teacher=self.teacher)
+        self.assertEqual(substitutions.get_index(self.tenant.id).free_teachers('monday', 1), [])
+
+
+class FreeTeacherEndpointTests(TimetableFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        self.client.force_authenticate(self.teacher.user)
+
+    def test_period_out_of_range_is_rejected(self):
+        for period in ('-1', '64'):
+            response = self.client.get('/api/timetable/entries/free_teachers/', {'day': 'monday', 'period': period})
+            self.assertEqual(response.status_code, 400, period)
+
+    def test_busy_teacher_is_not_free(self):
+        self.book('Grade 8-A', 'A', 1, teacher=self.teacher)
+        other = self.make_teacher('science@school.test', 'Science')
+
+        response = self.client.get('/api/timetable/entries/free_teachers/', {'day': 'monday', 'period': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['teacher_id'] for t in response.json()['teachers']], [str(other.id)])
+
+    def test_period_does_not_spill_into_next_day(self):
+        self.book('Grade 8-A', 'A', 1, teacher=self.teacher, day='tuesday')
+        with self.assertRaises(ValueError):
+            substitutions.get_index(self.tenant.id).free_teachers('monday', 65)
+        self.assertEqual(len(substitutions.get_index(self.tenant.id).free_teachers('monday', 1)), 1)
+
+    def test_time_slot_period_is_validated(self):
+        admin = User.objects.create_user(
+            email='admin@school.test', first_name='A', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.client.force_authenticate(admin)
+        response = self.client.post('/api/timetable/time-slots/', {
+            'start_time': '15:00', 'end_time': '16:00', 'period_number': 64
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('period_number', response.json())
+
+
+class GridEndpointTests(TimetableFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        self.client.force_authenticate(self.teacher.user)
+
+    def get_grid(self, **params):
+        return self.client.get('/api/timetable/entries/grid/', params)
+
+    def test_unknown_class_gets_empty_grid_without_storing_it(self):
+        response = self.get_grid(class_name='No Such Class', section='Z')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cells'], [[[], []] for _ in response.json()['days']])
+        self.assertFalse(TimetableGrid.objects.exists())
+
+    def test_existing_class_grid_is_stored(self):
+        school_class = self.make_class('A')
+        self.assertEqual(self.get_grid(class_name=school_class.class_name, section='A').status_code, 200)
+        self.assertTrue(TimetableGrid.objects.filter(scope='class').exists())
+
+    def test_teacher_grid_validates_id(self):
+        self.assertEqual(self.get_grid(teacher_id='not-a-uuid').status_code, 400)
+        response = self.client.get('/api/timetable/entries/teacher_timetable/', {'teacher_id': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.get_grid(teacher_id=str(uuid.uuid4())).status_code, 200)
+        self.assertFalse(TimetableGrid.objects.exists())
+
+        self.assertEqual(self.get_grid(teacher_id=str(self.teacher.id)).status_code, 200)
+        self.assertTrue(TimetableGrid.objects.filter(scope='teacher', key=str(self.teacher.id)).exists())
+
+
+class GridInvalidationTests(TimetableFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.school_class = self.make_class('A')
+        self.book(self.school_class.class_name, 'A', 1, teacher=self.teacher)
+        self.other = self.make_teacher('science@school.test', 'Science')
+        self.book('Grade 9-A', 'A', 1, teacher=self.other)
+
+    def compile_grids(self):
+        for class_name in ('Grade 8-A', 'Grade 9-A'):
+            timetable_grid.get_class_grid(self.tenant.id, class_name, 'A')
+        for teacher in (self.teacher, self.other):
+            timetable_grid.get_teacher_grid(self.tenant.id, teacher.id)
+
+    def cached_keys(self):
+        return set(TimetableGrid.objects.values_list('key', flat=True))
+
+    def test_teacher_rename_drops_grids_showing_their_name(self):
+        self.compile_grids()
+        user = self.teacher.user
+        user.first_name = 'Grace'
+        user.save()
+
+        self.assertEqual(self.cached_keys(), {'Grade 9-A|A', str(self.other.id)})
+        compiled = timetable_grid.get_class_grid(self.tenant.id, 'Grade 8-A', 'A')
+        self.assertEqual(compiled.grid['cells'][0][0][0]['teacher_details']['name'], 'Grace Teacher')
+
+    def test_login_keeps_grids(self):
+        self.compile_grids()
+        user = self.teacher.user
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+
+        self.assertEqual(len(self.cached_keys()), 4)
+
+    def test_teacher_update_drops_their_grids(self):
+        self.compile_grids()
+        self.teacher.employee_id = 'T-100'
+        self.teacher.save()
+
+        self.assertEqual(self.cached_keys(), {'Grade 9-A|A', str(self.other.id)})
+
+
+class SlotConstraintTests(TimetableFixtureMixin, TestCase):
+    def assertClashes(self, *args, **kwargs):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.book(*args, **kwargs)
+
+    def test_rooms_are_compared_like_conflict_index(self):
+        self.book('Grade 8-A', 'A', 1, room_number='Lab 1')
+
+        self.assertClashes('Grade 8-B', 'B', 1, room_number=' lab 1 ')
+
+    def test_missing_section_counts_as_one_class(self):
+        self.book('Grade 8', None, 1)
+
+        self.assertClashes('Grade 8', None, 1)
+        self.assertClashes('Grade 8', '', 1)
+
+    def test_concurrent_bulk_create_gets_a_conflict(self):
+        self.book('Grade 8-A', 'A', 1, teacher=self.teacher)
+        client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        client.force_authenticate(self.teacher.user)
+        entry = {
+            'class_name': 'Grade 8-B', 'section': 'B', 'day': 'monday', 'subject': 'Maths',
+            'academic_year': self.YEAR, 'teacher_id': str(self.teacher.id), 'time_slot_id': str(self.time_slots[0].id),
+        }
+
+        # As if the clashing entry was written after this request checked the slot
+        with mock.patch.object(ConflictIndex, 'check', return_value=[]):
+            response = client.post('/api/timetable/entries/bulk_create/', {'entries': [entry]}, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Timetable.objects.count(), 1)
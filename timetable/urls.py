@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TimeSlotViewSet, TimetableViewSet
+from .views import TimeSlotViewSet, TimetableViewSet, TimetableGenerationViewSet
 
 router = DefaultRouter()
 router.register(r'time-slots', TimeSlotViewSet, basename='time-slot')
 router.register(r'entries', TimetableViewSet, basename='timetable')
+router.register(r'generate', TimetableGenerationViewSet, basename='timetable-generation')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,17 +1,24 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from datetime import datetime
+import uuid
 
-from .models import TimeSlot, Timetable
+from .models import TimeSlot, Timetable, TimetableGenerationJob
+from . import grid as timetable_grid, substitutions
+from .conflicts import ConflictIndex
+from .generator import start_job
 from .serializers import (
     TimeSlotSerializer, TimetableSerializer, 
-    ClassTimetableSerializer, TeacherTimetableSerializer
+    ClassTimetableSerializer, TeacherTimetableSerializer,
+    TimetableGenerationJobSerializer, GenerateTimetableSerializer
 )
-from students.models import Student
+from students.models import Student, AcademicRegistration
 from teachers.models import Teacher
+from attendance.models import TeacherAttendance
 
 
 class TimeSlotViewSet(viewsets.ModelViewSet):
@@ -55,8 +62,85 @@ class TimetableViewSet(viewsets.ModelViewSet):
         
         return queryset.select_related('teacher', 'teacher__user', 'time_slot').order_by('day', 'time_slot__period_number')
     
+    def _check_conflicts(self, serializer):
+        """Reject a single create/update that double-books a teacher, room or class"""
+        data = serializer.validated_data
+        instance = serializer.instance
+        
+        def current(field, default=None):
+            if data.get(field) is not None:
+                return data[field]
+            return getattr(instance, field) if instance else default
+        
+        if not current('is_active', True):
+            return
+        
+        day = current('day')
+        time_slot_id = current('time_slot_id')
+        conflict_index = ConflictIndex(
+            self.request.tenant.id,
+            current('academic_year'),
+            exclude_ids=[instance.id] if instance else (),
+            day=day,
+            time_slot_id=time_slot_id
+        )
+        conflicts = conflict_index.check(
+            day, time_slot_id, current('teacher_id'), current('room_number'),
+            current('class_name'), current('section')
+        )
+        if conflicts:
+            raise serializers.ValidationError({'conflicts': conflicts})
+    
+    def _save(self, serializer, **kwargs):
+        try:
+            with transaction.atomic():
+                serializer.save(**kwargs)
+        except IntegrityError:
+            # Another request booked the slot between the check and the insert
+            raise serializers.ValidationError({'conflicts': ['This period was just booked by another request']})
+    
     def perform_create(self, serializer):
-        serializer.save(tenant=self.request.tenant)
+        self._check_conflicts(serializer)
+        self._save(serializer, tenant=self.request.tenant)
+    
+    def perform_update(self, serializer):
+        self._check_conflicts(serializer)
+        self._save(serializer)
+    
+    def _grid_response(self, request, compiled, payload):
+        """Serve data derived from a compiled grid, honouring If-None-Match"""
+        etag = f'"{compiled.etag}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(payload)
+        response['ETag'] = etag
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def grid(self, request):
+        """Get the compiled day x period grid for a class/section or a teacher"""
+        tenant = request.tenant
+        class_name = request.query_params.get('class_name')
+        teacher_id = request.query_params.get('teacher_id')
+        
+        if class_name:
+            compiled = timetable_grid.get_class_grid(
+                tenant.id, class_name, request.query_params.get('section')
+            )
+        elif teacher_id:
+            try:
+                teacher_id = uuid.UUID(teacher_id)
+            except ValueError:
+                return Response({'error': 'Invalid teacher_id'}, status=status.HTTP_400_BAD_REQUEST)
+            compiled = timetable_grid.get_teacher_grid(tenant.id, teacher_id)
+        else:
+            return Response(
+                {'error': 'class_name or teacher_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return self._grid_response(request, compiled, compiled.grid)
     
     @action(detail=False, methods=['get'])
     def class_timetable(self, request):
@@ -71,36 +155,16 @@ class TimetableViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get timetable entries
-        queryset = Timetable.objects.filter(
-            tenant=tenant,
-            class_name=class_name,
-            is_active=True
-        )
-        
-        if section:
-            queryset = queryset.filter(section=section)
-        
-        queryset = queryset.select_related('teacher', 'teacher__user', 'time_slot').order_by('time_slot__period_number')
-        
-        # Group by day
-        days_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-        timetable_by_day = defaultdict(list)
-        
-        for entry in queryset:
-            timetable_by_day[entry.day].append(entry)
+        compiled = timetable_grid.get_class_grid(tenant.id, class_name, section or None)
+        result = [
+            {
+                'day': day.capitalize(),
+                'periods': periods
+            }
+            for day, periods in timetable_grid.grid_by_day(compiled.grid)
+        ]
         
-        # Format response
-        result = []
-        for day in days_order:
-            if day in timetable_by_day:
-                serializer = TimetableSerializer(timetable_by_day[day], many=True)
-                result.append({
-                    'day': day.capitalize(),
-                    'periods': serializer.data
-                })
-        
-        return Response(result)
+        return self._grid_response(request, compiled, result)
     
     @action(detail=False, methods=['get'])
     def teacher_timetable(self, request):
@@ -118,159 +182,167 @@ class TimetableViewSet(viewsets.ModelViewSet):
                     {'error': 'Teacher profile not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+        else:
+            try:
+                teacher_id = uuid.UUID(teacher_id)
+            except ValueError:
+                return Response({'error': 'Invalid teacher_id'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get timetable entries
-        queryset = Timetable.objects.filter(
-            tenant=tenant,
-            teacher_id=teacher_id,
-            is_active=True
-        ).select_related('teacher', 'time_slot').order_by('time_slot__period_number')
-        
-        # Group by day
-        days_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-        timetable_by_day = defaultdict(list)
-        
-        for entry in queryset:
-            timetable_by_day[entry.day].append({
-                'id': str(entry.id),
-                'period_number': entry.time_slot.period_number,
-                'start_time': entry.time_slot.start_time.strftime('%H:%M'),
-                'end_time': entry.time_slot.end_time.strftime('%H:%M'),
-                'subject': entry.subject,
-                'class_name': entry.class_name,
-                'section': entry.section or '',
-                'room_number': entry.room_number or '',
-            })
-        
-        # Format response
-        result = []
-        for day in days_order:
-            if day in timetable_by_day:
-                result.append({
-                    'day': day.capitalize(),
-                    'periods': timetable_by_day[day]
-                })
+        compiled = timetable_grid.get_teacher_grid(tenant.id, teacher_id)
+        result = [
+            {
+                'day': day.capitalize(),
+                'periods': [
+                    {
+                        'id': entry['id'],
+                        'period_number': entry['time_slot_details']['period_number'],
+                        'start_time': entry['time_slot_details']['start_time'][:5],
+                        'end_time': entry['time_slot_details']['end_time'][:5],
+                        'subject': entry['subject'],
+                        'class_name': entry['class_name'],
+                        'section': entry['section'] or '',
+                        'room_number': entry['room_number'] or '',
+                    }
+                    for entry in periods
+                ]
+            }
+            for day, periods in timetable_grid.grid_by_day(compiled.grid)
+        ]
         
-        return Response(result)
+        return self._grid_response(request, compiled, result)
     
     @action(detail=False, methods=['GET'])
     def my_timetable(self, request):
         """Get timetable for current logged-in user (student or teacher)"""
-        print(f"DEBUG: my_timetable called for user: {request.user}")
         user = request.user
         tenant = request.tenant
         
-        # Check if user is a student
-        try:
-            student = Student.objects.get(user=user, tenant=tenant)
-            print(f"DEBUG: Found student: {student}")
-            # Get student's class information
-            try:
-                from students.models import AcademicRegistration
-                registration = AcademicRegistration.objects.filter(
-                    student=student,
-                    is_current=True
-                ).first()
-                print(f"DEBUG: Registration: {registration}")
-                
-                if not registration:
-                    print(f"DEBUG: No registration found")
-                    return Response(
-                        {'error': 'No active class assignment found'},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                
-                # Get class_name and section from AcademicRegistration
-                class_name = registration.class_name
-                section = registration.section or ''
-                print(f"DEBUG: class_name={class_name}, section={section}")
-                
-                # Get timetable entries directly
-                queryset = Timetable.objects.filter(
-                    tenant=tenant,
-                    class_name=class_name,
-                    section=section,
-                    is_active=True
-                ).select_related('teacher', 'teacher__user', 'time_slot').order_by('time_slot__period_number')
-                print(f"DEBUG: Found {queryset.count()} timetable entries")
-                
-                # Group by day
-                days_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-                timetable_by_day = defaultdict(list)
-                
-                for entry in queryset:
-                    serialized_entry = TimetableSerializer(entry).data
-                    timetable_by_day[entry.day].append(serialized_entry)
-                
-                # Format response
-                result = [
-                    {
-                        'day': day,
-                        'periods': timetable_by_day[day]
-                    }
-                    for day in days_order if day in timetable_by_day
-                ]
-                print(f"DEBUG: Returning {len(result)} days")
-                
-                return Response(result)
-                
-            except Exception as e:
-                import traceback
-                print(f"DEBUG: Exception in student branch: {e}")
-                traceback.print_exc()
+        student = Student.objects.filter(user=user, tenant=tenant).first()
+        if student:
+            registration = AcademicRegistration.objects.filter(
+                student=student,
+                is_current=True
+            ).first()
+            
+            if not registration:
                 return Response(
-                    {'error': f'Failed to get class information: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    {'error': 'No active class assignment found'},
+                    status=status.HTTP_404_NOT_FOUND
                 )
-        except Student.DoesNotExist:
-            print(f"DEBUG: Student does not exist")
-            pass
-        
-        # Check if user is a teacher
-        try:
-            teacher = Teacher.objects.get(user=user, tenant=tenant)
-            print(f"DEBUG: Found teacher: {teacher}")
-            
-            # Get teacher's timetable directly
-            queryset = Timetable.objects.filter(
-                tenant=tenant,
-                teacher=teacher,
-                is_active=True
-            ).select_related('time_slot').order_by('day', 'time_slot__period_number')
-            
-            # Group by day
-            days_order = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-            timetable_by_day = defaultdict(list)
-            
-            for entry in queryset:
-                serialized_entry = TimetableSerializer(entry).data
-                timetable_by_day[entry.day].append(serialized_entry)
-            
-            # Format response
-            result = [
-                {
-                    'day': day,
-                    'periods': timetable_by_day[day]
-                }
-                for day in days_order if day in timetable_by_day
-            ]
-            
-            return Response(result)
             
-        except Teacher.DoesNotExist:
-            print(f"DEBUG: Teacher does not exist")
-            pass
+            compiled = timetable_grid.get_class_grid(
+                tenant.id, registration.class_name, registration.section or ''
+            )
+        else:
+            teacher = Teacher.objects.filter(user=user, tenant=tenant).first()
+            if not teacher:
+                return Response(
+                    {'error': 'No student or teacher profile found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            compiled = timetable_grid.get_teacher_grid(tenant.id, teacher.id)
         
-        print(f"DEBUG: Neither student nor teacher found - returning 404")
+        result = [
+            {
+                'day': day,
+                'periods': periods
+            }
+            for day, periods in timetable_grid.grid_by_day(compiled.grid)
+        ]
         
-        return Response(
-            {'error': 'No student or teacher profile found'},
-            status=status.HTTP_404_NOT_FOUND
+        return self._grid_response(request, compiled, result)
+    
+    def _resolve_day(self, request):
+        """Day from ?day= or ?date= (defaults to today); returns (day, date, error response)"""
+        day = request.query_params.get('day')
+        date = request.query_params.get('date')
+        
+        if date:
+            try:
+                date = datetime.strptime(date, '%Y-%m-%d').date()
+            except ValueError:
+                return None, None, Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        elif not day:
+            date = timezone.now().date()
+        
+        if date:
+            day = date.strftime('%A').lower()
+        if day not in substitutions.DAYS_ORDER:
+            return None, None, Response({'error': f'No timetable on {day}'}, status=status.HTTP_400_BAD_REQUEST)
+        return day, date, None
+    
+    def _absent_teacher_ids(self, tenant, date):
+        if not date:
+            return set()
+        return set(TeacherAttendance.objects.filter(
+            tenant=tenant,
+            date=date,
+            status__in=substitutions.ABSENT_STATUSES
+        ).values_list('teacher_id', flat=True))
+    
+    @action(detail=False, methods=['get'])
+    def free_teachers(self, request):
+        """Teachers free in a given period, optionally ranked by subject qualification"""
+        if request.user.role not in ['super_admin', 'tenant_admin', 'teacher']:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        tenant = request.tenant
+        day, date, error = self._resolve_day(request)
+        if error:
+            return error
+        
+        try:
+            period_number = int(request.query_params.get('period'))
+        except (TypeError, ValueError):
+            return Response({'error': 'period is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= period_number <= substitutions.MAX_PERIOD:
+            return Response(
+                {'error': f'period must be between 0 and {substitutions.MAX_PERIOD}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        index = substitutions.get_index(tenant.id)
+        free = index.free_teachers(
+            day, period_number,
+            subject=request.query_params.get('subject'),
+            exclude=self._absent_teacher_ids(tenant, date)
         )
+        return Response({'day': day, 'period_number': period_number, 'teachers': free})
+    
+    @action(detail=False, methods=['get'])
+    def substitutes(self, request):
+        """Suggest substitutes for every period an absent teacher teaches on a day"""
+        if request.user.role not in ['super_admin', 'tenant_admin']:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        tenant = request.tenant
+        teacher_id = request.query_params.get('teacher_id')
+        if not teacher_id:
+            return Response({'error': 'teacher_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            teacher_id = uuid.UUID(teacher_id)
+        except ValueError:
+            return Response({'error': 'Invalid teacher_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        day, date, error = self._resolve_day(request)
+        if error:
+            return error
+        
+        index = substitutions.get_index(tenant.id)
+        if teacher_id not in index.teachers:
+            return Response({'error': 'Teacher not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'teacher_id': str(teacher_id),
+            'day': day,
+            'date': date,
+            'periods': index.suggest(teacher_id, day, exclude=self._absent_teacher_ids(tenant, date)),
+        })
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
         """Create multiple timetable entries at once"""
+        tenant = request.tenant
         entries = request.data.get('entries', [])
         
         if not entries:
@@ -279,20 +351,90 @@ class TimetableViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_entries = []
         errors = []
+        valid = []
         
-        for entry_data in entries:
+        # Field validation only - lookups and conflict checks are batched below
+        for index, entry_data in enumerate(entries):
             serializer = self.get_serializer(data=entry_data)
             if serializer.is_valid():
-                serializer.save(tenant=request.tenant)
-                created_entries.append(serializer.data)
+                valid.append((index, entry_data, serializer.validated_data))
             else:
                 errors.append({
+                    'index': index,
                     'entry': entry_data,
                     'errors': serializer.errors
                 })
         
+        teacher_ids = {data['teacher_id'] for _, _, data in valid if data.get('teacher_id')}
+        time_slot_ids = {data['time_slot_id'] for _, _, data in valid}
+        teachers = Teacher.objects.filter(tenant=tenant, id__in=teacher_ids).select_related('user').in_bulk()
+        time_slots = TimeSlot.objects.filter(tenant=tenant, id__in=time_slot_ids).in_bulk()
+        
+        indexes = {}
+        new_entries = []
+        
+        for index, entry_data, data in valid:
+            data = dict(data)
+            teacher_id = data.pop('teacher_id', None)
+            time_slot_id = data.pop('time_slot_id')
+            
+            entry_errors = {}
+            if teacher_id and teacher_id not in teachers:
+                entry_errors['teacher_id'] = ['Teacher not found']
+            if time_slot_id not in time_slots:
+                entry_errors['time_slot_id'] = ['Time slot not found']
+            
+            if not entry_errors and data.get('is_active', True):
+                academic_year = data['academic_year']
+                if academic_year not in indexes:
+                    indexes[academic_year] = ConflictIndex(tenant.id, academic_year)
+                conflict_index = indexes[academic_year]
+                
+                placement = (
+                    data['day'], time_slot_id, teacher_id, data.get('room_number'),
+                    data['class_name'], data.get('section')
+                )
+                conflicts = conflict_index.check(*placement)
+                if conflicts:
+                    entry_errors['conflicts'] = conflicts
+                else:
+                    conflict_index.add(*placement, f"batch entry {index}")
+            
+            if entry_errors:
+                errors.append({
+                    'index': index,
+                    'entry': entry_data,
+                    'errors': entry_errors
+                })
+                continue
+            
+            new_entries.append(Timetable(
+                tenant=tenant,
+                teacher=teachers.get(teacher_id),
+                time_slot=time_slots[time_slot_id],
+                **data
+            ))
+        
+        try:
+            with transaction.atomic():
+                Timetable.objects.bulk_create(new_entries)
+                # bulk_create sends no signals, so drop the affected grids here
+                timetable_grid.invalidate_entries(tenant.id, [
+                    (entry.class_name, entry.section, entry.teacher_id) for entry in new_entries
+                ])
+                substitutions.invalidate(tenant.id)
+        except IntegrityError:
+            # A concurrent request booked some of these slots after the conflict
+            # check; nothing was created, and a retry reports which entries clash
+            return Response(
+                {'error': 'Some of these periods were just booked by another request; nothing was created'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        created_entries = TimetableSerializer(new_entries, many=True).data
+        errors.sort(key=lambda error: error['index'])
+        
         return Response({
             'created': len(created_entries),
             'failed': len(errors),
@@ -300,3 +442,31 @@ class TimetableViewSet(viewsets.ModelViewSet):
             'errors': errors
         }, status=status.HTTP_201_CREATED if created_entries else status.HTTP_400_BAD_REQUEST)
 
+
+class TimetableGenerationViewSet(viewsets.ReadOnlyModelViewSet):
+    """Start automatic timetable generation jobs and poll their progress"""
+    serializer_class = TimetableGenerationJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return TimetableGenerationJob.objects.filter(tenant=self.request.tenant)
+    
+    def create(self, request):
+        if request.user.role not in ['super_admin', 'tenant_admin']:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = GenerateTimetableSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        job = TimetableGenerationJob.objects.create(
+            tenant=request.tenant,
+            academic_year=serializer.validated_data['academic_year'],
+            params=serializer.to_job_params(),
+            created_by=request.user
+        )
+        start_job(job)
+        
+        return Response(
+            TimetableGenerationJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED
+        )
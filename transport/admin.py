@@ -25,6 +25,14 @@ class TransportAssignmentAdmin(admin.ModelAdmin):
     search_fields = ['pickup_point']
     readonly_fields = ['id', 'created_at', 'updated_at']
     
+    # Saving here would bypass claim_seat/release_seat; use the API, which keeps
+    # the occupancy counters right. Deleting is fine (see signals.py).
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
     def user(self, obj):
         return str(obj.user)
     user.short_description = 'User'
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from transport.occupancy import recount
+
+
+class Command(BaseCommand):
+    help = 'Recompute vehicle and route occupancy counters from active assignments'
+
+    def handle(self, *args, **options):
+        recount()
+        self.stdout.write(self.style.SUCCESS('Transport occupancy recounted'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:41
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_occupancy(apps, schema_editor):
+    Vehicle = apps.get_model('transport', 'Vehicle')
+    Route = apps.get_model('transport', 'Route')
+    TransportAssignment = apps.get_model('transport', 'TransportAssignment')
+    active = TransportAssignment.objects.filter(is_active=True).order_by()
+
+    for model, field in ((Vehicle, 'vehicle_id'), (Route, 'route_id')):
+        for row in active.values(field).annotate(total=Count('id')):
+            model.objects.filter(id=row[field]).update(occupancy=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0003_vehicle_route'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='occupancy',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='occupancy',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
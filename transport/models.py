@@ -2,6 +2,7 @@ import uuid
 from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 
 
 class Vehicle(models.Model):
@@ -29,6 +30,8 @@ class Vehicle(models.Model):
     driver_license = models.CharField(max_length=50, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     monthly_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Active assignments, maintained by transport.occupancy
+    occupancy = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -44,7 +47,7 @@ class Vehicle(models.Model):
     
     @property
     def students_assigned(self):
-        return self.transport_assignments.filter(is_active=True).count()
+        return self.occupancy
 
 
 class Route(models.Model):
@@ -58,6 +61,8 @@ class Route(models.Model):
     drop_time = models.TimeField(blank=True, null=True)
     distance_km = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Active assignments, maintained by transport.occupancy
+    occupancy = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, blank=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -69,6 +74,23 @@ class Route(models.Model):
         return f"{self.route_number} - {self.route_name}" if self.route_number else self.route_name
 
 
+class TransportAssignmentQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Load vehicle and route with a join and resolve the generic user in
+        one query per assignee type (students and teachers with their users)
+        """
+        from students.models import Student
+        from teachers.models import Teacher
+        
+        return self.select_related('vehicle', 'route').prefetch_related(
+            GenericPrefetch('user', [
+                Student.objects.select_related('user'),
+                Teacher.objects.select_related('user'),
+            ])
+        )
+
+
 class TransportAssignment(models.Model):
     """Assign students/teachers to transport"""
     STATUS_CHOICES = [
@@ -95,6 +117,8 @@ class TransportAssignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TransportAssignmentQuerySet.as_manager()
+    
     class Meta:
         db_table = 'transport_assignments'
         ordering = ['-created_at']
@@ -0,0 +1,87 @@
+"""
+Seat occupancy for vehicles and routes.
+
+Vehicle.occupancy and Route.occupancy count active transport assignments and
+are only changed with F() updates. A seat is claimed with a conditional
+UPDATE on occupancy < capacity, so concurrent assignments can never push a
+vehicle over capacity. Deleting an assignment, directly or through the
+cascade of its route or vehicle, releases its seat in signals.py.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Route, TransportAssignment, Vehicle
+
+
+class CapacityError(Exception):
+    pass
+
+
+def claim_seat(vehicle_id, route_id):
+    """Take a seat on a vehicle, raising CapacityError if it is full"""
+    claimed = Vehicle.objects.filter(id=vehicle_id, occupancy__lt=F('capacity')).update(
+        occupancy=F('occupancy') + 1
+    )
+    if not claimed:
+        raise CapacityError('Vehicle is at full capacity')
+    Route.objects.filter(id=route_id).update(occupancy=F('occupancy') + 1)
+
+
+def release_seat(vehicle_id, route_id):
+    Vehicle.objects.filter(id=vehicle_id, occupancy__gt=0).update(occupancy=F('occupancy') - 1)
+    Route.objects.filter(id=route_id, occupancy__gt=0).update(occupancy=F('occupancy') - 1)
+
+
+def _active_count(field):
+    return Coalesce(
+        Subquery(
+            TransportAssignment.objects.filter(**{field: OuterRef('pk')}, is_active=True)
+            .order_by()
+            .values(field)
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def recount(tenant=None):
+    """Recompute all counters from the assignments, e.g. after bulk edits"""
+    vehicles = Vehicle.objects.all()
+    routes = Route.objects.all()
+    if tenant is not None:
+        vehicles = vehicles.filter(tenant=tenant)
+        routes = routes.filter(tenant=tenant)
+    vehicles.update(occupancy=_active_count('vehicle'))
+    routes.update(occupancy=_active_count('route'))
+
+
+def fleet_occupancy(tenant):
+    """Every vehicle's load, read from the counters in a single query"""
+    vehicles = list(
+        Vehicle.objects.filter(tenant=tenant).order_by('vehicle_number').values(
+            'id', 'vehicle_number', 'vehicle_type', 'status', 'capacity', 'occupancy',
+            'route_id', 'route__route_name'
+        )
+    )
+
+    total_capacity = 0
+    total_occupied = 0
+    for vehicle in vehicles:
+        capacity = vehicle['capacity']
+        occupied = vehicle['occupancy']
+        total_capacity += capacity
+        total_occupied += occupied
+        vehicle['route_name'] = vehicle.pop('route__route_name')
+        vehicle['available_seats'] = max(capacity - occupied, 0)
+        vehicle['load_percent'] = round(occupied * 100 / capacity, 1) if capacity else 0
+        vehicle['is_full'] = occupied >= capacity
+
+    return {
+        'vehicles': vehicles,
+        'total_capacity': total_capacity,
+        'total_occupied': total_occupied,
+        'load_percent': round(total_occupied * 100 / total_capacity, 1) if total_capacity else 0,
+        'full_vehicles': sum(1 for vehicle in vehicles if vehicle['is_full']),
+    }
@@ -0,0 +1,313 @@
+"""
+Route planning for transport stops.
+
+Stops carry coordinates inside Route.stops ({"name", "lat", "lng"}) and the
+number of riders at each stop comes from the active assignments'
+pickup_point. A morning pickup run is an open path that may start anywhere
+and must end at the school, so the planner:
+
+1. builds a haversine distance matrix (vectorized with NumPy when it is
+   installed, plain Python otherwise),
+2. builds one path through every stop with nearest neighbour, working
+   backwards from the school, and improves it with 2-opt and Or-opt,
+3. cuts that path into consecutive runs that fit each vehicle's capacity
+   (a stop with more riders than a vehicle holds is shared between
+   vehicles) and re-optimizes every run on its own,
+4. estimates arrival times from an average speed and a dwell per stop.
+
+No external map service is used; distances are great-circle distances.
+"""
+import math
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db.models import Count
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+from .models import TransportAssignment
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+DEFAULT_SPEED_KMH = 25
+
+DEFAULT_DWELL_MINUTES = 1
+
+DEFAULT_DEPARTURE = dt_time(7, 0)
+
+# Longest segment Or-opt tries to move
+OR_OPT_MAX_SEGMENT = 3
+
+
+class PlanningError(Exception):
+    pass
+
+
+# Distance matrix
+
+def haversine_matrix(points):
+    """Pairwise great-circle distances in km for a list of (lat, lng)"""
+    if np is not None:
+        coords = np.radians(np.asarray(points, dtype=float))
+        lat = coords[:, 0][:, None]
+        lng = coords[:, 1][:, None]
+        a = (
+            np.sin((lat - lat.T) / 2) ** 2
+            + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+        )
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))).tolist()
+
+    radians = [(math.radians(lat), math.radians(lng)) for lat, lng in points]
+    n = len(radians)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat1, lng1 = radians[i]
+        cos1 = math.cos(lat1)
+        for j in range(i + 1, n):
+            lat2, lng2 = radians[j]
+            a = math.sin((lat2 - lat1) / 2) ** 2 + cos1 * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+            matrix[i][j] = matrix[j][i] = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+    return matrix
+
+
+# Open-path heuristics. A path is a list of node indexes whose last element
+# (the school) is fixed; the first stop is free.
+
+def path_length(path, d):
+    return sum(d[path[i]][path[i + 1]] for i in range(len(path) - 1))
+
+
+def nearest_neighbour_path(nodes, end, d):
+    """Grow the path backwards from the school, always to the nearest stop"""
+    remaining = set(nodes)
+    reversed_path = [end]
+    while remaining:
+        last = reversed_path[-1]
+        nearest = min(remaining, key=lambda node: d[last][node])
+        remaining.remove(nearest)
+        reversed_path.append(nearest)
+    return reversed_path[::-1]
+
+
+def two_opt(path, d, deadline):
+    """Reverse segments while that shortens the path; returns True if it changed"""
+    n = len(path)
+    changed = False
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(n - 2):
+            a_prev = path[i - 1] if i > 0 else None
+            a = path[i]
+            for j in range(i + 1, n - 1):
+                b = path[j]
+                b_next = path[j + 1]
+                before = d[b][b_next]
+                after = d[a][b_next]
+                if a_prev is not None:
+                    before += d[a_prev][a]
+                    after += d[a_prev][b]
+                if after < before - 1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    a = path[i]
+                    improved = changed = True
+    return changed
+
+
+def or_opt(path, d, deadline):
+    """Move short segments (optionally reversed) to a cheaper position"""
+    changed = False
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            i = 0
+            while i + length < len(path):
+                segment = path[i:i + length]
+                first, last = segment[0], segment[-1]
+                after_node = path[i + length]
+                if i > 0:
+                    before_node = path[i - 1]
+                    removal_gain = d[before_node][first] + d[last][after_node] - d[before_node][after_node]
+                else:
+                    removal_gain = d[last][after_node]
+
+                rest = path[:i] + path[i + length:]
+                best = None
+                # Insert at the start of the path
+                for cost, reverse in ((d[last][rest[0]], False), (d[first][rest[0]], True)):
+                    if cost < removal_gain - 1e-9 and (best is None or cost < best[0]):
+                        best = (cost, 0, reverse)
+                # Insert between two consecutive nodes
+                for k in range(len(rest) - 1):
+                    p, q = rest[k], rest[k + 1]
+                    base = d[p][q]
+                    forward = d[p][first] + d[last][q] - base
+                    backward = d[p][last] + d[first][q] - base
+                    cost, reverse = (forward, False) if forward <= backward else (backward, True)
+                    if cost < removal_gain - 1e-9 and (best is None or cost < best[0]):
+                        best = (cost, k + 1, reverse)
+
+                if best is not None:
+                    _, position, reverse = best
+                    path[:] = rest[:position] + (segment[::-1] if reverse else segment) + rest[position:]
+                    improved = changed = True
+                else:
+                    i += 1
+    return changed
+
+
+def optimize_path(nodes, end, d, deadline):
+    path = nearest_neighbour_path(nodes, end, d)
+    while time.monotonic() < deadline:
+        improved = two_opt(path, d, deadline)
+        improved = or_opt(path, d, deadline) or improved
+        if not improved:
+            break
+    return path
+
+
+def split_by_capacity(path, riders, capacities):
+    """
+    Cut a path (without the school) into consecutive runs, one per vehicle
+    capacity, in order. A stop with more riders than a whole vehicle holds is
+    shared: that vehicle fills up there and the next one picks up the rest.
+    Returns (runs, leftover) as lists of (stop, riders picked up) pairs.
+    """
+    runs = []
+    position = 0
+    waiting = riders[path[0]] if path else 0
+    for capacity in capacities:
+        run = []
+        load = 0
+        while position < len(path):
+            if load + waiting <= capacity:
+                run.append((path[position], waiting))
+                load += waiting
+                position += 1
+                waiting = riders[path[position]] if position < len(path) else 0
+            else:
+                if load == 0 and capacity > 0:
+                    run.append((path[position], capacity))
+                    waiting -= capacity
+                break
+        runs.append(run)
+    if position == len(path):
+        return runs, []
+    return runs, [(path[position], waiting)] + [(node, riders[node]) for node in path[position + 1:]]
+
+
+# Django glue
+
+def _normalize_stop(stop):
+    if isinstance(stop, dict):
+        name = stop.get('name') or stop.get('stop') or ''
+        lat = stop.get('lat', stop.get('latitude'))
+        lng = stop.get('lng', stop.get('longitude'))
+    else:
+        name, lat, lng = str(stop), None, None
+    if lat is None or lng is None:
+        return name, None
+    try:
+        return name, (float(lat), float(lng))
+    except (TypeError, ValueError):
+        return name, None
+
+
+def plan_route(route, vehicles, stops=None, school=None, departure_time=None,
+               speed_kmh=DEFAULT_SPEED_KMH, dwell_minutes=DEFAULT_DWELL_MINUTES, time_limit=5):
+    """
+    Plan pickup runs for a route. stops defaults to route.stops; school
+    defaults to the last stop. Vehicles are filled largest first.
+    """
+    deadline = time.monotonic() + time_limit
+    raw_stops = list(stops if stops is not None else route.stops or [])
+    if school is None:
+        if len(raw_stops) < 2:
+            raise PlanningError('A route needs at least one stop and the school')
+        school = raw_stops.pop()
+
+    names = []
+    points = []
+    missing = []
+    for stop in [school] + raw_stops:
+        name, point = _normalize_stop(stop)
+        if point is None:
+            missing.append(name)
+        names.append(name)
+        points.append(point)
+    if missing:
+        raise PlanningError(f"Stops without lat/lng coordinates: {', '.join(missing)}")
+
+    # Riders per stop from active assignments, matched on pickup point name
+    index_by_name = {name.strip().lower(): i for i, name in enumerate(names) if i > 0}
+    riders = [0] * len(names)
+    unmatched = []
+    pickups = TransportAssignment.objects.filter(route=route, is_active=True).values(
+        'pickup_point'
+    ).annotate(total=Count('id')).order_by()
+    for row in pickups:
+        index = index_by_name.get((row['pickup_point'] or '').strip().lower())
+        if index is None:
+            unmatched.append({'pickup_point': row['pickup_point'], 'riders': row['total']})
+        else:
+            riders[index] += row['total']
+
+    d = haversine_matrix(points)
+    stop_nodes = list(range(1, len(names)))
+    full_path = optimize_path(stop_nodes, 0, d, deadline)[:-1]
+
+    vehicles = sorted(vehicles, key=lambda vehicle: -vehicle.capacity)
+    if not vehicles:
+        runs, leftover = [], [(node, riders[node]) for node in full_path]
+    elif len(vehicles) == 1 and sum(riders) <= vehicles[0].capacity:
+        runs, leftover = [[(node, riders[node]) for node in full_path]], []
+    else:
+        runs, leftover = split_by_capacity(full_path, riders, [vehicle.capacity for vehicle in vehicles])
+
+    departure = departure_time or route.pickup_time or DEFAULT_DEPARTURE
+    plans = []
+    for vehicle, run in zip(vehicles, runs):
+        if not run:
+            continue
+        picked_up = dict(run)
+        nodes = list(picked_up)
+        path = optimize_path(nodes, 0, d, deadline) if len(runs) > 1 else nodes + [0]
+        clock = datetime.combine(datetime.today(), departure)
+        ordered = []
+        for position, node in enumerate(path):
+            if position > 0:
+                clock += timedelta(minutes=d[path[position - 1]][node] / speed_kmh * 60 + dwell_minutes)
+            lat, lng = points[node]
+            ordered.append({
+                'name': names[node],
+                'lat': lat,
+                'lng': lng,
+                'riders': picked_up.get(node, 0),
+                'arrival': clock.strftime('%H:%M'),
+            })
+        distance = path_length(path, d)
+        plans.append({
+            'vehicle_id': str(vehicle.id),
+            'vehicle_number': vehicle.vehicle_number,
+            'capacity': vehicle.capacity,
+            'riders': sum(picked_up.values()),
+            'stops': ordered,
+            'distance_km': round(distance, 2),
+            'duration_minutes': round(distance / speed_kmh * 60 + dwell_minutes * (len(path) - 1), 1),
+        })
+
+    return {
+        'route_id': str(route.id),
+        'vehicles': plans,
+        'total_distance_km': round(sum(plan['distance_km'] for plan in plans), 2),
+        'total_riders': sum(riders),
+        'unassigned_stops': [
+            {'name': names[node], 'riders': count} for node, count in leftover
+        ],
+        'unmatched_pickups': unmatched,
+    }
@@ -1,10 +1,23 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from .models import Vehicle, Route, TransportAssignment
+from .occupancy import CapacityError, claim_seat
 from students.models import Student
 from teachers.models import Teacher
 
 
+ASSIGNEE_MODELS = {
+    'student': Student,
+    'teacher': Teacher,
+}
+
+
+def assignee_content_type(user_type):
+    # Served from ContentType's process-wide cache after the first lookup
+    return ContentType.objects.get_for_model(ASSIGNEE_MODELS[user_type])
+
+
 class RouteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Route
@@ -126,10 +139,10 @@ class TransportAssignmentSerializer(serializers.ModelSerializer):
         return str(obj.object_id)
     
     def get_class_section(self, obj):
-        if isinstance(obj.user, Student) and hasattr(obj.user, 'current_class'):
-            class_obj = obj.user.current_class
-            if class_obj:
-                return f"{class_obj.name}-{class_obj.section}"
+        if isinstance(obj.user, Student):
+            if obj.user.section:
+                return f"{obj.user.class_name}-{obj.user.section}"
+            return obj.user.class_name
         return None
     
     def get_vehicle_details(self, obj):
@@ -184,12 +197,12 @@ class CreateTransportAssignmentSerializer(serializers.Serializer):
         
         if user_type == 'student':
             try:
-                user = Student.objects.get(id=user_id)
+                user = Student.objects.select_related('user').get(id=user_id)
             except Student.DoesNotExist:
                 raise serializers.ValidationError("Student not found")
         elif user_type == 'teacher':
             try:
-                user = Teacher.objects.get(id=user_id)
+                user = Teacher.objects.select_related('user').get(id=user_id)
             except Teacher.DoesNotExist:
                 raise serializers.ValidationError("Teacher not found")
         else:
@@ -207,31 +220,45 @@ class CreateTransportAssignmentSerializer(serializers.Serializer):
         vehicle = validated_data['vehicle']
         route = validated_data['route']
         user = validated_data['user']
-        user_type = validated_data['user_type_obj']
-        
-        # Get content type
-        if user_type == 'student':
-            content_type = ContentType.objects.get_for_model(Student)
-        else:
-            content_type = ContentType.objects.get_for_model(Teacher)
         
-        # Create assignment
-        assignment = TransportAssignment.objects.create(
-            tenant=tenant,
-            vehicle=vehicle,
-            route=route,
-            content_type=content_type,
-            object_id=user.id,
-            pickup_point=validated_data['pickup_point'],
-            monthly_fee=validated_data['monthly_fee'],
-            effective_from=validated_data['effective_from'],
-            status=validated_data.get('status', 'active'),
-            is_active=True
-        )
+        # Create assignment; setting the generic user keeps it cached for the response
+        with transaction.atomic():
+            try:
+                claim_seat(vehicle.id, route.id)
+            except CapacityError as e:
+                raise serializers.ValidationError(str(e))
+            assignment = TransportAssignment.objects.create(
+                tenant=tenant,
+                vehicle=vehicle,
+                route=route,
+                user=user,
+                pickup_point=validated_data['pickup_point'],
+                monthly_fee=validated_data['monthly_fee'],
+                effective_from=validated_data['effective_from'],
+                status=validated_data.get('status', 'active'),
+                is_active=True
+            )
         
         return assignment
 
 
+class RoutePlanSerializer(serializers.Serializer):
+    stops = serializers.ListField(
+        child=serializers.JSONField(),
+        required=False,
+        help_text='Stops as {"name", "lat", "lng"}; defaults to the route\'s stops'
+    )
+    school = serializers.JSONField(
+        required=False,
+        help_text='{"name", "lat", "lng"} of the school; defaults to the last stop'
+    )
+    vehicle_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    departure_time = serializers.TimeField(required=False)
+    average_speed_kmh = serializers.FloatField(min_value=1, max_value=120, default=25)
+    dwell_minutes = serializers.FloatField(min_value=0, max_value=30, default=1)
+    apply = serializers.BooleanField(default=False)
+
+
 class VehicleStatsSerializer(serializers.Serializer):
     total_vehicles = serializers.IntegerField()
     active_vehicles = serializers.IntegerField()
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import TransportAssignment
+from .occupancy import release_seat
+
+
+@receiver(post_delete, sender=TransportAssignment)
+def release_deleted_seat(sender, instance, **kwargs):
+    # Also runs for the cascade of a route, vehicle or tenant delete and for the admin
+    if instance.is_active:
+        release_seat(instance.vehicle_id, instance.route_id)
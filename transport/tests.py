@@ -1,3 +1,221 @@
-from django.test import TestCase
+import datetime
+import uuid
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from school_classes.models import SchoolClass
+from students.models import AcademicRegistration, Student
+from tenants.models import Tenant
+from .models import Route, TransportAssignment, Vehicle
+from .planner import PlanningError, haversine_matrix, optimize_path, plan_route, split_by_capacity
+
+
+class SplitByCapacityTests(SimpleTestCase):
+    def test_fills_vehicles_in_path_order(self):
+        riders = [0, 3, 4, 2, 5]
+
+        runs, leftover = split_by_capacity([1, 2, 3, 4], riders, [8, 8])
+
+        self.assertEqual(runs, [[(1, 3), (2, 4)], [(3, 2), (4, 5)]])
+        self.assertEqual(leftover, [])
+
+    def test_oversized_stop_is_shared_without_blocking_later_stops(self):
+        riders = [0, 50, 5]
+
+        runs, leftover = split_by_capacity([1, 2], riders, [40, 40])
+
+        self.assertEqual(runs, [[(1, 40)], [(1, 10), (2, 5)]])
+        self.assertEqual(leftover, [])
+
+    def test_riders_that_do_not_fit_are_left_over(self):
+        riders = [0, 15, 3]
+
+        runs, leftover = split_by_capacity([1, 2], riders, [10])
+
+        self.assertEqual(runs, [[(1, 10)]])
+        self.assertEqual(leftover, [(1, 5), (2, 3)])
+
+
+class OptimizePathTests(SimpleTestCase):
+    def test_stops_on_a_line_are_visited_in_order(self):
+        # The school at index 0, stops every ~1 km north of it, shuffled
+        points = [(12.0, 77.0)] + [(12.0 + 0.009 * k, 77.0) for k in (3, 1, 4, 2)]
+        d = haversine_matrix(points)
+
+        path = optimize_path([1, 2, 3, 4], 0, d, deadline=float('inf'))
+
+        self.assertEqual(path, [3, 1, 4, 2, 0])
+
+
+class PlanRouteTests(TestCase):
+    SCHOOL = {'name': 'School', 'lat': 12.0, 'lng': 77.0}
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Transport School', email='transport@school.test', school_code='TRN001')
+        self.route = Route.objects.create(
+            tenant=self.tenant, route_name='North', pickup_time=datetime.time(7, 0),
+            stops=[
+                {'name': 'Far', 'lat': 12.03, 'lng': 77.0},
+                {'name': 'Near', 'lat': 12.01, 'lng': 77.0},
+                self.SCHOOL,
+            ]
+        )
+
+    def add_vehicle(self, number, capacity):
+        return Vehicle.objects.create(
+            tenant=self.tenant, vehicle_number=number, capacity=capacity,
+            driver_name='Driver', driver_phone='555', route=self.route
+        )
+
+    def add_riders(self, pickup_point, count):
+        vehicle = Vehicle.objects.filter(tenant=self.tenant).first() or self.add_vehicle('SPARE', 0)
+        TransportAssignment.objects.bulk_create([
+            TransportAssignment(
+                tenant=self.tenant, vehicle=vehicle, route=self.route,
+                content_type=ContentType.objects.get_for_model(Student), object_id=uuid.uuid4(),
+                pickup_point=pickup_point, monthly_fee=100, effective_from=datetime.date(2026, 6, 1)
+            )
+            for _ in range(count)
+        ])
+
+    def test_single_vehicle_run_ends_at_school(self):
+        vehicle = self.add_vehicle('BUS-1', 40)
+        self.add_riders('Far', 3)
+        self.add_riders('near ', 2)
+
+        plan = plan_route(self.route, [vehicle])
+
+        [run] = plan['vehicles']
+        self.assertEqual([(stop['name'], stop['riders']) for stop in run['stops']], [
+            ('Far', 3), ('Near', 2), ('School', 0)
+        ])
+        arrivals = [stop['arrival'] for stop in run['stops']]
+        self.assertEqual(arrivals[0], '07:00')
+        self.assertEqual(arrivals, sorted(arrivals))
+        self.assertEqual((plan['total_riders'], plan['unassigned_stops']), (5, []))
+
+    def test_stop_larger_than_a_vehicle_is_split_across_vehicles(self):
+        vans = [self.add_vehicle('VAN-1', 4), self.add_vehicle('VAN-2', 4)]
+        self.add_riders('Far', 6)
+        self.add_riders('Near', 1)
+
+        plan = plan_route(self.route, vans)
+
+        self.assertEqual(
+            [[(stop['name'], stop['riders']) for stop in run['stops']] for run in plan['vehicles']],
+            [[('Far', 4), ('School', 0)], [('Far', 2), ('Near', 1), ('School', 0)]]
+        )
+        self.assertEqual(plan['unassigned_stops'], [])
+
+    def test_riders_beyond_the_fleet_are_reported(self):
+        van = self.add_vehicle('VAN-1', 4)
+        self.add_riders('Far', 6)
+        self.add_riders('Near', 1)
+        self.add_riders('Elsewhere', 2)
+
+        plan = plan_route(self.route, [van])
+
+        self.assertEqual(plan['unassigned_stops'], [{'name': 'Far', 'riders': 2}, {'name': 'Near', 'riders': 1}])
+        self.assertEqual(plan['unmatched_pickups'], [{'pickup_point': 'Elsewhere', 'riders': 2}])
+
+    def test_stops_need_coordinates(self):
+        with self.assertRaisesMessage(PlanningError, 'Stops without lat/lng coordinates: Gate'):
+            plan_route(self.route, [], stops=[{'name': 'Gate'}], school=self.SCHOOL)
+
+
+class AvailableUsersTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Transport School', email='transport@school.test', school_code='TRN001')
+        admin = User.objects.create_user(
+            email='admin@transport.test', first_name='Transport', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        self.client.force_authenticate(admin)
+        school_class = SchoolClass.objects.create(
+            tenant=self.tenant, grade='8', section='B', class_name='Grade 8', academic_year='2026-2027'
+        )
+        user = User.objects.create_user(
+            email='rider@transport.test', first_name='Rider', last_name='Student', role='student', tenant=self.tenant
+        )
+        # The class columns on the student are stale; school_class is authoritative
+        self.student = Student.objects.create(
+            tenant=self.tenant, user=user, admission_number='TRN-1', date_of_birth=datetime.date(2012, 1, 1),
+            gender='female', school_class=school_class, class_name='Grade 7', section='A',
+            admission_date=datetime.date(2020, 6, 1), academic_year='2026-2027'
+        )
+
+    def class_section(self):
+        response = self.client.get('/api/transport/assignments/available_users/')
+        self.assertEqual(response.status_code, 200)
+        [item] = response.data
+        return item['class_section']
+
+    def test_class_section_from_school_class(self):
+        self.assertEqual(self.class_section(), 'Grade 8-B')
+
+    def test_current_registration_comes_first(self):
+        AcademicRegistration.objects.create(
+            tenant=self.tenant, student=self.student, academic_year='2026-2027', class_name='Grade 9', section='C'
+        )
+
+        self.assertEqual(self.class_section(), 'Grade 9-C')
+
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Transport School', email='transport@school.test', school_code='TRN001')
+        admin = User.objects.create_user(
+            email='admin@transport.test', first_name='Transport', last_name='Admin', role='tenant_admin', tenant=self.tenant
+        )
+        self.client = APIClient(headers={'X-Tenant-ID': str(self.tenant.id)})
+        self.client.force_authenticate(admin)
+        self.old_route = Route.objects.create(tenant=self.tenant, route_name='Old')
+        self.new_route = Route.objects.create(tenant=self.tenant, route_name='New')
+        self.vehicle = Vehicle.objects.create(
+            tenant=self.tenant, vehicle_number='VAN-1', capacity=1, driver_name='Driver', driver_phone='555'
+        )
+
+    def make_student(self, number):
+        user = User.objects.create_user(
+            email=f'rider{number}@transport.test', first_name='Rider', last_name=str(number),
+            role='student', tenant=self.tenant
+        )
+        return Student.objects.create(
+            tenant=self.tenant, user=user, admission_number=f'TRN-{number}', date_of_birth=datetime.date(2012, 1, 1),
+            gender='female', class_name='Grade 8', section='A', admission_date=datetime.date(2020, 6, 1),
+            academic_year='2026-2027'
+        )
+
+    def assign(self, student, route):
+        return self.client.post('/api/transport/assignments/', {
+            'vehicle_id': str(self.vehicle.id), 'route_id': str(route.id), 'user_type': 'student',
+            'user_id': str(student.id), 'pickup_point': 'Gate', 'monthly_fee': '100.00',
+            'effective_from': '2026-06-01',
+        }, format='json')
+
+    def test_full_vehicle_rejects_riders(self):
+        self.assertEqual(self.assign(self.make_student(1), self.old_route).status_code, 201)
+
+        self.assertEqual(self.assign(self.make_student(2), self.new_route).status_code, 400)
+
+    def test_deleting_a_route_frees_its_seats(self):
+        self.assign(self.make_student(1), self.old_route)
+
+        response = self.client.delete(f'/api/transport/routes/{self.old_route.id}/')
+
+        self.assertEqual(response.status_code, 204)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.occupancy, 0)
+        self.assertEqual(self.assign(self.make_student(2), self.new_route).status_code, 201)
+
+    def test_deleting_an_assignment_releases_one_seat(self):
+        response = self.assign(self.make_student(1), self.old_route)
+
+        self.assertEqual(self.client.delete(f"/api/transport/assignments/{response.data['id']}/").status_code, 204)
+
+        self.vehicle.refresh_from_db()
+        self.old_route.refresh_from_db()
+        self.assertEqual((self.vehicle.occupancy, self.old_route.occupancy), (0, 0))
@@ -2,16 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.utils import timezone
 
 from .models import Vehicle, Route, TransportAssignment
+from .occupancy import CapacityError, claim_seat, fleet_occupancy, release_seat
+from .planner import PlanningError, plan_route
 from .serializers import (
     VehicleSerializer, RouteSerializer, TransportAssignmentSerializer,
-    CreateTransportAssignmentSerializer, VehicleStatsSerializer
+    CreateTransportAssignmentSerializer, VehicleStatsSerializer,
+    RoutePlanSerializer, assignee_content_type
 )
-from students.models import Student
+from students.models import AcademicRegistration, Student
 from teachers.models import Teacher
+from school_management.instrumentation import query_budget
+from school_management.routers import replica_reads
 
 
 class VehicleViewSet(viewsets.ModelViewSet):
@@ -20,7 +27,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         tenant = self.request.tenant
-        queryset = Vehicle.objects.filter(tenant=tenant)
+        queryset = Vehicle.objects.filter(tenant=tenant).select_related('route')
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
@@ -50,6 +57,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(tenant=self.request.tenant)
     
+    @replica_reads
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get transport statistics"""
@@ -61,7 +69,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
         total_students = TransportAssignment.objects.filter(
             tenant=tenant,
             is_active=True,
-            content_type=ContentType.objects.get_for_model(Student)
+            content_type=assignee_content_type('student')
         ).count()
         total_routes = Route.objects.filter(tenant=tenant, is_active=True).count()
         
@@ -76,6 +84,12 @@ class VehicleViewSet(viewsets.ModelViewSet):
         serializer = VehicleStatsSerializer(data)
         return Response(serializer.data)
     
+    @query_budget(4)
+    @action(detail=False, methods=['get'])
+    def occupancy(self, request):
+        """Seat occupancy of the whole fleet"""
+        return Response(fleet_occupancy(request.tenant))
+    
     @action(detail=True, methods=['get'])
     def assignments(self, request, pk=None):
         """Get all assignments for a vehicle"""
@@ -83,7 +97,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
         assignments = TransportAssignment.objects.filter(
             vehicle=vehicle,
             is_active=True
-        )
+        ).with_details()
         serializer = TransportAssignmentSerializer(assignments, many=True)
         return Response(serializer.data)
 
@@ -98,6 +112,49 @@ class RouteViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(tenant=self.request.tenant)
+    
+    @action(detail=True, methods=['post'])
+    def plan(self, request, pk=None):
+        """Optimize stop order and split riders across vehicles"""
+        if request.user.role not in ['super_admin', 'tenant_admin']:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        route = self.get_object()
+        serializer = RoutePlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        vehicles = Vehicle.objects.filter(tenant=request.tenant, status='active')
+        if data.get('vehicle_ids'):
+            vehicles = vehicles.filter(id__in=data['vehicle_ids'])
+        else:
+            vehicles = vehicles.filter(route=route)
+        
+        try:
+            plan = plan_route(
+                route,
+                list(vehicles),
+                stops=data.get('stops'),
+                school=data.get('school'),
+                departure_time=data.get('departure_time'),
+                speed_kmh=data['average_speed_kmh'],
+                dwell_minutes=data['dwell_minutes'],
+            )
+        except PlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if data['apply']:
+            if len(plan['vehicles']) != 1 or plan['unassigned_stops']:
+                return Response(
+                    {'error': 'Only a plan served by a single vehicle can be applied to the route', 'plan': plan},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            route.stops = plan['vehicles'][0]['stops']
+            route.distance_km = plan['vehicles'][0]['distance_km']
+            route.save(update_fields=['stops', 'distance_km', 'updated_at'])
+            plan['applied'] = True
+        
+        return Response(plan)
 
 
 class TransportAssignmentViewSet(viewsets.ModelViewSet):
@@ -110,7 +167,7 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         tenant = self.request.tenant
-        queryset = TransportAssignment.objects.filter(tenant=tenant)
+        queryset = TransportAssignment.objects.filter(tenant=tenant).with_details()
         
         # Filter by vehicle
         vehicle_id = self.request.query_params.get('vehicle_id')
@@ -124,10 +181,8 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
         
         # Filter by user type
         user_type = self.request.query_params.get('user_type')
-        if user_type == 'student':
-            queryset = queryset.filter(content_type=ContentType.objects.get_for_model(Student))
-        elif user_type == 'teacher':
-            queryset = queryset.filter(content_type=ContentType.objects.get_for_model(Teacher))
+        if user_type in ('student', 'teacher'):
+            queryset = queryset.filter(content_type=assignee_content_type(user_type))
         
         return queryset
     
@@ -140,14 +195,46 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
         response_serializer = TransportAssignmentSerializer(assignment)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     
+    def perform_update(self, serializer):
+        previous = serializer.instance
+        before = (previous.vehicle_id, previous.route_id, previous.is_active)
+        
+        with transaction.atomic():
+            assignment = serializer.save()
+            after = (assignment.vehicle_id, assignment.route_id, assignment.is_active)
+            if before != after:
+                if before[2]:
+                    release_seat(before[0], before[1])
+                if after[2]:
+                    try:
+                        claim_seat(after[0], after[1])
+                    except CapacityError as e:
+                        raise ValidationError({'vehicle': [str(e)]})
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # The post_delete signal gives the seat back; the lock makes sure only
+            # one of two concurrent deletes still finds the row and releases it
+            assignment = TransportAssignment.objects.select_for_update().filter(id=instance.id).first()
+            if assignment is not None:
+                assignment.delete()
+    
     @action(detail=True, methods=['post'])
     def deactivate(self, request, pk=None):
         """Deactivate/remove an assignment"""
         assignment = self.get_object()
+        
+        with transaction.atomic():
+            deactivated = TransportAssignment.objects.filter(id=assignment.id, is_active=True).update(
+                is_active=False,
+                status='inactive',
+                updated_at=timezone.now()
+            )
+            if deactivated:
+                release_seat(assignment.vehicle_id, assignment.route_id)
+        
         assignment.is_active = False
         assignment.status = 'inactive'
-        assignment.save()
-        
         serializer = self.get_serializer(assignment)
         return Response(serializer.data)
     
@@ -160,13 +247,13 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
         # Check if user is student
         try:
             student = Student.objects.get(user=user, tenant=tenant)
-            content_type = ContentType.objects.get_for_model(Student)
+            content_type = assignee_content_type('student')
             user_id = student.id
         except Student.DoesNotExist:
             # Check if user is teacher
             try:
                 teacher = Teacher.objects.get(user=user, tenant=tenant)
-                content_type = ContentType.objects.get_for_model(Teacher)
+                content_type = assignee_content_type('teacher')
                 user_id = teacher.id
             except Teacher.DoesNotExist:
                 return Response(
@@ -176,7 +263,7 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
         
         # Get active assignment
         try:
-            assignment = TransportAssignment.objects.get(
+            assignment = TransportAssignment.objects.with_details().get(
                 tenant=tenant,
                 content_type=content_type,
                 object_id=user_id,
@@ -192,7 +279,7 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
             )
         except TransportAssignment.MultipleObjectsReturned:
             # Return the most recent one
-            assignment = TransportAssignment.objects.filter(
+            assignment = TransportAssignment.objects.with_details().filter(
                 tenant=tenant,
                 content_type=content_type,
                 object_id=user_id,
@@ -202,63 +289,82 @@ class TransportAssignmentViewSet(viewsets.ModelViewSet):
             serializer = TransportAssignmentSerializer(assignment)
             return Response(serializer.data)
     
+    @query_budget(5)
     @action(detail=False, methods=['get'])
     def available_users(self, request):
-        """Get list of students/teachers for assignment"""
+        """Search students/teachers without an active assignment, by name or ID prefix"""
         tenant = request.tenant
         user_type = request.query_params.get('user_type', 'student')
-        search = request.query_params.get('search', '')
+        search = request.query_params.get('search', '').strip()
+        include_assigned = request.query_params.get('include_assigned') == 'true'
         
         if user_type == 'student':
-            users = Student.objects.filter(tenant=tenant, is_active=True)
-            if search:
-                users = users.filter(
-                    Q(user__first_name__icontains=search) |
-                    Q(user__last_name__icontains=search) |
-                    Q(admission_number__icontains=search)
-                )
-            
-            data = []
-            for student in users[:20]:  # Limit to 20 results
-                # Try to get class information from academic registration
-                class_info = None
-                try:
-                    from students.models import AcademicRegistration
-                    registration = AcademicRegistration.objects.filter(
-                        student=student,
-                        is_active=True
-                    ).first()
-                    if registration and hasattr(registration, 'class_assigned'):
-                        class_info = f"{registration.class_assigned.name}-{registration.class_assigned.section}"
-                except Exception:
-                    pass
-                
-                data.append({
-                    'id': str(student.id),
-                    'name': student.user.full_name if hasattr(student.user, 'full_name') else f"{student.user.first_name} {student.user.last_name}",
-                    'user_id': student.admission_number,
-                    'class_section': class_info or 'N/A',
-                    'type': 'student'
-                })
-        
+            current_registration = AcademicRegistration.objects.filter(
+                student=OuterRef('pk'),
+                is_current=True
+            ).order_by('-registration_date')
+            users = Student.objects.filter(tenant=tenant, is_active=True).select_related(
+                'user', 'school_class'
+            ).annotate(
+                registration_class=Subquery(current_registration.values('class_name')[:1]),
+                registration_section=Subquery(current_registration.values('section')[:1]),
+            )
+            id_field = 'admission_number'
         elif user_type == 'teacher':
-            users = Teacher.objects.filter(tenant=tenant, is_active=True)
-            if search:
-                users = users.filter(
-                    Q(user__first_name__icontains=search) |
-                    Q(user__last_name__icontains=search) |
-                    Q(employee_id__icontains=search)
-                )
-            
-            data = []
-            for teacher in users[:20]:
-                data.append({
-                    'id': str(teacher.id),
-                    'name': teacher.user.full_name if hasattr(teacher.user, 'full_name') else f"{teacher.user.first_name} {teacher.user.last_name}",
-                    'user_id': teacher.employee_id,
-                    'type': 'teacher'
-                })
+            users = Teacher.objects.filter(tenant=tenant, is_active=True).select_related('user')
+            id_field = 'employee_id'
         else:
             return Response({'detail': 'Invalid user type'}, status=status.HTTP_400_BAD_REQUEST)
         
+        if not include_assigned:
+            users = users.filter(~Exists(TransportAssignment.objects.filter(
+                content_type=assignee_content_type(user_type),
+                object_id=OuterRef('pk'),
+                is_active=True
+            )))
+        
+        if search:
+            # Prefix matches only, so the UPPER(...) text_pattern_ops indexes apply
+            terms = search.split()
+            query = (
+                Q(user__first_name__istartswith=search) |
+                Q(user__last_name__istartswith=search) |
+                Q(**{f'{id_field}__istartswith': search})
+            )
+            if len(terms) > 1:
+                query |= Q(user__first_name__istartswith=terms[0], user__last_name__istartswith=terms[-1])
+            users = users.filter(query)
+        
+        users = users.order_by('user__first_name', 'user__last_name', 'id')
+        
+        # Paginate when a page is requested; otherwise keep the original top-20 list
+        page = self.paginate_queryset(users) if 'page' in request.query_params else None
+        rows = page if page is not None else users[:20]
+        
+        data = []
+        for person in rows:
+            item = {
+                'id': str(person.id),
+                'name': person.user.full_name,
+                'user_id': getattr(person, id_field),
+                'type': user_type,
+            }
+            if user_type == 'student':
+                item['class_section'] = _class_section(person)
+            data.append(item)
+        
+        if page is not None:
+            return self.get_paginated_response(data)
         return Response(data)
+
+
+def _class_section(student):
+    if student.registration_class:
+        class_name, section = student.registration_class, student.registration_section
+    elif student.school_class:
+        class_name, section = student.school_class.class_name, student.school_class.section
+    else:
+        class_name, section = student.class_name, student.section
+    if not class_name:
+        return 'N/A'
+    return f"{class_name}-{section}" if section else class_name